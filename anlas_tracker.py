@@ -0,0 +1,237 @@
+"""
+anlas_tracker.py - Anlas 잔액 추적
+
+생성할 때마다 서버에 잔액을 묻지 않고 요청 파라미터로 비용을 추정해 표시 값을 바로 줄이고,
+실제 잔액 조회는 백그라운드 스레드 하나가 설정된 간격(refresh_interval)으로 모아서 수행합니다.
+조회 결과가 추정치와 다르면(drift) 서버 값으로 맞춥니다.
+
+비용 추정식은 NovelAI 웹 UI의 계산과 같은 형태(픽셀 수와 스텝 수에 비례, 최소 2)이며
+Opus 등급의 무료 생성 조건(1장, 28스텝 이하, 1024x1024 이하)을 반영합니다.
+Vibe 인코딩/캐릭터 참조 같은 부가 비용은 추정하지 않고 다음 조회에서 보정됩니다.
+"""
+
+import math
+import threading
+import time
+
+from logger import get_logger
+logger = get_logger()
+
+DEFAULT_REFRESH_INTERVAL = 60.0   # 생성 후 서버 잔액 조회를 모으는 간격 (초)
+MIN_REFRESH_GAP = 2.0             # 강제 조회도 이 간격 안에서는 한 번으로 합침 (초)
+OPUS_TIER = 3
+OPUS_FREE_MAX_PIXELS = 1024 * 1024
+OPUS_FREE_MAX_STEPS = 28
+
+
+def estimate_anlas_cost(parameters: dict, subscription_tier: int | None = None) -> int:
+    """요청 파라미터로 예상 Anlas 비용 계산"""
+    width = int(parameters.get("width") or 1024)
+    height = int(parameters.get("height") or 1024)
+    steps = int(parameters.get("steps") or 28)
+    n_samples = max(1, int(parameters.get("n_samples") or 1))
+    pixels = width * height
+
+    per_sample = math.ceil(2.951823174884865e-6 * pixels + 5.753298233447344e-7 * pixels * steps)
+    per_sample = max(per_sample, 2)
+    if parameters.get("sm") and "nai-diffusion-3" in str(parameters.get("model", "")):
+        per_sample = math.ceil(per_sample * (1.4 if parameters.get("sm_dyn") else 1.2))
+    if parameters.get("image") and not parameters.get("mask"):
+        # img2img는 strength 비율만큼
+        per_sample = max(math.ceil(per_sample * float(parameters.get("strength") or 1.0)), 2)
+
+    billed_samples = n_samples
+    if subscription_tier == OPUS_TIER and steps <= OPUS_FREE_MAX_STEPS and pixels <= OPUS_FREE_MAX_PIXELS:
+        billed_samples -= 1
+    return per_sample * billed_samples
+
+
+class AnlasTracker:
+    """추정 + 주기적 서버 조회로 Anlas 잔액을 유지한다.
+
+    Args:
+        fetch: 서버 잔액 조회 함수 (실패 시 None). 백그라운드 스레드에서 호출된다
+        on_change: (잔액 또는 None, 추정 여부) 콜백. 백그라운드 스레드에서도 호출되므로
+                   GUI에서는 시그널로 넘겨야 한다
+        refresh_interval: charge() 후 서버 조회를 모으는 간격 (초)
+        get_tier: 구독 등급 조회 함수 (Opus 무료 생성 판단용, 없으면 무료 조건 미적용)
+        on_fetch_error: 조회 실패 콜백 (예외 또는 None). 백그라운드 스레드에서 호출된다.
+                        keepalive를 맡긴 세션 관리자가 실패를 알 수 있도록 사용
+    """
+
+    def __init__(self, fetch, on_change=None, refresh_interval: float = DEFAULT_REFRESH_INTERVAL,
+                 get_tier=None, on_fetch_error=None):
+        self.fetch = fetch
+        self.on_change = on_change
+        self.on_fetch_error = on_fetch_error
+        self.refresh_interval = refresh_interval
+        self.get_tier = get_tier
+
+        self._cond = threading.Condition()
+        self._confirmed = None      # 마지막 서버 잔액
+        self._spent = 0             # 그 이후 추정 사용량
+        self._due = None            # 다음 조회 예정 시각 (monotonic), None이면 예정 없음
+        self._last_refresh = None   # 마지막 조회 성공 시각 (monotonic)
+        self._generation = 0        # 서버 값 반영/초기화마다 증가 - 그 전에 시작한 조회 결과는 버림
+        self._last_fetch_ok = None  # 마지막 백그라운드 조회 성공 여부 (아직 없으면 None)
+        self._stop = False
+        self._thread = None
+        self.stats = {"charges": 0, "refreshes": 0, "coalesced": 0, "drift_corrections": 0,
+                      "stale_dropped": 0}
+
+    # ── 상태 ──────────────────────────────────────────────────────────
+
+    @property
+    def value(self) -> int | None:
+        """표시할 잔액 (서버 값 - 추정 사용량), 아직 모르면 None"""
+        with self._cond:
+            if self._confirmed is None:
+                return None
+            return max(0, self._confirmed - self._spent)
+
+    @property
+    def is_estimate(self) -> bool:
+        with self._cond:
+            return self._spent != 0
+
+    @property
+    def last_fetch_ok(self) -> bool | None:
+        with self._cond:
+            return self._last_fetch_ok
+
+    def seconds_since_refresh(self) -> float | None:
+        with self._cond:
+            return None if self._last_refresh is None else time.monotonic() - self._last_refresh
+
+    # ── 갱신 ──────────────────────────────────────────────────────────
+
+    def charge(self, parameters: dict) -> int:
+        """생성 1회 비용을 추정해 표시 값을 바로 줄이고 조회를 예약. 추정 비용 반환"""
+        tier = None
+        if self.get_tier is not None:
+            try:
+                tier = self.get_tier()
+            except Exception:
+                tier = None
+        cost = estimate_anlas_cost(parameters, tier)
+        with self._cond:
+            self._spent += cost
+            self.stats["charges"] += 1
+            self._schedule(self.refresh_interval)
+        self._notify()
+        return cost
+
+    def request_refresh(self, force: bool = False) -> None:
+        """서버 조회 요청 (비동기). force면 곧바로, 아니면 refresh_interval 안에서 모아서"""
+        with self._cond:
+            self._schedule(MIN_REFRESH_GAP if force else self.refresh_interval, immediate=force)
+
+    def update_from_server(self, anlas: int | None) -> None:
+        """다른 경로(keepalive 등)로 받은 서버 잔액을 반영"""
+        if anlas is None:
+            return
+        with self._cond:
+            # 진행 중인 백그라운드 조회는 이 값보다 오래되었을 수 있으므로 _generation으로 무효화됨
+            self._reconcile(anlas, self._spent)
+        self._notify()
+
+    def reset(self) -> None:
+        """로그아웃 등으로 잔액을 알 수 없게 되었을 때"""
+        with self._cond:
+            self._confirmed = None
+            self._spent = 0
+            self._due = None
+            self._generation += 1
+        self._notify()
+
+    def _schedule(self, delay: float, immediate: bool = False) -> None:
+        # _cond 보유 상태에서 호출
+        now = time.monotonic()
+        if immediate:
+            # 직전 조회로부터 MIN_REFRESH_GAP이 지났으면 바로, 아니면 그 시점에
+            earliest = now if self._last_refresh is None else self._last_refresh + MIN_REFRESH_GAP
+            due = max(now, earliest)
+        else:
+            due = now + delay
+        if self._due is not None and self._due <= due:
+            self.stats["coalesced"] += 1
+            return
+        self._due = due
+        self._ensure_thread()
+        self._cond.notify_all()
+
+    def _reconcile(self, anlas: int, spent_at_fetch: int) -> None:
+        # _cond 보유 상태에서 호출. 조회 시작 이후의 사용량은 서버 값에 반영되지 않았을 수 있으므로 남김
+        if self._confirmed is not None:
+            expected = self._confirmed - spent_at_fetch
+            if expected != anlas:
+                self.stats["drift_corrections"] += 1
+                logger.debug(f"Anlas 추정 보정: 예상 {expected}, 서버 {anlas}")
+        self._confirmed = anlas
+        self._spent -= spent_at_fetch
+        self._last_refresh = time.monotonic()
+        self._generation += 1
+
+    def _notify(self) -> None:
+        if self.on_change is None:
+            return
+        value = self.value
+        try:
+            self.on_change(value, self.is_estimate)
+        except Exception as e:
+            logger.error(f"Anlas 표시 갱신 오류: {e}")
+
+    # ── 백그라운드 조회 ──────────────────────────────────────────────
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stop = False
+            self._thread = threading.Thread(target=self._run, name="anlas-tracker", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._stop:
+                    if self._due is not None:
+                        wait = self._due - time.monotonic()
+                        if wait <= 0:
+                            break
+                        self._cond.wait(wait)
+                    else:
+                        self._cond.wait()
+                if self._stop:
+                    return
+                self._due = None
+                spent_at_fetch = self._spent
+                generation = self._generation
+
+            error = None
+            try:
+                anlas = self.fetch()
+            except Exception as e:
+                logger.warning(f"Anlas 조회 실패: {e}")
+                anlas, error = None, e
+
+            with self._cond:
+                self.stats["refreshes"] += 1
+                self._last_fetch_ok = anlas is not None
+                if anlas is not None and generation != self._generation:
+                    # 조회 중에 다른 서버 값이 반영됨 - spent_at_fetch 기준이 이미 빠졌으므로 버림
+                    self.stats["stale_dropped"] += 1
+                    logger.debug("오래된 Anlas 조회 결과 무시")
+                elif anlas is not None:
+                    self._reconcile(anlas, spent_at_fetch)
+            if anlas is None and self.on_fetch_error is not None:
+                try:
+                    self.on_fetch_error(error)
+                except Exception as e:
+                    logger.error(f"Anlas 조회 실패 처리 오류: {e}")
+            self._notify()
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
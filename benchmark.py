@@ -0,0 +1,983 @@
+"""
+benchmark.py - 성능 측정 스크립트
+
+GUI 없이 개별 처리 경로의 성능을 측정합니다.
+
+사용법:
+    python benchmark.py save [--count N] [--width W] [--height H]
+    python benchmark.py completer [--csv PATH] [--rounds N]
+    python benchmark.py tags [--csv PATH] [--rounds N]
+    python benchmark.py stealth [--count N] [--width W] [--height H]
+    python benchmark.py metadata [--count N] [--width W] [--height H]
+    python benchmark.py scan [--files N] [--width W] [--height H]
+    python benchmark.py tagger [--count N] [--size S] [--tags T]
+    python benchmark.py e2e [--count N] [--concurrency 1,2,4] [--latency SEC] [--max-concurrent N] [--rate R] ...
+    python benchmark.py async [--jobs N] [--polls N] [--latency SEC]
+    python benchmark.py payload [--count N] [--width W] [--height H]
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import tempfile
+import time
+import zipfile
+
+from PIL import Image
+from PIL.PngImagePlugin import PngInfo
+
+
+def make_synthetic_result_zip(width: int = 832, height: int = 1216, seed: int = 0) -> bytes:
+    """API 응답과 같은 형태(메타데이터 포함 PNG 1장이 든 zip)의 합성 페이로드"""
+    rng = random.Random(seed)
+    img = Image.frombytes("RGBA", (width, height), rng.randbytes(width * height * 4))
+
+    comment = {"prompt": "1girl, synthetic benchmark", "uc": "lowres", "steps": 28,
+               "height": height, "width": width, "scale": 5.0, "seed": seed,
+               "sampler": "k_euler_ancestral", "n_samples": 1}
+    pnginfo = PngInfo()
+    pnginfo.add_text("Software", "NovelAI")
+    pnginfo.add_text("Comment", json.dumps(comment))
+
+    png_buf = io.BytesIO()
+    img.save(png_buf, format="PNG", pnginfo=pnginfo)
+
+    zip_buf = io.BytesIO()
+    with zipfile.ZipFile(zip_buf, "w") as z:
+        z.writestr("image_0.png", png_buf.getvalue())
+    return zip_buf.getvalue()
+
+
+def _measure(func, count: int) -> tuple[float, float]:
+    """(이미지당 CPU 시간, 이미지당 경과 시간) 을 밀리초로 반환"""
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    for i in range(count):
+        func(i)
+    cpu = (time.process_time() - cpu_start) / count * 1000
+    wall = (time.perf_counter() - wall_start) / count * 1000
+    return cpu, wall
+
+
+def bench_save(count: int, width: int, height: int) -> None:
+    from image_saver import save_result_image, SAVE_MODE_RAW, SAVE_MODE_REENCODE
+
+    payload = make_synthetic_result_zip(width, height)
+    print(f"[save] {width}x{height}, zip {len(payload) / 1024:.0f} KiB, {count}회")
+
+    with tempfile.TemporaryDirectory() as folder:
+        for mode in (SAVE_MODE_REENCODE, SAVE_MODE_RAW):
+            cpu, wall = _measure(
+                lambda i: save_result_image(payload, os.path.join(folder, f"{mode}_{i}.png"), mode),
+                count)
+            print(f"  {mode:<9} cpu {cpu:8.2f} ms/img   wall {wall:8.2f} ms/img")
+
+
+def _linear_complete(words: list, normalized: str, with_contains: bool) -> list:
+    """인덱스 도입 전 CustomCompleter의 선형 탐색 (비교 기준)"""
+    prefix_matches = []
+    contains_matches = []
+    for word in words:
+        word_lower = word.lower()
+        tag_part = word_lower.split('[')[0] if '[' in word_lower else word_lower
+        if tag_part.startswith(normalized):
+            if len(prefix_matches) < 50:
+                prefix_matches.append(word)
+        elif with_contains and normalized in tag_part:
+            if len(contains_matches) < 50:
+                contains_matches.append(word)
+        if len(prefix_matches) >= 50 and len(contains_matches) >= 50:
+            break
+    return prefix_matches + contains_matches
+
+
+def _load_tag_words(path: str) -> list:
+    """CompletionTagLoadThread와 같은 방식으로 태그 표시 문자열 목록 생성"""
+    from completer import parse_tag_line, format_tag_display
+
+    with open(path, "r", encoding="utf8") as f:
+        tags = [t for t in (parse_tag_line(line) for line in f) if t is not None]
+    tags.sort(key=lambda t: t.post_count, reverse=True)
+    return [format_tag_display(t) for t in tags]
+
+
+def bench_completer(csv_path: str, rounds: int) -> None:
+    from completer import TagIndex
+
+    words = _load_tag_words(csv_path)
+    start = time.perf_counter()
+    index = TagIndex(words)
+    build_ms = (time.perf_counter() - start) * 1000
+    print(f"[completer] {len(words)}개 태그, 인덱스 생성 {build_ms:.1f} ms")
+
+    queries = [("prefix", q, False) for q in ("1g", "ha", "bl", "long_h", "school_u", "zz")]
+    queries += [("contains", q, True) for q in ("hair", "_eyes", "skirt", "ribbon", "sleeves", "xyzq")]
+
+    for mode, query, with_contains in queries:
+        expected = _linear_complete(words, query, with_contains)
+        actual = index.search(query, with_contains)
+        assert actual == expected, f"결과 불일치: {query}"
+
+        linear_start = time.perf_counter()
+        for _ in range(rounds):
+            _linear_complete(words, query, with_contains)
+        linear_us = (time.perf_counter() - linear_start) / rounds * 1e6
+
+        index_start = time.perf_counter()
+        for _ in range(rounds):
+            index.search(query, with_contains)
+        index_us = (time.perf_counter() - index_start) / rounds * 1e6
+
+        print(f"  {mode:<8} {query!r:<11} {len(actual):3d}건   "
+              f"linear {linear_us:9.1f} us   index {index_us:7.1f} us")
+
+
+def bench_tags(csv_path: str, rounds: int) -> None:
+    """자동 완성 첫 사용까지의 시간: 태그 로딩 + 인덱스 생성 + 첫 검색"""
+    from completer import TagIndex
+    from tag_cache import load_tag_dictionary
+
+    def first_completion(load):
+        start = time.perf_counter()
+        words, tag_index = load()
+        load_ms = (time.perf_counter() - start) * 1000
+        (tag_index or TagIndex(words)).search("long_h", True)
+        return load_ms, (time.perf_counter() - start) * 1000
+
+    def load_csv_only():
+        # 캐시 도입 전: CSV 파싱 후 인덱스를 따로 생성
+        from completer import parse_tag_line, format_tag_display
+        with open(csv_path, "r", encoding="utf8") as f:
+            tags = [t for t in (parse_tag_line(line) for line in f) if t is not None]
+        tags.sort(key=lambda t: t.post_count, reverse=True)
+        return [format_tag_display(t) for t in tags], None
+
+    def load_cached():
+        tag_dict = load_tag_dictionary(csv_path, cache_dir)
+        return tag_dict.display, tag_dict.tag_index
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cases = [("csv parse", load_csv_only), ("cache", load_cached)]
+        load_tag_dictionary(csv_path, cache_dir)  # 캐시 생성
+        print(f"[tags] {csv_path}, {rounds}회 평균")
+        for label, load in cases:
+            results = [first_completion(load) for _ in range(rounds)]
+            load_ms = sum(r[0] for r in results) / rounds
+            total_ms = sum(r[1] for r in results) / rounds
+            print(f"  {label:<10} load {load_ms:8.2f} ms   first completion {total_ms:8.2f} ms")
+
+
+def _embed_stealth(img: Image.Image, signature: str, payload: bytes) -> Image.Image:
+    """stealth pnginfo 형식(열 우선 LSB)으로 payload를 숨긴 이미지 생성"""
+    import numpy as np
+
+    bits = np.unpackbits(np.frombuffer(signature.encode() + len(payload * 8).to_bytes(4, "big") + payload,
+                                       dtype=np.uint8))
+    arr = np.array(img)
+    height, width, channels = arr.shape
+    flat = arr.transpose(1, 0, 2).reshape(-1, channels)
+    if signature.startswith("stealth_png"):
+        flat[:len(bits), 3] = (flat[:len(bits), 3] & 0xFE) | bits
+    else:
+        bits = np.concatenate([bits, np.zeros(-len(bits) % 3, dtype=np.uint8)]).reshape(-1, 3)
+        flat[:len(bits), :3] = (flat[:len(bits), :3] & 0xFE) | bits
+    return Image.fromarray(flat.reshape(width, height, channels).transpose(1, 0, 2).copy(), img.mode)
+
+
+def bench_stealth(count: int, width: int, height: int) -> None:
+    import gzip
+    from stealth_pnginfo import read_info_from_image_stealth, _read_info_from_image_stealth_pixelwise
+
+    rng = random.Random(0)
+    rgba = Image.frombytes("RGBA", (width, height), rng.randbytes(width * height * 4))
+    comment = json.dumps({"prompt": "1girl, synthetic benchmark, " * 40, "uc": "lowres", "steps": 28,
+                          "seed": 0, "sampler": "k_euler_ancestral"})
+    info = json.dumps({"Software": "NovelAI", "Comment": comment})
+
+    # 시그니처가 없는 RGB 이미지는 기존 구현이 전체 픽셀을 문자열로 누적하므로(크기의 제곱에 비례)
+    # 512x512로 줄여 1회만 측정
+    small_rgb = rgba.crop((0, 0, 512, 512)).convert("RGB")
+    cases = [
+        ("alpha comp", _embed_stealth(rgba, "stealth_pngcomp", gzip.compress(info.encode())), count),
+        ("alpha raw", _embed_stealth(rgba, "stealth_pnginfo", info.encode()), count),
+        ("rgb raw", _embed_stealth(rgba.convert("RGB"), "stealth_rgbinfo", info.encode()), count),
+        ("RGBA none", rgba, count),
+        ("RGB none*", small_rgb, 1),
+    ]
+    print(f"[stealth] {width}x{height} (*512x512), payload {len(info)} bytes")
+    for label, img, runs in cases:
+        results = []
+        _, slow_ms = _measure(lambda i: results.append(_read_info_from_image_stealth_pixelwise(img)), runs)
+        assert read_info_from_image_stealth(img) == results[0], f"결과 불일치: {label}"
+        _, fast_ms = _measure(lambda i: read_info_from_image_stealth(img), count)
+        print(f"  {label:<10} pixelwise {slow_ms:10.2f} ms   numpy {fast_ms:7.2f} ms")
+
+
+def bench_metadata(count: int, width: int, height: int) -> None:
+    import naiinfo_getter
+
+    payload = make_synthetic_result_zip(width, height)
+    with zipfile.ZipFile(io.BytesIO(payload)) as z:
+        png = z.read(z.infolist()[0])
+
+    def full_decode(path):
+        # 이전 방식: 전체 디코딩 후 img.info + stealth 확인
+        img = Image.open(path)
+        img.load()
+        return naiinfo_getter.get_naidict_from_img(img)
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "nai.png")
+        with open(path, "wb") as f:
+            f.write(png)
+        assert naiinfo_getter.get_naidict_from_file(path) == full_decode(path)
+
+        print(f"[metadata] {width}x{height} NAI PNG, {count}회")
+        for label, func in (("full decode", lambda i: full_decode(path)),
+                            ("chunk read", lambda i: naiinfo_getter.get_naidict_from_file(path))):
+            cpu, wall = _measure(func, count)
+            print(f"  {label:<11} cpu {cpu:8.2f} ms/img   wall {wall:8.2f} ms/img")
+
+
+def bench_scan(files: int, width: int, height: int) -> None:
+    import naiinfo_getter
+    from metadata_scanner import MetadataScanCache, list_image_files, scan_files
+
+    payload = make_synthetic_result_zip(width, height)
+    with zipfile.ZipFile(io.BytesIO(payload)) as z:
+        png = z.read(z.infolist()[0])
+    # 메타데이터 없는 PNG는 stealth 확인을 위해 전체 디코딩이 필요한 경우
+    plain = io.BytesIO()
+    Image.new("RGBA", (width, height), (128, 128, 128, 255)).save(plain, "PNG")
+
+    def sequential(folder):
+        # 이전 방식: 폴더를 순서대로 하나씩 확인
+        found = []
+        for path in list_image_files(folder):
+            result = naiinfo_getter.get_naidict_from_file(path)
+            if result and result[1] == 3:
+                found.append(path)
+        return found
+
+    def parallel(folder, cache):
+        return [p for p, valid in scan_files(list_image_files(folder), True, cache) if valid]
+
+    with tempfile.TemporaryDirectory() as folder:
+        for i in range(files):
+            with open(os.path.join(folder, f"{i:04d}.png"), "wb") as f:
+                f.write(png if i % 4 else plain.getvalue())
+
+        cache = MetadataScanCache(os.path.join(folder, "cache", "scan.json"))
+        print(f"[scan] {files}개 파일 ({width}x{height}, 1/4은 메타데이터 없음)")
+        for label, func in (("sequential", lambda: sequential(folder)),
+                            ("pool cold", lambda: parallel(folder, MetadataScanCache())),
+                            ("pool+cache", lambda: parallel(folder, cache))):
+            if label == "pool+cache":
+                parallel(folder, cache)  # 캐시 채우기
+            start = time.perf_counter()
+            found = func()
+            print(f"  {label:<10} {(time.perf_counter() - start) * 1000:9.1f} ms  ({len(found)}개 발견)")
+
+
+def _pb_varint(value: int) -> bytes:
+    value &= (1 << 64) - 1
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _pb_field(number: int, value) -> bytes:
+    """protobuf 필드 하나 인코딩 (int → varint, str/bytes → length-delimited)"""
+    if isinstance(value, int):
+        return _pb_varint(number << 3) + _pb_varint(value)
+    if isinstance(value, str):
+        value = value.encode("utf8")
+    return _pb_varint(number << 3 | 2) + _pb_varint(len(value)) + value
+
+
+def _onnx_value_info(name: str, dims: list) -> bytes:
+    shape = b"".join(_pb_field(1, _pb_field(2, d) if isinstance(d, str) else _pb_field(1, d)) for d in dims)
+    return _pb_field(1, name) + _pb_field(2, _pb_field(1, _pb_field(1, 1) + _pb_field(2, shape)))
+
+
+def _onnx_node(op_type: str, inputs: list, outputs: list, **attrs) -> bytes:
+    node = b"".join(_pb_field(1, i) for i in inputs) + b"".join(_pb_field(2, o) for o in outputs)
+    node += _pb_field(4, op_type)
+    for key, value in attrs.items():
+        if isinstance(value, list):
+            attr = _pb_field(1, key) + b"".join(_pb_field(8, v) for v in value) + _pb_field(20, 7)
+        else:
+            attr = _pb_field(1, key) + _pb_field(3, value) + _pb_field(20, 2)
+        node += _pb_field(5, attr)
+    return node
+
+
+def _onnx_tensor(name: str, array) -> bytes:
+    import numpy as np
+    array = np.ascontiguousarray(array, dtype="<f4")
+    return b"".join(_pb_field(1, d) for d in array.shape) + _pb_field(2, 1) + _pb_field(8, name) \
+        + _pb_field(9, array.tobytes())
+
+
+def make_tagger_model(size: int = 448, tags: int = 9083, seed: int = 0) -> bytes:
+    """WD14 태거와 같은 입출력 형태(NHWC BGR float32 → 태그별 확률)의 작은 ONNX 모델.
+
+    onnx 패키지 없이 protobuf를 직접 인코딩하며, stride 8 Conv로 실제 모델보다 가볍다.
+    """
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    conv_w = rng.standard_normal((32, 3, 8, 8)).astype(np.float32) / 255.0
+    fc_w = rng.standard_normal((32, tags)).astype(np.float32)
+    graph = b"".join(_pb_field(1, n) for n in (
+        _onnx_node("Transpose", ["input_1:0"], ["nchw"], perm=[0, 3, 1, 2]),
+        _onnx_node("Conv", ["nchw", "conv_w"], ["conv"], kernel_shape=[8, 8], strides=[8, 8]),
+        _onnx_node("Relu", ["conv"], ["relu"]),
+        _onnx_node("GlobalAveragePool", ["relu"], ["pool"]),
+        _onnx_node("Flatten", ["pool"], ["flat"], axis=1),
+        _onnx_node("MatMul", ["flat", "fc_w"], ["logits"]),
+        _onnx_node("Sigmoid", ["logits"], ["predictions_sigmoid"]),
+    ))
+    graph += _pb_field(2, "tagger")
+    graph += _pb_field(5, _onnx_tensor("conv_w", conv_w)) + _pb_field(5, _onnx_tensor("fc_w", fc_w))
+    graph += _pb_field(11, _onnx_value_info("input_1:0", ["batch", size, size, 3]))
+    graph += _pb_field(12, _onnx_value_info("predictions_sigmoid", ["batch", tags]))
+    return _pb_field(1, 8) + _pb_field(8, _pb_field(1, "") + _pb_field(2, 13)) + _pb_field(7, graph)
+
+
+def make_tagger_csv(tags: int = 9083) -> str:
+    """selected_tags.csv 형식 (rating 4개, general, character 순)"""
+    lines = ["tag_id,name,category,count"]
+    n_character = tags // 4
+    for i in range(tags):
+        if i < 4:
+            category, name = 9, f"rating_{i}"
+        elif i < tags - n_character:
+            category, name = 0, f"general_tag_{i}"
+        else:
+            category, name = 4, f"character_(series_{i})"
+        lines.append(f"{i},{name},{category},{tags - i}")
+    return "\n".join(lines) + "\n"
+
+
+def _make_tagger_dir(folder: str, model_name: str, size: int, tags: int) -> None:
+    with open(os.path.join(folder, model_name + ".onnx"), "wb") as f:
+        f.write(make_tagger_model(size, tags))
+    with open(os.path.join(folder, model_name + ".csv"), "w", encoding="utf8") as f:
+        f.write(make_tagger_csv(tags))
+
+
+def bench_tagger(count: int, size: int, tags: int) -> None:
+    from danbooru_tagger import DanbooruTagger
+
+    image = Image.new("RGB", (832, 1216), (200, 120, 80))
+    with tempfile.TemporaryDirectory() as folder:
+        _make_tagger_dir(folder, "bench-tagger", size, tags)
+
+        def uncached(i):
+            # 이전 동작: 호출마다 세션 생성 + CSV 파싱
+            tagger = DanbooruTagger(folder)
+            tagger.options["model_name"] = "bench-tagger"
+            return tagger.tag(image)
+
+        cached_tagger = DanbooruTagger(folder)
+        cached_tagger.options["model_name"] = "bench-tagger"
+        assert cached_tagger.tag(image) == uncached(0)
+
+        print(f"[tagger] 합성 모델 {size}x{size}, 태그 {tags}개, {count}회")
+        for label, func in (("new session", uncached), ("cached", lambda i: cached_tagger.tag(image))):
+            cpu, wall = _measure(func, count)
+            print(f"  {label:<11} cpu {cpu:8.2f} ms/img   wall {wall:8.2f} ms/img")
+
+        images = [image.copy() for _ in range(16)]
+        assert cached_tagger.tag_many(images[:4]) == [cached_tagger.tag(img) for img in images[:4]]
+        print(f"  tag_many {len(images)}장")
+        for batch_size in (1, 4, 16):
+            start = time.perf_counter()
+            for _ in range(max(1, count // 4)):
+                cached_tagger.tag_many(images, batch_size=batch_size)
+            elapsed = (time.perf_counter() - start) / max(1, count // 4)
+            print(f"    batch {batch_size:>2}  {elapsed * 1000 / len(images):8.2f} ms/img   "
+                  f"{len(images) / elapsed:6.1f} img/s")
+
+
+E2E_SETTINGS = {
+    "prompt": "1girl, <red|blue|green> hair, __missing__, masterpiece",
+    "negative_prompt": "lowres, bad anatomy",
+    "width": 832, "height": 1216, "steps": 28, "seed": -1, "scale": 5.0, "cfg_rescale": 0.0,
+    "sampler": "k_euler_ancestral", "autoSmea": True, "model": "nai-diffusion-4-5-full",
+    "characterPrompts": [{"prompt": "girl, smile", "negative_prompt": ""}], "use_character_coords": False,
+}
+
+
+def _start_mock_server_process(args: list) -> tuple:
+    """mock_nai_server.py를 자식 프로세스로 실행 (서버 CPU가 측정에 섞이지 않도록)"""
+    import subprocess
+    import sys
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mock_nai_server.py")
+    proc = subprocess.Popen([sys.executable, script, "--port", "0"] + args,
+                            stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline().strip()
+    if not line.startswith("listening on "):
+        proc.kill()
+        raise RuntimeError(f"테스트 서버 시작 실패: {line!r}")
+    return proc, line[len("listening on "):]
+
+
+def bench_e2e(count: int, concurrency_list: list, server_args: list, rate: float | None = None) -> None:
+    import headless_runner
+    from nai_generator import NAIGenerator
+    from nai_transport import NAITransport
+    from request_scheduler import RequestScheduler
+
+    proc, url = _start_mock_server_process(server_args)
+    try:
+        print(f"[e2e] 테스트 서버 {url} {' '.join(server_args)}, 요청 {count}개")
+        for concurrency in concurrency_list:
+            base = NAIGenerator(NAITransport(pool_maxsize=max(concurrency, 1)), url, url)
+            assert headless_runner.login(base, api_key="pst-benchmark")
+            scheduler = RequestScheduler(max_in_flight=concurrency, rate=rate)
+            with tempfile.TemporaryDirectory() as folder:
+                runner = headless_runner.HeadlessRunner(
+                    headless_runner.make_generator_factory(base),
+                    headless_runner.GenerationDataBuilder(E2E_SETTINGS), folder,
+                    concurrency=concurrency, ignore_error=True, scheduler=scheduler)
+                stats = runner.run(count)
+            sched = scheduler.get_stats()
+            print(f"  concurrency {concurrency:>2}  {stats.images_per_min:8.1f} images/min   "
+                  f"p50 {stats.latency_percentile(50) * 1000:7.1f} ms   p95 {stats.latency_percentile(95) * 1000:7.1f} ms   "
+                  f"cpu {stats.cpu_ms_per_image:6.1f} ms/img   실패 {stats.failed}   "
+                  f"429 {sched['responses'].get(429, 0)}   한도 {sched['concurrency_limit']}")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def bench_async(jobs: int, polls: int, latency: float) -> None:
+    import asyncio
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from nai_async import AsyncNAIGenerator, AsyncNAITransport, EventLoopThread
+    from nai_generator import NAIGenerator, NAIAction
+    from nai_transport import NAITransport
+
+    proc, url = _start_mock_server_process(["--latency", str(latency), "--jitter", "0", "--entropy", "0.1"])
+    print(f"[async] 테스트 서버 {url}, 생성 {jobs}개 + Anlas 조회 {polls}개 동시 실행")
+
+    def make_nai(transport):
+        nai = NAIGenerator(transport, url, url)
+        nai.access_token = "pst-benchmark"
+        nai.parameters.update(prompt="benchmark", width=64, height=64)
+        return nai
+
+    peak = [0]
+
+    def sample_threads(stop):
+        while not stop.wait(0.01):
+            peak[0] = max(peak[0], threading.active_count())
+
+    def measure(label, run):
+        peak[0] = threading.active_count()
+        stop = threading.Event()
+        sampler = threading.Thread(target=sample_threads, args=(stop,))
+        sampler.start()
+        start = time.perf_counter()
+        ok, stats = run()
+        elapsed = time.perf_counter() - start
+        stop.set()
+        sampler.join()
+        print(f"  {label:<8} {elapsed * 1000:8.1f} ms   성공 {ok}/{jobs + polls}   "
+              f"최대 스레드 {peak[0] - 1:>3}   새 연결 {stats['new_connections']}, 재사용 {stats['reused_connections']}")
+
+    def run_threads():
+        transport = NAITransport(pool_maxsize=jobs + polls)
+        with ThreadPoolExecutor(max_workers=jobs + polls) as executor:
+            gens = [executor.submit(make_nai(transport).generate_image, NAIAction.generate) for _ in range(jobs)]
+            anlas = [executor.submit(make_nai(transport).get_anlas) for _ in range(polls)]
+            ok = sum(isinstance(f.result(), bytes) for f in gens) + sum(f.result() is not None for f in anlas)
+        return ok, transport.get_stats()
+
+    def run_async():
+        loop_thread = EventLoopThread()
+        transport = AsyncNAITransport(pool_maxsize=jobs + polls)
+
+        async def run_all():
+            gens = [AsyncNAIGenerator(make_nai(None), transport).generate_image(NAIAction.generate) for _ in range(jobs)]
+            anlas = [AsyncNAIGenerator(make_nai(None), transport).get_anlas() for _ in range(polls)]
+            results = await asyncio.gather(*gens, *anlas)
+            return sum(isinstance(r, bytes) for r in results[:jobs]) + sum(r is not None for r in results[jobs:])
+
+        try:
+            loop_thread.loop  # 루프 스레드 시작은 측정 전에
+            return loop_thread.run(run_all()), transport.get_stats()
+        finally:
+            loop_thread.stop()
+
+    try:
+        # 연결 생성 비용 차이를 빼기 위해 각 방식을 두 번 실행하고 두 번째를 비교
+        for label, run in (("threads", run_threads), ("asyncio", run_async)):
+            run()
+            measure(label, run)
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def bench_payload(count: int, width: int, height: int) -> None:
+    import base64
+    from payload_cache import PayloadCache, encode_png_base64
+
+    rng = random.Random(0)
+    source = Image.frombytes("RGB", (width, height), rng.randbytes(width * height * 3))
+    reference = source.resize((width // 2, height // 2))
+    mask = Image.new("L", (width, height), 0)
+    mask.paste(255, (width // 4, height // 4, width // 2, height // 2))
+
+    def charref(img):
+        canvas = Image.new("RGB", (1024, 1536), (0, 0, 0))
+        copy = img.copy()
+        copy.thumbnail((1024, 1536), Image.LANCZOS)
+        canvas.paste(copy, ((1024 - copy.width) // 2, (1536 - copy.height) // 2))
+        return canvas
+
+    with tempfile.TemporaryDirectory() as folder:
+        src_path = os.path.join(folder, "i2i.png")
+        source.save(src_path)
+
+        def encode_uncached(_):
+            with Image.open(src_path) as img:
+                buf = io.BytesIO()
+                img.save(buf, format="png")
+                base64.b64encode(buf.getvalue())
+            encode_png_base64(charref(reference))
+            encode_png_base64(mask.point(lambda v: 255 if v > 127 else 0))
+
+        cache = PayloadCache()
+
+        def encode_cached(_):
+            cache.encode_file(src_path)
+            cache.encode_image(reference, "character_reference", charref)
+            cache.encode_image(mask, "inpaint_mask", lambda m: m.point(lambda v: 255 if v > 127 else 0))
+
+        print(f"[payload] {width}x{height} img2img + 캐릭터 참조 + 마스크, {count}회")
+        for label, func in (("매번 인코딩", encode_uncached), ("캐시", encode_cached)):
+            cpu, wall = _measure(func, count)
+            print(f"  {label:<10} 회당 {wall:8.2f} ms   (CPU {cpu:8.2f} ms)")
+        print(f"  캐시 {len(cache)}개 항목, {cache.size / 1024 / 1024:.1f} MB, {cache.stats}")
+
+
+def _offscreen_qapp():
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
+
+
+def bench_mask_overlay(count: int, width: int, height: int) -> None:
+    app = _offscreen_qapp()
+    from PyQt5.QtCore import QPoint
+    from PyQt5.QtGui import QColor, QImage, QPainter, QPixmap
+    from gui_init import ImageToImageWidget
+
+    def legacy_overlay(widget):
+        # 이전 구현: 디스크에서 다시 읽고 픽셀 단위로 오버레이 생성 후 전체 합성
+        pixmap = QPixmap(widget.src)
+        overlay = QImage(pixmap.size(), QImage.Format_ARGB32)
+        overlay.fill(0)
+        for y in range(widget.mask.height()):
+            for x in range(widget.mask.width()):
+                if widget.mask.pixelColor(x, y).value() > 0:
+                    overlay.setPixelColor(x, y, QColor(255, 0, 0, 128))
+        result = QPixmap(pixmap.size())
+        painter = QPainter(result)
+        painter.drawPixmap(0, 0, pixmap)
+        painter.drawImage(0, 0, overlay)
+        painter.end()
+        return result
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as folder:
+        src_path = os.path.join(folder, "i2i.png")
+        Image.frombytes("RGB", (width, height), rng.randbytes(width * height * 3)).save(src_path)
+
+        widget = ImageToImageWidget("img2img", None)
+        widget.image_label.setFixedSize(400, 200)
+        widget.set_image(src_path)
+        widget.mask_checkbox.setChecked(True)
+        preview = widget.mask_preview
+        center_x = (400 - preview.width()) // 2
+        points = [QPoint(center_x + (i * 7) % preview.width(), 36 + (i * 3) % 64) for i in range(count + 1)]
+
+        widget.mousePressPos = points[0]
+
+        def stroke(i):
+            widget.drawMask(points[i + 1])
+
+        print(f"[mask] {width}x{height} 미리보기 마스크, 획 {count}회")
+        cpu, wall = _measure(stroke, count)
+        print(f"  {'영역 합성':<10} 획당 {wall:8.2f} ms   (CPU {cpu:8.2f} ms)")
+        legacy_count = min(count, 2)
+        cpu, wall = _measure(lambda _: legacy_overlay(widget), legacy_count)
+        print(f"  {'픽셀 루프':<10} 획당 {wall:8.2f} ms   (CPU {cpu:8.2f} ms, {legacy_count}회)")
+
+        same = legacy_overlay(widget).toImage().convertToFormat(QImage.Format_ARGB32) == \
+            widget.mask_composite.toImage().convertToFormat(QImage.Format_ARGB32)
+        print(f"  이전 구현과 합성 결과 일치: {same}")
+    app.processEvents()
+
+
+def _legacy_mask_canvas_pixmap(image, mask):
+    # 이전 MaskCanvas.update_display: 전체 합성 → PNG 왕복 → 격자 전체 다시 그리기
+    import numpy as np
+    from PyQt5.QtCore import Qt
+    from PyQt5.QtGui import QColor, QImage, QPainter, QPen, QPixmap
+
+    display_image = image.copy().convert('RGBA')
+    mask_array = np.array(mask)
+    overlay = np.zeros((*mask_array.shape, 4), dtype=np.uint8)
+    overlay[mask_array > 0] = [255, 0, 0, 128]
+    display_image = Image.alpha_composite(display_image, Image.fromarray(overlay, 'RGBA'))
+    buf = io.BytesIO()
+    display_image.save(buf, format='PNG')
+    pixmap = QPixmap.fromImage(QImage.fromData(buf.getvalue()))
+    painter = QPainter(pixmap)
+    painter.setPen(QPen(QColor(0, 255, 0, 80), 1, Qt.SolidLine))
+    for gx in range(image.size[0] // 8 + 1):
+        painter.drawLine(gx * 8, 0, gx * 8, image.size[1])
+    for gy in range(image.size[1] // 8 + 1):
+        painter.drawLine(0, gy * 8, image.size[0], gy * 8)
+    painter.end()
+    return pixmap
+
+
+def bench_mask_canvas(count: int, width: int, height: int) -> None:
+    app = _offscreen_qapp()
+    import numpy as np
+    from PyQt5.QtCore import QEvent, QPoint, Qt
+    from PyQt5.QtGui import QImage, QMouseEvent
+    from gui_dialog import MaskCanvas
+
+    rng = random.Random(0)
+    image = Image.frombytes("RGB", (width, height), rng.randbytes(width * height * 3))
+    canvas = MaskCanvas()
+    canvas.set_image(image)
+    canvas.set_brush_size(3)
+    canvas.show()
+    app.processEvents()
+
+    def mouse(kind, x, y):
+        return QMouseEvent(kind, QPoint(x, y), Qt.LeftButton, Qt.LeftButton, Qt.NoModifier)
+
+    points = [(40 + (i * 13) % (width - 80), 40 + (i * 29) % (height - 80)) for i in range(count + 1)]
+    canvas.mousePressEvent(mouse(QEvent.MouseButtonPress, *points[0]))
+
+    def stroke(i):
+        canvas.mouseMoveEvent(mouse(QEvent.MouseMove, *points[i + 1]))
+        app.processEvents()
+
+    legacy_label = MaskCanvas()
+    legacy_label.show()
+
+    def legacy_stroke(_):
+        # 셀마다 전체 마스크를 NumPy로 변환하던 비용 + 전체 다시 그리기
+        mask_array = np.array(canvas.get_mask())
+        mask = Image.fromarray(mask_array, mode='L')
+        legacy_label.setPixmap(_legacy_mask_canvas_pixmap(image, mask))
+        app.processEvents()
+
+    print(f"[maskcanvas] {width}x{height} 인페인트 마스크 캔버스, 이동 {count}회")
+    cpu, wall = _measure(stroke, count)
+    print(f"  {'셀 단위 갱신':<10} 이동당 {wall:8.2f} ms   (CPU {cpu:8.2f} ms)")
+    legacy_count = min(count, 10)
+    cpu, wall = _measure(legacy_stroke, legacy_count)
+    print(f"  {'전체 다시 그림':<10} 이동당 {wall:8.2f} ms   (CPU {cpu:8.2f} ms, {legacy_count}회)")
+
+    expected = _legacy_mask_canvas_pixmap(image, canvas.get_mask()).toImage().convertToFormat(QImage.Format_ARGB32)
+    actual = canvas.display_pixmap.toImage().convertToFormat(QImage.Format_ARGB32)
+    print(f"  칠한 셀 {int(canvas.grid_data.sum())}개, 이전 구현과 표시 결과 일치: {expected == actual}")
+
+    # 기존 마스크 불러오기: 8×8 블록마다 np.any 하던 이전 방식 vs reshape 한 번
+    existing = canvas.get_mask()
+
+    def legacy_load(_):
+        mask_array = np.array(existing)
+        grid = [[0 for _ in range(canvas.grid_height)] for _ in range(canvas.grid_width)]
+        for gx in range(canvas.grid_width):
+            for gy in range(canvas.grid_height):
+                if np.any(mask_array[gy * 8:(gy + 1) * 8, gx * 8:(gx + 1) * 8] > 127):
+                    grid[gx][gy] = 1
+        return grid
+
+    legacy_grid = legacy_load(0)
+    cpu, wall = _measure(lambda _: canvas.set_mask(existing), 5)
+    print(f"  {'마스크 불러오기':<10} 회당 {wall:8.2f} ms   (CPU {cpu:8.2f} ms, 표시 갱신 포함)")
+    cpu, wall = _measure(legacy_load, 2)
+    print(f"  {'블록 루프':<10} 회당 {wall:8.2f} ms   (CPU {cpu:8.2f} ms, 격자 계산만)")
+    same = all(bool(canvas.grid_data[gy, gx]) == bool(legacy_grid[gx][gy])
+               for gx in range(canvas.grid_width) for gy in range(canvas.grid_height))
+    print(f"  불러온 격자 일치: {same}, 내보낸 마스크 일치: {np.array_equal(np.array(canvas.get_mask()), np.array(existing))}")
+
+
+def bench_thumbnail(files: int, width: int, height: int) -> None:
+    app = _offscreen_qapp()
+    from PyQt5.QtGui import QPixmap
+    from thumbnail_cache import PREVIEW_THUMBNAIL_SIZE, ThumbnailCache
+
+    def legacy_thumbnail(path):
+        # 이전 방식: 전체 디코딩 → LANCZOS 축소 → PNG 왕복 → QPixmap
+        thumbnail = Image.open(path).copy()
+        thumbnail.thumbnail(PREVIEW_THUMBNAIL_SIZE, Image.LANCZOS)
+        buf = io.BytesIO()
+        thumbnail.save(buf, format='PNG')
+        pixmap = QPixmap()
+        pixmap.loadFromData(buf.getvalue())
+        return pixmap
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as folder:
+        paths = []
+        for i in range(files):
+            image = Image.frombytes("RGB", (width // 8, height // 8), rng.randbytes(width * height * 3 // 64))
+            image = image.resize((width, height), Image.BILINEAR)
+            path = os.path.join(folder, f"src_{i}.{'jpg' if i % 2 else 'png'}")
+            image.save(path, quality=95) if path.endswith(".jpg") else image.save(path)
+            paths.append(path)
+        cache_dir = os.path.join(folder, "thumbs")
+
+        print(f"[thumbnail] {width}x{height} 이미지 {files}개 (PNG/JPEG 반반), 폴더 배치 한 바퀴")
+        cpu, wall = _measure(lambda i: legacy_thumbnail(paths[i]), files)
+        print(f"  {'매번 디코딩':<12} 장당 {wall:8.2f} ms   (CPU {cpu:8.2f} ms)")
+
+        cache = ThumbnailCache(cache_dir=cache_dir)
+        cpu, wall = _measure(lambda i: cache.get_pixmap(paths[i]), files)
+        print(f"  {'캐시 첫 로드':<12} 장당 {wall:8.2f} ms   (CPU {cpu:8.2f} ms, JPEG draft 디코딩)")
+        cpu, wall = _measure(lambda i: cache.get_pixmap(paths[i]), files)
+        print(f"  {'메모리 캐시':<12} 장당 {wall:8.2f} ms   (CPU {cpu:8.2f} ms)")
+
+        restarted = ThumbnailCache(cache_dir=cache_dir)
+        cpu, wall = _measure(lambda i: restarted.get_pixmap(paths[i]), files)
+        print(f"  {'디스크 캐시':<12} 장당 {wall:8.2f} ms   (CPU {cpu:8.2f} ms, 재시작 후)")
+
+        # 비동기 요청: GUI 스레드는 요청만 하고 디코딩은 작업 스레드에서
+        fresh = ThumbnailCache(cache_dir=os.path.join(folder, "thumbs_async"))
+        received = []
+        start = time.perf_counter()
+        gui_ms = _measure(lambda i: fresh.request(paths[i], received.append), files)[1]
+        while len(received) < files:
+            app.processEvents()
+            time.sleep(0.001)
+        total = (time.perf_counter() - start) * 1000
+        print(f"  {'비동기 요청':<12} GUI 스레드 장당 {gui_ms:6.3f} ms, 전체 {total:8.1f} ms")
+        print(f"  {cache.stats}, 재시작 {restarted.stats}")
+        for c in (cache, restarted, fresh):
+            c.shutdown()
+
+
+def bench_viewer(count: int, width: int, height: int, resizes: int) -> None:
+    app = _offscreen_qapp()
+    import naiinfo_getter
+    from PyQt5.QtCore import Qt
+    from PyQt5.QtGui import QPixmap
+    from gui_init import ResizableImageWidget
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "result.png")
+        with zipfile.ZipFile(io.BytesIO(make_synthetic_result_zip(width, height))) as z:
+            with open(path, "wb") as f:
+                f.write(z.read(z.namelist()[0]))
+
+        viewer = ResizableImageWidget()
+        viewer.show()
+        app.processEvents()
+        sizes = [(480 + (i % 4) * 40, 640 + (i % 4) * 30) for i in range(resizes)]
+
+        def legacy(_):
+            # 이전 경로: QPixmap 디코딩 + 원본 바이트 읽기 + PIL 디코딩 복사 + 메타데이터, 리사이즈마다 다시 디코딩
+            label = viewer.image_label
+            QPixmap(path).scaled(label.width(), label.height(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            with open(path, "rb") as f:
+                f.read()
+            Image.open(path).copy()
+            naiinfo_getter.get_naidict_from_file(path)
+            for w, h in sizes:
+                QPixmap(path).scaled(w, h, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+        def single_decode(_):
+            image = Image.open(path)
+            image.load()
+            viewer.set_custom_pixmap(path, image)
+            naiinfo_getter.get_naidict_from_img(image)
+            for w, h in sizes:
+                viewer.image_label.resize(w, h)
+                viewer.refresh_size()
+            viewer._resize_timer.stop()
+            viewer._apply_scaled_pixmap()   # 디바운스 후 한 번
+
+        print(f"[viewer] {width}x{height} 결과 이미지 {count}장, 장마다 리사이즈 {resizes}회")
+        for label, func in (("이전 경로", legacy), ("한 번 디코딩", single_decode)):
+            cpu, wall = _measure(func, count)
+            print(f"  {label:<10} 장당 {wall:8.2f} ms   (CPU {cpu:8.2f} ms)")
+
+        image = Image.open(path)
+        image.load()
+        same = naiinfo_getter.get_naidict_from_img(image) == naiinfo_getter.get_naidict_from_file(path)
+        print(f"  메타데이터 일치: {same}, 축소본 캐시 {len(viewer._scaled_cache)}개")
+
+
+def bench_request(count: int, characters: int) -> None:
+    import nai_generator
+    from nai_generator import NAIAction, NAIGenerator
+
+    nai = NAIGenerator()
+    nai.parameters.update(
+        prompt=", ".join(f"tag_{i}" for i in range(150)), negative_prompt="lowres, bad anatomy",
+        seed=1, use_character_coords=True,
+        characterPrompts=[{"prompt": f"character_{i}, " * 20, "negative_prompt": "bad hands",
+                           "position": [0.2 * (i % 5) + 0.1, 0.5]} for i in range(characters)])
+    snapshot = dict(nai.parameters)
+
+    def build_uncached(_):
+        nai_generator._build_v4_prompts.cache_clear()
+        nai._build_generate_request(NAIAction.generate)
+
+    def build_cached(_):
+        nai._build_generate_request(NAIAction.generate)
+
+    print(f"[request] 캐릭터 {characters}명, 요청 구성 {count}회")
+    for label, func in (("메모 없음", build_uncached), ("메모", build_cached)):
+        cpu, wall = _measure(func, count)
+        print(f"  {label:<10} 회당 {wall * 1000:8.1f} us   (CPU {cpu * 1000:8.1f} us)")
+    print(f"  원본 파라미터 유지: {nai.parameters == snapshot}, {nai_generator._build_v4_prompts.cache_info()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NAI Auto Generator 성능 측정")
+    sub = parser.add_subparsers(dest="target", required=True)
+
+    p_save = sub.add_parser("save", help="생성 결과 저장 경로 (재인코딩 vs 원본 바이트 기록)")
+    p_save.add_argument("--count", type=int, default=10)
+    p_save.add_argument("--width", type=int, default=832)
+    p_save.add_argument("--height", type=int, default=1216)
+
+    p_comp = sub.add_parser("completer", help="태그 자동 완성 검색 (선형 탐색 vs 인덱스)")
+    p_comp.add_argument("--csv", default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                      "danbooru_tags_post_count.csv"))
+    p_comp.add_argument("--rounds", type=int, default=200)
+
+    p_tags = sub.add_parser("tags", help="태그 사전 로딩 (CSV 파싱 vs 바이너리 캐시)")
+    p_tags.add_argument("--csv", default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                      "danbooru_tags_post_count.csv"))
+    p_tags.add_argument("--rounds", type=int, default=5)
+
+    p_stealth = sub.add_parser("stealth", help="stealth pnginfo 디코딩 (픽셀 단위 vs NumPy)")
+    p_stealth.add_argument("--count", type=int, default=3)
+    p_stealth.add_argument("--width", type=int, default=832)
+    p_stealth.add_argument("--height", type=int, default=1216)
+
+    p_meta = sub.add_parser("metadata", help="NAI 메타데이터 읽기 (전체 디코딩 vs PNG 청크)")
+    p_meta.add_argument("--count", type=int, default=20)
+    p_meta.add_argument("--width", type=int, default=832)
+    p_meta.add_argument("--height", type=int, default=1216)
+
+    p_scan = sub.add_parser("scan", help="폴더 메타데이터 스캔 (순차 vs 스레드 풀 vs 캐시)")
+    p_scan.add_argument("--files", type=int, default=200)
+    p_scan.add_argument("--width", type=int, default=832)
+    p_scan.add_argument("--height", type=int, default=1216)
+
+    p_tagger = sub.add_parser("tagger", help="WD14 태거 호출 (세션 생성/캐시, 배치 크기별 처리량)")
+    p_tagger.add_argument("--count", type=int, default=10)
+    p_tagger.add_argument("--size", type=int, default=448)
+    p_tagger.add_argument("--tags", type=int, default=9083)
+
+    p_e2e = sub.add_parser("e2e", help="로컬 테스트 서버 상대 생성 처리량 (images/min, 지연, CPU)")
+    p_e2e.add_argument("--count", type=int, default=40)
+    p_e2e.add_argument("--concurrency", default="1,2,4", help="쉼표로 구분한 동시 요청 수 목록")
+    p_e2e.add_argument("--latency", type=float, default=0.3)
+    p_e2e.add_argument("--jitter", type=float, default=0.1)
+    p_e2e.add_argument("--error-401", type=float, default=0.0)
+    p_e2e.add_argument("--error-429", type=float, default=0.0)
+    p_e2e.add_argument("--error-500", type=float, default=0.0)
+    p_e2e.add_argument("--entropy", type=float, default=0.5)
+    p_e2e.add_argument("--max-concurrent", type=int, default=0, help="서버 동시 처리 한도 (초과 시 429)")
+    p_e2e.add_argument("--rate", type=float, default=None, help="스케줄러 초기 요청 속도 (요청/초)")
+
+    p_async = sub.add_parser("async", help="동시 요청 처리 (요청별 스레드 vs 단일 이벤트 루프)")
+    p_async.add_argument("--jobs", type=int, default=32)
+    p_async.add_argument("--polls", type=int, default=32)
+    p_async.add_argument("--latency", type=float, default=0.3)
+
+    p_payload = sub.add_parser("payload", help="이미지 페이로드 인코딩 (매번 인코딩 vs 캐시)")
+    p_payload.add_argument("--count", type=int, default=10)
+    p_payload.add_argument("--width", type=int, default=832)
+    p_payload.add_argument("--height", type=int, default=1216)
+
+    p_request = sub.add_parser("request", help="생성 요청 본문 구성 (V4 구조 메모 없음 vs 메모)")
+    p_request.add_argument("--count", type=int, default=2000)
+    p_request.add_argument("--characters", type=int, default=4)
+
+    p_mask = sub.add_parser("mask", help="img2img 마스크 오버레이 획 지연 (픽셀 루프 vs 영역 합성)")
+    p_mask.add_argument("--count", type=int, default=200)
+    p_mask.add_argument("--width", type=int, default=1216)
+    p_mask.add_argument("--height", type=int, default=832)
+
+    p_canvas = sub.add_parser("maskcanvas", help="인페인트 마스크 캔버스 이동당 갱신 (전체 다시 그림 vs 셀 단위)")
+    p_canvas.add_argument("--count", type=int, default=200)
+    p_canvas.add_argument("--width", type=int, default=1536)
+    p_canvas.add_argument("--height", type=int, default=1024)
+
+    p_thumb = sub.add_parser("thumbnail", help="미리보기 썸네일 (매번 디코딩 vs 메모리/디스크 캐시)")
+    p_thumb.add_argument("--files", type=int, default=20)
+    p_thumb.add_argument("--width", type=int, default=1216)
+    p_thumb.add_argument("--height", type=int, default=832)
+
+    p_viewer = sub.add_parser("viewer", help="결과 이미지 표시 (중복 디코딩 vs 한 번 디코딩 + 축소본 캐시)")
+    p_viewer.add_argument("--count", type=int, default=10)
+    p_viewer.add_argument("--width", type=int, default=832)
+    p_viewer.add_argument("--height", type=int, default=1216)
+    p_viewer.add_argument("--resizes", type=int, default=8)
+
+    args = parser.parse_args()
+    if args.target == "save":
+        bench_save(args.count, args.width, args.height)
+    elif args.target == "completer":
+        bench_completer(args.csv, args.rounds)
+    elif args.target == "tags":
+        bench_tags(args.csv, args.rounds)
+    elif args.target == "stealth":
+        bench_stealth(args.count, args.width, args.height)
+    elif args.target == "metadata":
+        bench_metadata(args.count, args.width, args.height)
+    elif args.target == "scan":
+        bench_scan(args.files, args.width, args.height)
+    elif args.target == "tagger":
+        bench_tagger(args.count, args.size, args.tags)
+    elif args.target == "e2e":
+        server_args = ["--latency", str(args.latency), "--jitter", str(args.jitter),
+                       "--error-401", str(args.error_401), "--error-429", str(args.error_429),
+                       "--error-500", str(args.error_500), "--entropy", str(args.entropy),
+                       "--max-concurrent", str(args.max_concurrent)]
+        bench_e2e(args.count, [int(c) for c in args.concurrency.split(",") if c], server_args, args.rate)
+    elif args.target == "async":
+        bench_async(args.jobs, args.polls, args.latency)
+    elif args.target == "payload":
+        bench_payload(args.count, args.width, args.height)
+    elif args.target == "request":
+        bench_request(args.count, args.characters)
+    elif args.target == "mask":
+        bench_mask_overlay(args.count, args.width, args.height)
+    elif args.target == "maskcanvas":
+        bench_mask_canvas(args.count, args.width, args.height)
+    elif args.target == "thumbnail":
+        bench_thumbnail(args.files, args.width, args.height)
+    elif args.target == "viewer":
+        bench_viewer(args.count, args.width, args.height, args.resizes)
+
+
+if __name__ == "__main__":
+    main()
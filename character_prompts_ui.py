@@ -448,9 +448,9 @@ class CharacterPromptsContainer(QWidget):
         # 태그 자동 완성 적용 (태그 목록이 있는 경우)
         if hasattr(self, 'tag_list') and self.tag_list:
             if hasattr(widget.prompt_edit, 'start_complete_mode'):
-                widget.prompt_edit.start_complete_mode(self.tag_list)
+                widget.prompt_edit.start_complete_mode(self.tag_list, getattr(self, 'tag_index', None))
             if hasattr(widget.neg_prompt_edit, 'start_complete_mode'):
-                widget.neg_prompt_edit.start_complete_mode(self.tag_list)
+                widget.neg_prompt_edit.start_complete_mode(self.tag_list, getattr(self, 'tag_index', None))
         
         # stretch 아이템 앞에 위젯 삽입
         self.characters_layout.insertWidget(self.characters_layout.count() - 1, widget)
@@ -560,7 +560,7 @@ class CharacterPromptsContainer(QWidget):
                 self.add_character()
                 self.character_widgets[-1].set_data(char_data)
     
-    def set_tag_completion(self, tag_list):
+    def set_tag_completion(self, tag_list, tag_index=None):
         """
         모든 캐릭터 프롬프트 에디터에 태그 자동 완성 설정
         """
@@ -570,12 +570,13 @@ class CharacterPromptsContainer(QWidget):
         # 기존 캐릭터들에 자동 완성 적용
         for widget in self.character_widgets:
             if hasattr(widget.prompt_edit, 'start_complete_mode'):
-                widget.prompt_edit.start_complete_mode(tag_list)
+                widget.prompt_edit.start_complete_mode(tag_list, tag_index)
             if hasattr(widget.neg_prompt_edit, 'start_complete_mode'):
-                widget.neg_prompt_edit.start_complete_mode(tag_list)
+                widget.neg_prompt_edit.start_complete_mode(tag_list, tag_index)
                 
         # 이후 새로 추가되는 캐릭터에도 적용하기 위해 태그 목록 저장
         self.tag_list = tag_list
+        self.tag_index = tag_index
 
     def resizeEvent(self, event):
         """창 크기 변경 시 처리"""
@@ -1,4 +1,7 @@
 import re
+import heapq
+from array import array
+from bisect import bisect_left
 from dataclasses import dataclass
 from typing import Optional
 
@@ -12,6 +15,9 @@ logger = get_logger()
 
 # complete_target_stringset = string.ascii_letters + string.digits + "~!#$%^&*_+?.-="
 
+COMPLETION_LIMIT = 50   # 접두사/포함 검색 결과 최대 개수 (각각)
+NGRAM_SIZE = 3          # 포함 검색용 n-gram 길이
+
 
 @dataclass
 class TagData:
@@ -80,14 +86,101 @@ def format_tag_display(tag: TagData) -> str:
     return f"{tag.name}[{tag.post_count}]"
 
 
+def _tag_name(word: str) -> str:
+    """표시 문자열에서 "[숫자]" 부분을 제거한 소문자 태그명"""
+    word_lower = word.lower()
+    return word_lower.split('[')[0] if '[' in word_lower else word_lower
+
+
+class TagIndex:
+    """태그 자동 완성 검색 인덱스.
+
+    words는 게시물수 내림차순으로 정렬되어 있다고 가정하며, 검색 결과도 그 순서를 유지한다.
+    - 접두사 검색: 정렬된 태그명 배열에서 bisect로 범위를 찾은 뒤 순위가 높은 항목만 선택
+    - 포함 검색: n-gram 역색인에서 가장 짧은 posting 목록만 확인
+    """
+
+    def __init__(self, words: list, sorted_ranks: Optional[array] = None, postings: Optional[dict] = None):
+        self.words = words
+        self._names = [_tag_name(word) for word in words]
+
+        # sorted_ranks/postings가 주어지면 (tag_cache에 저장된 인덱스) 그대로 사용
+        if sorted_ranks is None:
+            sorted_ranks = array('I', sorted(range(len(self._names)), key=self._names.__getitem__))
+        self._sorted_ranks = sorted_ranks
+        self._sorted_names = [self._names[i] for i in sorted_ranks]
+
+        if postings is None:
+            building = {}
+            for rank, name in enumerate(self._names):
+                for gram in {name[i:i + NGRAM_SIZE] for i in range(len(name) - NGRAM_SIZE + 1)}:
+                    building.setdefault(gram, []).append(rank)
+            postings = {gram: array('I', ranks) for gram, ranks in building.items()}
+        self._postings = postings
+
+    def to_arrays(self) -> tuple:
+        """직렬화용 (sorted_ranks, grams, offsets, flat_postings) 반환"""
+        grams = list(self._postings)
+        offsets = array('I', [0])
+        flat_postings = array('I')
+        for gram in grams:
+            flat_postings.extend(self._postings[gram])
+            offsets.append(len(flat_postings))
+        return array('I', self._sorted_ranks), grams, offsets, flat_postings
+
+    @classmethod
+    def from_arrays(cls, words: list, sorted_ranks, grams: list, offsets, flat_postings) -> "TagIndex":
+        """to_arrays() 결과로부터 인덱스 복원 (posting 목록은 복사 없이 슬라이스로 참조)"""
+        view = memoryview(flat_postings)
+        postings = {gram: view[offsets[i]:offsets[i + 1]] for i, gram in enumerate(grams)}
+        return cls(words, sorted_ranks, postings)
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def search(self, normalized: str, with_contains: bool) -> list:
+        """접두사 일치 항목 뒤에 (접두사가 아닌) 포함 일치 항목을 붙여 반환"""
+        prefix_ranks = self._prefix_ranks(normalized)
+        contains_ranks = self._contains_ranks(normalized) if with_contains else []
+        return [self.words[rank] for rank in prefix_ranks + contains_ranks]
+
+    def _prefix_ranks(self, normalized: str) -> list:
+        lo = bisect_left(self._sorted_names, normalized)
+        hi = bisect_left(self._sorted_names, normalized + "\U0010ffff", lo)
+        if hi - lo <= COMPLETION_LIMIT:
+            return sorted(self._sorted_ranks[lo:hi])
+        return heapq.nsmallest(COMPLETION_LIMIT, self._sorted_ranks[lo:hi])
+
+    def _contains_ranks(self, normalized: str) -> list:
+        if len(normalized) < NGRAM_SIZE:
+            candidates = range(len(self._names))
+        else:
+            grams = {normalized[i:i + NGRAM_SIZE] for i in range(len(normalized) - NGRAM_SIZE + 1)}
+            posting_lists = [self._postings.get(gram) for gram in grams]
+            if not all(posting_lists):
+                return []
+            candidates = min(posting_lists, key=len)
+
+        result = []
+        for rank in candidates:
+            name = self._names[rank]
+            if normalized in name and not name.startswith(normalized):
+                result.append(rank)
+                if len(result) >= COMPLETION_LIMIT:
+                    break
+        return result
+
+
 class CustomCompleter(QCompleter):
-    def __init__(self, words, parent=None):
+    def __init__(self, words, parent=None, tag_index: Optional[TagIndex] = None):
         logger.debug(f"CustomCompleter 초기화: {len(words)}개 단어")
-        super().__init__(words, parent)
+        super().__init__(parent)
         self.words = words
+        # 인덱스는 CompletionTagLoadThread에서 미리 만들어 여러 에디터가 공유
+        self.tag_index = tag_index if tag_index is not None else TagIndex(words)
         self.setCaseSensitivity(Qt.CaseInsensitive)
         self.setFilterMode(Qt.MatchContains)
-        self.model = QStringListModel(words, self)
+        self.model = QStringListModel(self)
         self.setModel(self.model)
 
     def setCompletionPrefix(self, prefix):
@@ -101,24 +194,7 @@ class CustomCompleter(QCompleter):
         normalized = prefix.replace(" ", "_").lower()
         is_add_mode = len(normalized) > 3
 
-        prefix_matches = []
-        contains_matches = []
-
-        for word in self.words:
-            word_lower = word.lower()
-            # "[숫자]" 부분 제거 후 비교
-            tag_part = word_lower.split('[')[0] if '[' in word_lower else word_lower
-            if tag_part.startswith(normalized):
-                if len(prefix_matches) < 50:
-                    prefix_matches.append(word)
-            elif is_add_mode and normalized in tag_part:
-                if len(contains_matches) < 50:
-                    contains_matches.append(word)
-            # Early exit when both lists are full
-            if len(prefix_matches) >= 50 and len(contains_matches) >= 50:
-                break
-
-        filtered = prefix_matches + contains_matches
+        filtered = self.tag_index.search(normalized, is_add_mode)
         self.model.setStringList(filtered)
         super().setCompletionPrefix(prefix)
         self.complete()
@@ -384,14 +460,14 @@ class CompletionTextEdit(QTextEdit):
         return selections
     
     # 아래는 기존 자동 완성 기능 메서드들
-    def start_complete_mode(self, tag_list):
+    def start_complete_mode(self, tag_list, tag_index=None):
         logger.debug(f"start_complete_mode 호출: {len(tag_list)}개 태그")
         if not tag_list:
             logger.warning("태그 목록이 비어 있어 자동 완성을 설정하지 않습니다.")
             return
 
         try:
-            completer = CustomCompleter(tag_list)
+            completer = CustomCompleter(tag_list, tag_index=tag_index)
             self.setCompleter(completer)
             logger.info("자동 완성 설정 완료")
         except Exception as e:
@@ -1,4 +1,5 @@
 import json
+import os
 
 COLOR = type('COLOR', (), {
     'BUTTON_CUSTOM': '#559977',
@@ -21,6 +22,9 @@ RESOLUTION_FAMILIY = {
 # consts.py 파일에서
 DEFAULT_TAGCOMPLETION_PATH = "./danbooru_tags_post_count.csv"  # 상대 경로로 설정
 
+# 태그 사전 등 재생성 가능한 캐시 파일 저장 위치 (로그 폴더와 같은 사용자 폴더 아래)
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), "NAI-Auto-Generator", "cache")
+
 
 def prettify_naidict(d, additional_dict=None):
     """NovelAI 이미지 메타데이터를 보기 좋게 정렬하여 표시"""
@@ -1,6 +1,9 @@
 import os
 import io
 import base64
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import onnxruntime as ort
 import csv
 from PIL import Image
@@ -17,6 +20,12 @@ LIST_MODEL = ("wd-v1-4-moat-tagger-v2",
               "wd-v1-4-convnext-tagger-v2", "wd-v1-4-convnext-tagger",
               "wd-v1-4-convnextv2-tagger-v2", "wd-v1-4-vit-tagger-v2")
 
+# 메모리에 유지할 InferenceSession 개수 (모델 하나가 수백 MB를 차지함)
+DEFAULT_SESSION_CACHE_SIZE = 2
+# tag_many에서 ONNX 한 번에 넣는 최대 이미지 수 (448x448 입력 기준 이미지당 약 2.4MB)
+DEFAULT_TAG_BATCH_SIZE = 16
+PREPROCESS_WORKERS = min(4, os.cpu_count() or 1)
+
 
 def download_file(url, dst):
     try:
@@ -48,8 +57,68 @@ def convert_src_to_imagedata(img_path, quality=100):
     return base64.b64encode(buf.getvalue()).decode("utf-8")
 
 
+def _file_key(path):
+    """(경로, mtime, 크기) - 파일이 교체되면 캐시 항목을 다시 만들기 위한 키"""
+    stat = os.stat(path)
+    return path, stat.st_mtime_ns, stat.st_size
+
+
+def _preprocess_image(image, height):
+    """긴 변을 height에 맞춰 줄이고 흰색으로 채운 정사각형 BGR float32 배열 (H, W, 3)"""
+    ratio = float(height) / max(image.size)
+    new_size = tuple([int(x * ratio) for x in image.size])
+    image = image.resize(new_size, Image.LANCZOS)
+    square = Image.new("RGB", (height, height), (255, 255, 255))
+    square.paste(
+        image, ((height - new_size[0]) // 2, (height - new_size[1]) // 2))
+
+    image = np.asarray(square, dtype=np.float32)
+    return image[:, :, ::-1]  # RGB -> BGR
+
+
+class TagTable:
+    """selected_tags.csv를 한 번 파싱한 결과.
+
+    general_index/character_index는 각 카테고리(0: general, 4: character)가
+    시작하는 행 위치이며 모델 출력 확률 배열의 인덱스와 같다.
+    """
+
+    def __init__(self, names, general_index, character_index):
+        self.names = np.array(names, dtype=object)
+        self.general_index = general_index
+        self.character_index = character_index
+        self._display = {}
+
+    @classmethod
+    def from_csv(cls, csv_path):
+        names = []
+        general_index = None
+        character_index = None
+        with open(csv_path, encoding='utf-8') as f:
+            reader = csv.reader(f)
+            next(reader)
+            for row in reader:
+                if len(row) < 3:
+                    continue
+                if general_index is None and row[2] == "0":
+                    general_index = reader.line_num - 2
+                elif character_index is None and row[2] == "4":
+                    character_index = reader.line_num - 2
+                names.append(row[1])
+        return cls(names, general_index, character_index)
+
+    def display_names(self, replace_underscore):
+        """replace_underscore 설정에 맞춘 태그 문자열 배열"""
+        names = self._display.get(replace_underscore)
+        if names is None:
+            names = np.array([n.replace("_", " ") for n in self.names], dtype=object) \
+                if replace_underscore else self.names
+            self._display[replace_underscore] = names
+        return names
+
+
 class DanbooruTagger():
-    def __init__(self, models_dir):
+    def __init__(self, models_dir, session_cache_size=DEFAULT_SESSION_CACHE_SIZE):
         self.models_dir = models_dir
         self.options = {
             "model_name": DEFAULT_MODEL,
@@ -57,86 +126,129 @@ class DanbooruTagger():
             "character_threshold": 0.85,
             "replace_underscore": True,
             "trailing_comma": False,
-            "exclude_tags": ""
+            "exclude_tags": "",
+            # CPU 추론 스레드 수 (0이면 onnxruntime 기본값)
+            "intra_op_threads": 0,
+            "inter_op_threads": 0
         }
+        self.session_cache_size = session_cache_size
+        self._sessions = OrderedDict()  # (모델 파일 키, 스레드 설정) -> InferenceSession
+        self._tag_tables = {}  # CSV 파일 키 -> TagTable
+        self._lock = threading.Lock()
 
     def get_installed_models(self):
         create_folder_if_not_exists(self.models_dir)
         return list(filter(lambda x: x.endswith(".onnx"), os.listdir(self.models_dir)))
 
+    def _make_session_options(self):
+        sess_options = ort.SessionOptions()
+        sess_options.intra_op_num_threads = int(self.options.get('intra_op_threads') or 0)
+        sess_options.inter_op_num_threads = int(self.options.get('inter_op_threads') or 0)
+        sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        return sess_options
+
+    def get_session(self, model_path):
+        """모델 파일별 InferenceSession (LRU, 파일이 바뀌면 다시 로드)"""
+        key = (_file_key(model_path),
+               self.options.get('intra_op_threads'), self.options.get('inter_op_threads'))
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is not None:
+                self._sessions.move_to_end(key)
+                return session
+
+            # 같은 경로의 이전 버전/설정 세션은 바로 버림
+            for stale in [k for k in self._sessions if k[0][0] == model_path]:
+                del self._sessions[stale]
+
+            logger.info(f"Loading tagger model: {model_path}")
+            session = ort.InferenceSession(
+                model_path, sess_options=self._make_session_options(),
+                providers=ort.get_available_providers())
+            self._sessions[key] = session
+            while len(self._sessions) > max(1, self.session_cache_size):
+                self._sessions.popitem(last=False)
+            return session
+
+    def get_tag_table(self, csv_path):
+        key = _file_key(csv_path)
+        with self._lock:
+            table = self._tag_tables.get(key)
+            if table is None:
+                for stale in [k for k in self._tag_tables if k[0] == csv_path]:
+                    del self._tag_tables[stale]
+                table = TagTable.from_csv(csv_path)
+                self._tag_tables[key] = table
+            return table
+
+    def clear_cache(self):
+        with self._lock:
+            self._sessions.clear()
+            self._tag_tables.clear()
+
     def tag(self, image):
+        return self.tag_many([image])[0]
+
+    def tag_many(self, images, batch_size=DEFAULT_TAG_BATCH_SIZE):
+        """여러 이미지를 배치로 태깅하여 이미지별 태그 문자열 목록을 반환.
+
+        전처리는 스레드 풀에서 병렬로, 추론은 batch_size 단위로 한 번씩 실행한다.
+        모델이 설치되어 있지 않으면 각 항목이 None 이다.
+        """
         model_name = self.options['model_name']
-        threshold = self.options['threshold']
-        character_threshold = self.options['character_threshold']
-        replace_underscore = self.options['replace_underscore']
-        trailing_comma = self.options['trailing_comma']
-        exclude_tags = self.options['exclude_tags']
 
         if model_name.endswith(".onnx"):
             model_name = model_name[0:-5]
-        installed = self.get_installed_models()
-        if not any(model_name + ".onnx" in s for s in installed):
+        name = os.path.join(self.models_dir, model_name + ".onnx")
+        if not os.path.isfile(name):
             logger.warning(f"Model not installed: {model_name}")
-            return
+            return [None] * len(images)
 
-        name = os.path.join(self.models_dir, model_name + ".onnx")
-        model = ort.InferenceSession(
-            name, providers=ort.get_available_providers())
+        model = self.get_session(name)
+        table = self.get_tag_table(os.path.join(self.models_dir, model_name + ".csv"))
 
         input = model.get_inputs()[0]
-        height = input.shape[1]
-
-        # Reduce to max size and pad with white
-        ratio = float(height) / max(image.size)
-        new_size = tuple([int(x * ratio) for x in image.size])
-        image = image.resize(new_size, Image.LANCZOS)
-        square = Image.new("RGB", (height, height), (255, 255, 255))
-        square.paste(
-            image, ((height - new_size[0]) // 2, (height - new_size[1]) // 2))
-
-        image = np.array(square).astype(np.float32)
-        image = image[:, :, ::-1]  # RGB -> BGR
-        image = np.expand_dims(image, 0)
-
-        # Read all tags from csv and locate start of each category
-        tags = []
-        general_index = None
-        character_index = None
-        with open(os.path.join(self.models_dir, model_name + ".csv"), encoding='utf-8') as f:
-            reader = csv.reader(f)
-            next(reader)
-            for row in reader:
-                if len(row) < 3:
-                    continue
-                if general_index is None and row[2] == "0":
-                    general_index = reader.line_num - 2
-                elif character_index is None and row[2] == "4":
-                    character_index = reader.line_num - 2
-                if len(row) > 1:
-                    if replace_underscore:
-                        tags.append(row[1].replace("_", " "))
-                    else:
-                        tags.append(row[1])
-
+        # WD14 태거는 NHWC [N, H, W, 3], 그 외 모델은 NCHW [N, 3, H, W]
+        channels_last = input.shape[-1] == 3
+        height = input.shape[1] if channels_last else input.shape[2]
+        # 배치 차원이 고정(1)인 모델은 한 장씩 실행
+        if isinstance(input.shape[0], int):
+            batch_size = input.shape[0]
         label_name = model.get_outputs()[0].name
-        probs = model.run([label_name], {input.name: image})[0]
-
-        result = list(zip(tags, probs[0]))
-
-        # rating = max(result[:general_index], key=lambda x: x[1])
-        general = [item for item in result[general_index:character_index]
-                   if item[1] > threshold]
-        character = [item for item in result[character_index:]
-                     if item[1] > character_threshold]
 
-        all = character + general
-        remove = [s.strip() for s in exclude_tags.lower().split(",")]
-        all = [tag for tag in all if tag[0] not in remove]
-
-        res = ("" if trailing_comma else ", ").join((item[0].replace(
-            "(", "\\(").replace(")", "\\)") + (", " if trailing_comma else "") for item in all))
-
-        return res
+        results = []
+        with ThreadPoolExecutor(max_workers=PREPROCESS_WORKERS) as executor:
+            for start in range(0, len(images), max(1, batch_size)):
+                chunk = images[start:start + max(1, batch_size)]
+                batch = np.stack(list(executor.map(lambda img: _preprocess_image(img, height), chunk)))
+                if not channels_last:
+                    batch = batch.transpose(0, 3, 1, 2)
+                probs = model.run([label_name], {input.name: batch})[0]
+                results.extend(self._format_tags(table, row) for row in probs)
+        return results
+
+    def _format_tags(self, table, probs):
+        threshold = self.options['threshold']
+        character_threshold = self.options['character_threshold']
+        trailing_comma = self.options['trailing_comma']
+        exclude_tags = self.options['exclude_tags']
+        names = table.display_names(self.options['replace_underscore'])
+
+        # rating = probs[:general_index].argmax()
+        general_start = table.general_index
+        character_start = table.character_index
+        general = np.flatnonzero(probs[general_start:character_start] > threshold) + (general_start or 0)
+        if character_start is None:
+            character = np.empty(0, dtype=np.intp)
+        else:
+            character = np.flatnonzero(probs[character_start:] > character_threshold) + character_start
+        selected = names[np.concatenate((character, general))]
+
+        remove = {s.strip() for s in exclude_tags.lower().split(",")}
+        selected = [tag for tag in selected if tag not in remove]
+
+        return ("" if trailing_comma else ", ").join((tag.replace(
+            "(", "\\(").replace(")", "\\)") + (", " if trailing_comma else "") for tag in selected))
 
     def download_model(self, model):
         installed = self.get_installed_models()
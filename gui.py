@@ -34,7 +34,7 @@ from gui_utils import (resource_path, create_folder_if_not_exists, prettify_dict
                        MAX_COUNT_FOR_WHILE)
 from gui_credentials import save_credential, load_credential, delete_credential
 from gui_workers import (CompletionTagLoadThread, AutoGenerateThread, GenerateThread,
-                         TokenValidateThread, AnlasThread, _threadfunc_generate_image)
+                         TokenValidateThread, _threadfunc_generate_image)
 from gui_network import NetworkMonitor, NetworkMixin
 from gui_settings_io import SettingsIOMixin
 from gui_image_handlers import ImageHandlersMixin
@@ -45,6 +45,7 @@ from consts import COLOR, DEFAULT_PARAMS, DEFAULT_PATH, RESOLUTION_FAMILIY_MASK,
 
 import naiinfo_getter
 from nai_generator import NAIGenerator, NAIAction, NAISessionManager
+from anlas_tracker import AnlasTracker, DEFAULT_REFRESH_INTERVAL as DEFAULT_ANLAS_REFRESH_INTERVAL
 from wildcard_applier import WildcardApplier
 from danbooru_tagger import DanbooruTagger
 from completer import parse_tag_line, format_tag_display, TagData
@@ -67,6 +68,9 @@ if 'sys._MEIPASS' in dir(sys):
 
 
 class NAIAutoGeneratorWindow(QMainWindow, NetworkMixin, SettingsIOMixin, ImageHandlersMixin, EnhanceMixin, GenerationMixin):
+    # AnlasTracker 백그라운드 스레드 → GUI 스레드 (잔액 또는 None, 추정 여부)
+    anlas_changed = pyqtSignal(object, bool)
+
     def __init__(self, app):
         super().__init__()
         self.app = app
@@ -108,6 +112,7 @@ class NAIAutoGeneratorWindow(QMainWindow, NetworkMixin, SettingsIOMixin, ImageHa
         self.enhance_bulk_mode = False  # 벌크 모드 활성화 여부
         self.enhance_bulk_thread = None  # 벌크 처리 스레드
         self.enhance_bulk_stopped = False  # 벌크 처리 중단 플래그
+        self.enhance_scan_thread = None  # 폴더 메타데이터 스캔 스레드
 
         self.last_generated_image = None  # 마지막 생성된 이미지 저장
 
@@ -972,6 +977,17 @@ class NAIAutoGeneratorWindow(QMainWindow, NetworkMixin, SettingsIOMixin, ImageHa
         # 세션 관리자 생성
         self.session_manager = NAISessionManager(self.nai)
         self.nai.session_manager = self.session_manager  # 양방향 참조 설정
+
+        # Anlas 잔액: 생성마다 조회하지 않고 추정 후 백그라운드에서 모아서 조회
+        self.anlas_tracker = AnlasTracker(
+            fetch=lambda: self.nai.get_anlas(),
+            on_change=self.anlas_changed.emit,
+            refresh_interval=self.settings.value(
+                "anlas_refresh_interval", DEFAULT_ANLAS_REFRESH_INTERVAL, type=float),
+            get_tier=lambda: self.nai.subscription_tier,
+            on_fetch_error=self.session_manager.on_keepalive_error)
+        self.anlas_changed.connect(self._on_anlas_changed)
+        self.session_manager.anlas_tracker = self.anlas_tracker
         
         # 정기 세션 확인을 위한 타이머 시작
         self.session_timer = QTimer(self)
@@ -1029,6 +1045,9 @@ class NAIAutoGeneratorWindow(QMainWindow, NetworkMixin, SettingsIOMixin, ImageHa
     def init_tagger(self):
         self.dtagger = DanbooruTagger(self.settings.value(
             "path_models", os.path.abspath(DEFAULT_PATH["path_models"])))
+        # CPU 추론 스레드 수 (0이면 onnxruntime 기본값)
+        for key in ("intra_op_threads", "inter_op_threads"):
+            self.dtagger.options[key] = int(self.settings.value("tagger_" + key, 0))
 
     def init_completion(self, force_reload=False):
         # 이미 태그가 로드되었는지 확인하는 플래그 추가
@@ -1064,7 +1083,7 @@ class NAIAutoGeneratorWindow(QMainWindow, NetworkMixin, SettingsIOMixin, ImageHa
 
 
 
-    def _on_load_completiontag_sucess(self, tag_list):
+    def _on_load_completiontag_sucess(self, tag_list, tag_index=None):
         logger.debug("----자동 완성 적용 시작----")   
         logger.info(f"태그 로딩 완료: {len(tag_list)}개")
         if tag_list:
@@ -1075,7 +1094,7 @@ class NAIAutoGeneratorWindow(QMainWindow, NetworkMixin, SettingsIOMixin, ImageHa
                     if hasattr(self.dict_ui_settings[code], 'start_complete_mode'):
                         logger.error(f"{code} 필드에 자동 완성 적용 시도...")
                         # 태그 목록을 직접 전달 
-                        self.dict_ui_settings[code].start_complete_mode(tag_list)
+                        self.dict_ui_settings[code].start_complete_mode(tag_list, tag_index)
                         logger.error(f"{code} 필드에 자동 완성 활성화됨 ({len(tag_list)}개 태그)")
                     else:
                         logger.error(f"{code} 필드에 start_complete_mode 메서드가 없음")
@@ -1088,7 +1107,7 @@ class NAIAutoGeneratorWindow(QMainWindow, NetworkMixin, SettingsIOMixin, ImageHa
             if hasattr(self, 'character_prompts_container'):
                 try:
                     logger.debug("캐릭터 프롬프트 필드에 자동 완성 적용 시도...")
-                    self.character_prompts_container.set_tag_completion(tag_list)
+                    self.character_prompts_container.set_tag_completion(tag_list, tag_index)
                     logger.info(f"캐릭터 프롬프트 필드에 자동 완성 활성화됨 ({len(tag_list)}개 태그)")
                 except Exception as e:
                     logger.error(f"캐릭터 프롬프트 필드 자동 완성 설정 실패: {str(e)}")
@@ -1519,13 +1538,14 @@ class NAIAutoGeneratorWindow(QMainWindow, NetworkMixin, SettingsIOMixin, ImageHa
         self.prompt_result.setText(content)
 
     def refresh_anlas(self):
-        anlas_thread = AnlasThread(self)
-        anlas_thread.anlas_result.connect(self._on_refresh_anlas)
-        anlas_thread.start()
+        """서버 잔액 조회 요청 (백그라운드, 짧은 간격 안의 요청은 하나로 합침)"""
+        self.anlas_tracker.request_refresh(force=True)
 
-    def _on_refresh_anlas(self, anlas):
-        if anlas == -1:
+    def _on_anlas_changed(self, anlas, is_estimate):
+        if anlas is None:
             anlas = "?"
+        elif is_estimate:
+            anlas = f"~{anlas}"
         self.label_anlas.setText("Anlas: " + str(anlas))
 
     def on_login_result(self, error_code):
@@ -1536,6 +1556,7 @@ class NAIAutoGeneratorWindow(QMainWindow, NetworkMixin, SettingsIOMixin, ImageHa
             self.refresh_anlas()  # 이 부분이 제대로 실행되는지 확인
         else:
             self.nai = NAIGenerator()  # reset
+            self.anlas_tracker.reset()
             self.set_statusbar_text("BEFORE_LOGIN")
             self.label_loginstate.set_logged_in(False)
             self.set_disable_button(True)
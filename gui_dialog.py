@@ -3,7 +3,6 @@ import sys
 import re
 import webbrowser
 import time
-import io
 from PIL import Image
 import numpy as np
 
@@ -14,7 +13,7 @@ from PyQt5.QtWidgets import (QDialog, QLabel, QPushButton, QVBoxLayout,
                              QComboBox, QSlider, QApplication, QSpinBox, QDoubleSpinBox,
                              QColorDialog, QScrollArea, QTabWidget,
                              QListWidget, QListWidgetItem, QStackedWidget, QFrame)
-from PyQt5.QtCore import QThread, pyqtSignal, Qt, QPoint, QSize
+from PyQt5.QtCore import QThread, pyqtSignal, Qt, QPoint, QSize, QRect
 from PyQt5.QtGui import QFont, QColor, QPalette, QPixmap, QImage, QPainter, QPen, QCursor
 
 from consts import DEFAULT_PATH, DEFAULT_TAGCOMPLETION_PATH, DEFAULT_CUSTOM_RESOLUTIONS
@@ -1303,19 +1302,27 @@ class WorkerThread(QThread):
 
 
 class MaskCanvas(QLabel):
-    """Canvas widget for painting inpainting masks with 8x8 grid"""
+    """Canvas widget for painting inpainting masks with 8x8 grid
+
+    The mask is a boolean cell array (grid_data[gy, gx]); the exported mask is
+    that array upscaled to 8×8 blocks. The image is pre-rendered twice with the
+    grid baked in (plain and red-tinted); painting copies only the changed
+    cells from the tinted layer into the display pixmap and repaints that region.
+    """
 
     def __init__(self, parent=None):
         super().__init__(parent)
         self.parent_dialog = parent
         self.image = None
-        self.mask = None
         self.drawing = False
         self.last_grid_pos = None  # Track last grid position (not pixel position)
         self.brush_size = 1  # Grid cells (not pixels)
-        self.grid_data = None  # 2D array of grid cells
+        self.grid_data = None  # (grid_height, grid_width) bool array, True = inpaint
         self.grid_width = 0
         self.grid_height = 0
+        self.base_layer = None     # image + grid (QImage)
+        self.painted_layer = None  # image + red overlay + grid (QImage)
+        self.display_pixmap = None
         self.setMouseTracking(True)
         self.setCursor(QCursor(Qt.CrossCursor))
 
@@ -1327,58 +1334,97 @@ class MaskCanvas(QLabel):
         w, h = self.image.size
         self.grid_width = w // 8
         self.grid_height = h // 8
-        self.grid_data = [[0 for _ in range(self.grid_height)] for _ in range(self.grid_width)]
-
-        # Create blank GRAYSCALE mask (pure black = 0)
-        # CRITICAL: Use 'L' mode (grayscale), NOT 'RGBA', to avoid color bleeding
-        self.mask = Image.new('L', self.image.size, 0)
+        self.grid_data = np.zeros((self.grid_height, self.grid_width), dtype=bool)
 
         logger.info(f"Initialized grid canvas: {w}×{h} pixels = {self.grid_width}×{self.grid_height} grid cells")
 
-        # Convert PIL image to QPixmap for display
+        self.build_layers()
         self.update_display()
 
-    def update_display(self):
-        """Update the displayed image with mask overlay and grid"""
-        if self.image is None or self.mask is None:
-            return
+    def build_layers(self):
+        """Render the plain and red-tinted layers (grid included) once per image"""
+        base = self.image.convert('RGBA')
+        painted = Image.alpha_composite(base, Image.new('RGBA', base.size, (255, 0, 0, 128)))
+        self.base_layer = self._layer_with_grid(base)
+        self.painted_layer = self._layer_with_grid(painted)
 
-        # Create composite image with mask overlay
-        display_image = self.image.copy().convert('RGBA')
-
-        # Create red semi-transparent overlay for masked areas
-        # Use grayscale mask values to create overlay
-        mask_array = np.array(self.mask)  # Now pure grayscale
-        overlay = np.zeros((*mask_array.shape, 4), dtype=np.uint8)
-        overlay[mask_array > 0] = [255, 0, 0, 128]  # Red with 50% alpha where mask is white
-
-        overlay_image = Image.fromarray(overlay, 'RGBA')
-        display_image = Image.alpha_composite(display_image, overlay_image)
-
-        # Convert to QPixmap
-        img_byte_array = io.BytesIO()
-        display_image.save(img_byte_array, format='PNG')
-        qimage = QImage.fromData(img_byte_array.getvalue())
-        pixmap = QPixmap.fromImage(qimage)
+    def _layer_with_grid(self, rgba_image):
+        w, h = rgba_image.size
+        qimage = QImage(rgba_image.tobytes(), w, h, w * 4, QImage.Format_RGBA8888) \
+            .convertToFormat(QImage.Format_ARGB32_Premultiplied)
 
         # Draw 8×8 grid overlay
-        painter = QPainter(pixmap)
+        painter = QPainter(qimage)
         painter.setPen(QPen(QColor(0, 255, 0, 80), 1, Qt.SolidLine))  # Semi-transparent green
-
-        # Draw vertical lines
         for gx in range(self.grid_width + 1):
-            x = gx * 8
-            painter.drawLine(x, 0, x, self.image.size[1])
-
-        # Draw horizontal lines
+            painter.drawLine(gx * 8, 0, gx * 8, h)
         for gy in range(self.grid_height + 1):
-            y = gy * 8
-            painter.drawLine(0, y, self.image.size[0], y)
+            painter.drawLine(0, gy * 8, w, gy * 8)
+        painter.end()
+        return qimage
+
+    @staticmethod
+    def _layer_array(qimage):
+        """Read-only H×W×4 view of a 32-bit QImage"""
+        ptr = qimage.constBits()
+        ptr.setsize(qimage.byteCount())
+        return np.frombuffer(ptr, np.uint8).reshape(qimage.height(), qimage.bytesPerLine() // 4, 4)[:, :qimage.width()]
+
+    def mask_pixels(self):
+        """Grid cells upscaled to an image-sized bool array (remainder pixels stay False)"""
+        w, h = self.image.size
+        painted = np.zeros((h, w), dtype=bool)
+        painted[:self.grid_height * 8, :self.grid_width * 8] = \
+            self.grid_data.repeat(8, axis=0).repeat(8, axis=1)
+        return painted
 
+    def update_display(self):
+        """Rebuild the whole display from the grid (image load, clear, loaded mask)"""
+        if self.image is None or self.grid_data is None:
+            return
+
+        if not self.grid_data.any():
+            display = self.base_layer
+        else:
+            painted = self.mask_pixels()
+            composed = np.where(painted[..., None], self._layer_array(self.painted_layer),
+                                self._layer_array(self.base_layer))
+            composed = np.ascontiguousarray(composed)
+            h, w = painted.shape
+            display = QImage(composed.data, w, h, w * 4, QImage.Format_ARGB32_Premultiplied)
+
+        self.display_pixmap = QPixmap.fromImage(display)
+        self.resize(self.display_pixmap.size())
+        self.update()
+
+    def update_cells(self, cells):
+        """Copy the given painted grid cells into the display and repaint only them"""
+        if not cells or self.display_pixmap is None:
+            return
+        dirty = QRect()
+        painter = QPainter(self.display_pixmap)
+        painter.setCompositionMode(QPainter.CompositionMode_Source)
+        for gx, gy in cells:
+            # A cell owns its left/top grid line pixels, so the 8×8 block is exact
+            rect = QRect(gx * 8, gy * 8, 8, 8)
+            painter.drawImage(rect, self.painted_layer, rect)
+            dirty = dirty.united(rect)
         painter.end()
+        self.update(dirty)
 
-        self.setPixmap(pixmap)
-        self.resize(pixmap.size())
+    def paintEvent(self, event):
+        if self.display_pixmap is None:
+            super().paintEvent(event)
+            return
+        painter = QPainter(self)
+        rect = event.rect()
+        painter.drawPixmap(rect, self.display_pixmap, rect)
+        painter.end()
+
+    def sizeHint(self):
+        if self.display_pixmap is not None:
+            return self.display_pixmap.size()
+        return super().sizeHint()
 
     def pixel_to_grid(self, pixel_x, pixel_y):
         """Convert pixel coordinates to grid coordinates"""
@@ -1390,41 +1436,26 @@ class MaskCanvas(QLabel):
         return gx, gy
 
     def fill_grid_cell(self, gx, gy):
-        """Fill grid cells based on brush size (brush_size × brush_size area)"""
-        # Calculate brush area - centered on clicked cell
-        half_brush = self.brush_size // 2
-
-        # Get mask array once for efficiency
-        mask_array = np.array(self.mask)
-        w, h = self.image.size
-
-        # Fill brush_size × brush_size area of grid cells
-        for offset_y in range(-half_brush, half_brush + (self.brush_size % 2)):
-            for offset_x in range(-half_brush, half_brush + (self.brush_size % 2)):
-                target_gx = gx + offset_x
-                target_gy = gy + offset_y
-
-                # Check bounds
-                if target_gx < 0 or target_gx >= self.grid_width or target_gy < 0 or target_gy >= self.grid_height:
-                    continue
+        """Fill grid cells based on brush size (brush_size × brush_size area)
 
-                # Mark grid cell as painted
-                self.grid_data[target_gx][target_gy] = 1
-
-                # Fill corresponding 8×8 block in mask
-                y1 = target_gy * 8
-                y2 = min((target_gy + 1) * 8, h)
-                x1 = target_gx * 8
-                x2 = min((target_gx + 1) * 8, w)
-
-                # Fill block in mask (pure grayscale white = 255)
-                mask_array[y1:y2, x1:x2] = 255
-
-        # Update mask image once after all cells filled
-        self.mask = Image.fromarray(mask_array, mode='L')
+        Returns the list of cells that were newly painted.
+        """
+        # Brush area centered on the clicked cell, clipped to the grid
+        half_brush = self.brush_size // 2
+        x1 = max(gx - half_brush, 0)
+        x2 = min(gx + half_brush + (self.brush_size % 2), self.grid_width)
+        y1 = max(gy - half_brush, 0)
+        y2 = min(gy + half_brush + (self.brush_size % 2), self.grid_height)
+        if x1 >= x2 or y1 >= y2:
+            return []
+
+        area = self.grid_data[y1:y2, x1:x2]
+        new_y, new_x = np.nonzero(~area)
+        area[:] = True
+        return list(zip((new_x + x1).tolist(), (new_y + y1).tolist()))
 
     def draw_grid_line(self, start_gx, start_gy, end_gx, end_gy):
-        """Draw a line on the grid using Bresenham's algorithm"""
+        """Draw a line on the grid using Bresenham's algorithm. Returns the changed cells."""
         # Bresenham's line algorithm for grid cells
         dx = abs(end_gx - start_gx)
         dy = abs(end_gy - start_gy)
@@ -1433,9 +1464,10 @@ class MaskCanvas(QLabel):
         err = dx - dy
 
         gx, gy = start_gx, start_gy
+        changed = []
 
         while True:
-            self.fill_grid_cell(gx, gy)
+            changed.extend(self.fill_grid_cell(gx, gy))
 
             if gx == end_gx and gy == end_gy:
                 break
@@ -1448,23 +1480,23 @@ class MaskCanvas(QLabel):
                 err += dx
                 gy += sy
 
+        return changed
+
     def mousePressEvent(self, event):
         """Handle mouse press to start drawing"""
-        if event.button() == Qt.LeftButton and self.mask is not None:
+        if event.button() == Qt.LeftButton and self.grid_data is not None:
             self.drawing = True
             gx, gy = self.pixel_to_grid(event.pos().x(), event.pos().y())
             self.last_grid_pos = (gx, gy)
-            self.fill_grid_cell(gx, gy)
-            self.update_display()
+            self.update_cells(self.fill_grid_cell(gx, gy))
 
     def mouseMoveEvent(self, event):
         """Handle mouse move to draw mask"""
-        if self.drawing and self.mask is not None:
+        if self.drawing and self.grid_data is not None:
             gx, gy = self.pixel_to_grid(event.pos().x(), event.pos().y())
             if self.last_grid_pos and (gx, gy) != self.last_grid_pos:
                 # Draw line from last grid position to current
-                self.draw_grid_line(self.last_grid_pos[0], self.last_grid_pos[1], gx, gy)
-                self.update_display()
+                self.update_cells(self.draw_grid_line(self.last_grid_pos[0], self.last_grid_pos[1], gx, gy))
             self.last_grid_pos = (gx, gy)
 
     def mouseReleaseEvent(self, event):
@@ -1475,17 +1507,16 @@ class MaskCanvas(QLabel):
 
     def clear_mask(self):
         """Clear the entire mask"""
-        if self.mask is not None:
-            # Reset grid data
-            self.grid_data = [[0 for _ in range(self.grid_height)] for _ in range(self.grid_width)]
-            # Reset to black grayscale mask (0 = preserve, 255 = inpaint)
-            self.mask = Image.new('L', self.image.size, 0)
+        if self.grid_data is not None:
+            self.grid_data.fill(False)
             self.update_display()
             logger.info("Cleared mask grid")
 
     def get_mask(self):
-        """Get the current mask as PIL Image"""
-        return self.mask.copy() if self.mask else None
+        """Get the current mask as PIL Image (0 = preserve, 255 = inpaint)"""
+        if self.grid_data is None:
+            return None
+        return Image.fromarray(self.mask_pixels().astype(np.uint8) * 255, mode='L')
 
     def set_brush_size(self, size):
         """Set the brush size for painting (grid cells, not pixels)"""
@@ -1497,24 +1528,11 @@ class MaskCanvas(QLabel):
             # Ensure mask size matches image size
             if mask.size != self.image.size:
                 mask = mask.resize(self.image.size, Image.LANCZOS)
-            self.mask = mask.copy()
+            mask_array = np.array(mask if mask.mode == 'L' else mask.convert('L'))
 
-            # Rebuild grid_data from mask
-            # Check each 8×8 block to see if it's painted
-            mask_array = np.array(self.mask)
-            w, h = self.image.size
-
-            for gx in range(self.grid_width):
-                for gy in range(self.grid_height):
-                    y1 = gy * 8
-                    y2 = min((gy + 1) * 8, h)
-                    x1 = gx * 8
-                    x2 = min((gx + 1) * 8, w)
-
-                    block = mask_array[y1:y2, x1:x2]
-                    # If ANY pixel in block is white (>127), mark grid cell as painted
-                    if mask_array.ndim == 2 and np.any(block > 127):
-                        self.grid_data[gx][gy] = 1
+            # A grid cell is painted if ANY pixel in its 8×8 block is white (>127)
+            blocks = mask_array[:self.grid_height * 8, :self.grid_width * 8] > 127
+            self.grid_data = blocks.reshape(self.grid_height, 8, self.grid_width, 8).any(axis=(1, 3))
 
             self.update_display()
             logger.info("Loaded existing mask into grid canvas")
@@ -6,14 +6,16 @@ NAIAutoGeneratorWindow에 mix-in되는 Image Enhancement 관련 메서드들.
 """
 
 import os
-import io
 
 from PIL import Image
 from PyQt5.QtCore import QTimer
 from PyQt5.QtWidgets import QFileDialog, QMessageBox
 
 import naiinfo_getter
+from gui_utils import strtobool
+from gui_workers import EnhanceFolderScanThread
 from i18n_manager import tr
+from thumbnail_cache import get_default_cache as get_thumbnail_cache, thumbnail_pixmap_from_image
 from logger import get_logger
 logger = get_logger()
 
@@ -24,7 +26,7 @@ class EnhanceMixin:
     이 Mixin은 다음을 전제합니다:
     - self.enhance_visible, self.enhance_image, self.enhance_path 등 관련 변수
     - self.enhance_metadata, self.enhance_strength, self.enhance_noise, self.enhance_ratio
-    - self.enhance_bulk_mode, self.enhance_image_list 등 벌크 관련 변수
+    - self.enhance_bulk_mode, self.enhance_image_list, self.enhance_scan_thread 등 벌크 관련 변수
     - self.last_generated_image
     - 관련 UI 위젯들 (labels, buttons, sliders)
     - self.on_click_generate_once(): 생성 메서드
@@ -177,18 +179,12 @@ class EnhanceMixin:
                 QMessageBox.warning(self, tr('enhance.invalid_resolution_title', 'Unsupported Resolution'), message)
                 return
 
-            # 미리보기 업데이트
-            thumbnail = self.enhance_image.copy()
-            thumbnail.thumbnail((164, 198), Image.LANCZOS)
-            img_byte_arr = io.BytesIO()
-            thumbnail.save(img_byte_arr, format='PNG')
-            img_byte_arr.seek(0)
+            # 미리보기 업데이트 (썸네일 캐시, 백그라운드 디코딩)
+            def show_thumbnail(pixmap):
+                if pixmap is not None and self.enhance_path == file_path:
+                    self.enhance_image_label.setPixmap(pixmap)
 
-            from PyQt5.QtGui import QPixmap
-            pixmap = QPixmap()
-            pixmap.loadFromData(img_byte_arr.read())
-
-            self.enhance_image_label.setPixmap(pixmap)
+            get_thumbnail_cache().request(file_path, show_thumbnail)
             self.enhance_image_label.setStyleSheet("background-color: rgba(0, 0, 0, 128); border: 2px solid #559977;")
             self.btn_remove_enhance_image.setEnabled(True)
             self.update_enhance_button_state()
@@ -259,18 +255,8 @@ class EnhanceMixin:
                     self.enhance_metadata = None
                     logger.warning(f"No valid metadata found in current image (error_code: {error_code})")
 
-                # 미리보기 업데이트
-                thumbnail = self.enhance_image.copy()
-                thumbnail.thumbnail((164, 198), Image.LANCZOS)
-                img_byte_arr = io.BytesIO()
-                thumbnail.save(img_byte_arr, format='PNG')
-                img_byte_arr.seek(0)
-
-                from PyQt5.QtGui import QPixmap
-                pixmap = QPixmap()
-                pixmap.loadFromData(img_byte_arr.read())
-
-                self.enhance_image_label.setPixmap(pixmap)
+                # 미리보기 업데이트 (PNG 왕복 없이 변환)
+                self.enhance_image_label.setPixmap(thumbnail_pixmap_from_image(self.enhance_image))
                 self.btn_remove_enhance_image.setEnabled(True)
                 logger.info("Using current generated image for enhance")
 
@@ -347,40 +333,83 @@ class EnhanceMixin:
         if folder_path:
             logger.info(f"Selected folder for bulk enhancement: {folder_path}")
             self.enhance_folder_path = folder_path
-            valid_images = []
-            supported_extensions = ['.png', '.jpg', '.jpeg', '.webp']
+            # stealth pnginfo는 전체 픽셀 디코딩이 필요하므로 설정으로 끌 수 있음
+            read_stealth = strtobool(self.settings.value("will_read_stealth_pnginfo", True))
 
-            try:
-                for filename in os.listdir(folder_path):
-                    file_path = os.path.join(folder_path, filename)
-                    if os.path.isfile(file_path):
-                        _, ext = os.path.splitext(filename)
-                        if ext.lower() in supported_extensions:
-                            try:
-                                nai_dict, error_code = naiinfo_getter.get_naidict_from_file(file_path)
-                                if error_code == 3 and nai_dict:
-                                    valid_images.append(file_path)
-                                    logger.debug(f"Valid NAI image found: {filename}")
-                            except Exception as e:
-                                logger.debug(f"Skipping {filename}: {e}")
-
-                if valid_images:
-                    self.enhance_image_list = valid_images
-                    self.enhance_current_index = 0
-                    self.enhance_bulk_mode = True
-                    self.enhance_progress_label.setText(tr('enhance.images_found').format(len(valid_images)))
-                    self.btn_enhance_create.setEnabled(True)
-                    logger.info(f"Found {len(valid_images)} valid NAI images for bulk enhancement")
-                    QMessageBox.information(self, tr('enhance.folder_selected'), tr('enhance.images_found_msg').format(len(valid_images)))
-                else:
-                    self.enhance_bulk_mode = False
-                    self.enhance_progress_label.setText(tr('enhance.no_images_found'))
-                    QMessageBox.warning(self, tr('enhance.no_images'), tr('enhance.no_images_msg'))
-                    logger.warning("No valid NAI images found in selected folder")
+            # 이전 스캔이 진행 중이면 취소 (이후 도착하는 시그널은 sender 확인으로 무시됨)
+            if self.enhance_scan_thread is not None and self.enhance_scan_thread.isRunning():
+                self.enhance_scan_thread.stop()
 
-            except Exception as e:
-                logger.error(f"Error scanning folder: {e}")
-                QMessageBox.critical(self, tr('error'), tr('enhance.folder_scan_error').format(str(e)))
+            self.enhance_image_list = []
+            self.enhance_current_index = 0
+            self.enhance_bulk_mode = False
+            self.btn_enhance_create.setEnabled(False)
+            self.btn_enhance_stop.show()
+            self.btn_enhance_stop.setEnabled(True)
+
+            scan_thread = EnhanceFolderScanThread(self, folder_path, read_stealth)
+            scan_thread.on_found.connect(self._on_enhance_scan_found)
+            scan_thread.on_progress.connect(self._on_enhance_scan_progress)
+            scan_thread.on_finished.connect(self._on_enhance_scan_finished)
+            scan_thread.on_error.connect(self._on_enhance_scan_error)
+            self.enhance_scan_thread = scan_thread
+            scan_thread.start()
+
+    def _is_current_enhance_scan(self):
+        return self.sender() is self.enhance_scan_thread
+
+    def _on_enhance_scan_found(self, file_path):
+        """스캔 중 유효한 NAI 이미지를 찾을 때마다 목록에 추가"""
+        if not self._is_current_enhance_scan():
+            return
+        self.enhance_image_list.append(file_path)
+        logger.debug(f"Valid NAI image found: {os.path.basename(file_path)}")
+
+    def _on_enhance_scan_progress(self, done, total):
+        if not self._is_current_enhance_scan():
+            return
+        self.enhance_progress_label.setText(
+            tr('enhance.scanning').format(done, total, len(self.enhance_image_list)))
+
+    def _on_enhance_scan_finished(self, valid_images, cancelled):
+        if not self._is_current_enhance_scan():
+            return
+        self.enhance_scan_thread = None
+        self.btn_enhance_stop.hide()
+        self.btn_enhance_stop.setEnabled(False)
+
+        # 취소된 스캔의 일부 목록으로는 벌크 모드를 켜지 않음 (폴더 전체가 처리되는 것으로 오해할 수 있음)
+        if valid_images and not cancelled:
+            self.enhance_image_list = valid_images
+            self.enhance_current_index = 0
+            self.enhance_bulk_mode = True
+            self.btn_enhance_create.setEnabled(True)
+            logger.info(f"Found {len(valid_images)} valid NAI images for bulk enhancement")
+        else:
+            self.enhance_image_list = []
+            self.enhance_bulk_mode = False
+            self.update_enhance_button_state()
+
+        if cancelled:
+            self.enhance_progress_label.setText(tr('enhance.scan_cancelled').format(len(valid_images)))
+        elif valid_images:
+            self.enhance_progress_label.setText(tr('enhance.images_found').format(len(valid_images)))
+            QMessageBox.information(self, tr('enhance.folder_selected'), tr('enhance.images_found_msg').format(len(valid_images)))
+        else:
+            self.enhance_progress_label.setText(tr('enhance.no_images_found'))
+            QMessageBox.warning(self, tr('enhance.no_images'), tr('enhance.no_images_msg'))
+            logger.warning("No valid NAI images found in selected folder")
+
+    def _on_enhance_scan_error(self, message):
+        if not self._is_current_enhance_scan():
+            return
+        self.enhance_scan_thread = None
+        self.enhance_image_list = []
+        self.enhance_bulk_mode = False
+        self.btn_enhance_stop.hide()
+        self.btn_enhance_stop.setEnabled(False)
+        self.update_enhance_button_state()
+        QMessageBox.critical(self, tr('error'), tr('enhance.folder_scan_error').format(message))
 
     def start_enhance_process(self):
         """Enhancement 프로세스 시작 (단일 또는 벌크)"""
@@ -430,8 +459,12 @@ class EnhanceMixin:
             self.btn_enhance_create.setEnabled(False)
 
     def stop_enhance_process(self):
-        """Enhancement 프로세스 중단"""
-        if self.enhance_bulk_mode:
+        """Enhancement 프로세스 중단 (폴더 스캔 중이면 스캔 취소)"""
+        if self.enhance_scan_thread is not None and self.enhance_scan_thread.isRunning():
+            logger.info("Cancelling folder scan...")
+            self.enhance_scan_thread.stop()
+            self.btn_enhance_stop.setEnabled(False)
+        elif self.enhance_bulk_mode:
             logger.info("Stopping bulk enhancement process...")
             self.enhance_bulk_stopped = True
             self.btn_enhance_stop.setEnabled(False)
@@ -6,9 +6,7 @@ NAIAutoGeneratorWindow에 mix-in되는 이미지 생성 관련 메서드들.
 """
 
 import os
-import io
 import random
-import base64
 
 import numpy as np
 
@@ -17,14 +15,52 @@ from PyQt5.QtCore import QTimer
 from PyQt5.QtWidgets import QFileDialog, QMessageBox, QDialog, QApplication
 
 from i18n_manager import tr
-from gui_utils import pickedit_lessthan_str, create_folder_if_not_exists, get_filename_only, inject_imagetag, MAX_COUNT_FOR_WHILE, validate_generation_params
+from gui_utils import create_folder_if_not_exists, get_filename_only, inject_imagetag, validate_generation_params
 from gui_workers import GenerateThread, AutoGenerateThread
+from image_saver import FILENAME_CHARACTER_KEY
 from gui_dialog import GenerateDialog
+from job_queue import get_default_queue
+from payload_cache import get_default_cache as get_payload_cache
 from consts import COLOR, DEFAULT_PATH
 from logger import get_logger
 logger = get_logger()
 
 
+def _binarize_inpaint_mask(mask):
+    """인페인트 마스크를 0/255 이진 grayscale로 (white=inpaint, black=preserve)
+
+    inpaint dialog에서 이미 grayscale 'L' mode로 생성되므로 대부분 임계값 처리만 한다.
+    마스크는 전체 해상도로 보낸다 (DCP-arca 구현과 동일, 8x8 그리드 정렬은 페인팅 단계에서 보장).
+    """
+    if mask.mode == 'L':
+        mask_array = np.array(mask)
+
+        # Check for non-binary values BEFORE thresholding
+        unique_values_before = np.unique(mask_array)
+        logger.info(f"🔍 Mask unique values BEFORE threshold: {unique_values_before[:10]}... (total: {len(unique_values_before)})")
+
+        # Apply strict binary threshold (should already be binary from grid painting)
+        mask_binary = np.where(mask_array > 127, 255, 0).astype(np.uint8)
+
+        # Verify mask is now perfectly binary
+        unique_values_after = np.unique(mask_binary)
+        logger.info(f"🔍 Mask unique values AFTER threshold: {unique_values_after}")
+
+        if len(unique_values_after) > 2 or not all(v in [0, 255] for v in unique_values_after):
+            logger.error(f"⚠️ WARNING: Mask is not perfectly binary! Values: {unique_values_after}")
+        else:
+            logger.info("✓ Mask is perfectly binary (only 0 and 255)")
+    else:
+        # Fallback: convert any other format to grayscale and threshold
+        mask_array = np.array(mask.convert('L'))
+        mask_binary = np.where(mask_array > 127, 255, 0).astype(np.uint8)
+        logger.warning(f"⚠ Mask in unexpected format ({mask.mode}), converting to binary grayscale")
+
+    mask_final = Image.fromarray(mask_binary).convert('L')
+    logger.info(f"✓ Pure binary mask at full resolution: {mask_final.size}, mode: {mask_final.mode}")
+    return mask_final
+
+
 class GenerationMixin:
     """NAIAutoGeneratorWindow에 mix-in되는 이미지 생성 관련 메서드.
     
@@ -114,23 +150,17 @@ class GenerationMixin:
                                 data[param] = self.enhance_metadata[param]
                                 logger.debug(f"Using metadata {param}: {data[param]}")
 
-                    # 이미지를 업스케일
-                    from danbooru_tagger import convert_src_to_imagedata
-
                     # 원본 이미지 크기 가져오기
                     orig_width, orig_height = self.enhance_image.size
 
                     # NovelAI Enhancement 해상도 매핑 사용 (ratio 무시)
                     new_width, new_height = self._get_enhanced_resolution(orig_width, orig_height)
 
-                    # 이미지 업스케일
-                    upscaled_image = self.enhance_image.resize((new_width, new_height), Image.LANCZOS)
-
-                    # 업스케일된 이미지를 임시 저장하여 base64로 변환
-                    img_byte_arr = io.BytesIO()
-                    upscaled_image.save(img_byte_arr, format='PNG')
-                    img_byte_arr.seek(0)
-                    imgdata_enhance = base64.b64encode(img_byte_arr.read()).decode('utf-8')
+                    # 이미지 업스케일 후 base64 인코딩 (같은 이미지/크기면 캐시 사용)
+                    imgdata_enhance = get_payload_cache().encode_image(
+                        self.enhance_image, "enhance",
+                        lambda img: img.resize((new_width, new_height), Image.LANCZOS),
+                        (new_width, new_height))
 
                     if imgdata_enhance:
                         data["image"] = imgdata_enhance
@@ -170,9 +200,8 @@ class GenerationMixin:
             # img2img 설정 (새 위젯 사용) - Enhance가 없을 때만
             elif hasattr(self, 'img2img_image') and self.img2img_image and self.img2img_path:
                 try:
-                    # 이미지를 base64로 인코딩
-                    from danbooru_tagger import convert_src_to_imagedata
-                    imgdata_i2i = convert_src_to_imagedata(self.img2img_path)
+                    # 이미지를 base64로 인코딩 (파일이 바뀌지 않았으면 캐시 사용)
+                    imgdata_i2i = get_payload_cache().encode_file(self.img2img_path)
                     if imgdata_i2i:
                         data["image"] = imgdata_i2i
                         # 만약 i2i가 켜져있다면 autoSmea 설정을 반드시 꺼야함
@@ -185,58 +214,12 @@ class GenerationMixin:
                         # Inpainting 마스크 설정
                         if self.inpaint_mode and self.inpaint_mask:
                             try:
-                                # Grayscale 마스크 처리 (inpaint dialog에서 이미 grayscale 'L' mode로 생성됨)
-                                # NovelAI API는 grayscale mask를 기대: white=inpaint, black=preserve
-
-                                # Handle grayscale 'L' mode mask (primary case)
-                                if self.inpaint_mask.mode == 'L':
-                                    # Mask is already grayscale, just ensure it's binary
-                                    mask_array = np.array(self.inpaint_mask)
-
-                                    # Check for non-binary values BEFORE thresholding
-                                    unique_values_before = np.unique(mask_array)
-                                    logger.info(f"🔍 Mask unique values BEFORE threshold: {unique_values_before[:10]}... (total: {len(unique_values_before)})")
-
-                                    # Apply strict binary threshold (should already be binary from grid painting)
-                                    mask_binary = np.where(mask_array > 127, 255, 0).astype(np.uint8)
-
-                                    # Verify mask is now perfectly binary
-                                    unique_values_after = np.unique(mask_binary)
-                                    logger.info(f"🔍 Mask unique values AFTER threshold: {unique_values_after}")
-
-                                    if len(unique_values_after) > 2 or not all(v in [0, 255] for v in unique_values_after):
-                                        logger.error(f"⚠️ WARNING: Mask is not perfectly binary! Values: {unique_values_after}")
-                                    else:
-                                        logger.info("✓ Mask is perfectly binary (only 0 and 255)")
-
-                                    # Convert to grayscale image (already 'L' mode, just ensure clean)
-                                    mask_grayscale = Image.fromarray(mask_binary).convert('L')
-                                    logger.info("✓ Processed grayscale mask to binary (grid-based painting)")
-                                else:
-                                    # Fallback: convert any other format to grayscale and threshold
-                                    mask_array = np.array(self.inpaint_mask.convert('L'))
-                                    mask_binary = np.where(mask_array > 127, 255, 0).astype(np.uint8)
-                                    mask_grayscale = Image.fromarray(mask_binary).convert('L')
-                                    logger.warning(f"⚠ Mask in unexpected format ({self.inpaint_mask.mode}), converting to binary grayscale")
-
-                                # Mask is now guaranteed to be pure binary (0 or 255 only)
-                                logger.info("✓ Pure binary mask ready for API (0=preserve, 255=inpaint)")
-
-                                # Send mask at FULL RESOLUTION (matching DCP-arca implementation)
-                                # Note: Grid-based painting already ensures perfect 8×8 grid alignment
-                                # No downsampling needed - DCP-arca's working implementation sends full-res masks
-                                mask_final = mask_grayscale
-                                logger.info(f"✓ Mask at full resolution: {mask_final.size}, mode: {mask_final.mode}")
-
-                                # Encode mask to base64 PNG
-                                mask_byte_arr = io.BytesIO()
-                                mask_final.save(mask_byte_arr, format='PNG')
-                                mask_byte_arr.seek(0)
-                                mask_base64 = base64.b64encode(mask_byte_arr.read()).decode('utf-8')
+                                # 이진화 + PNG/base64 인코딩 (같은 마스크면 캐시 사용)
+                                mask_base64 = get_payload_cache().encode_image(
+                                    self.inpaint_mask, "inpaint_mask", _binarize_inpaint_mask)
 
                                 data["mask"] = mask_base64
                                 logger.info(f"✓ Inpainting mask enabled - mask size: {len(mask_base64)} bytes")
-                                logger.info(f"✓ Mask dimensions: {mask_final.size}, mode: {mask_final.mode}")
                             except Exception as e:
                                 logger.error(f"✗ Failed to encode mask: {e}")
                                 import traceback
@@ -254,11 +237,14 @@ class GenerationMixin:
                     logger.error(f"img2img 설정 중 오류: {e}")
                     # 오류가 있어도 계속 진행
                     
-            # 참조 이미지 설정
-            if hasattr(self, 'vibe_settings_group') and hasattr(self.vibe_settings_group, 'src') and self.vibe_settings_group.src:
+            # 참조 이미지(Vibe) 설정 - 단일 reference_image는 V3 모델 API에서만 받으며,
+            # V4 이후의 Vibe Transfer는 미리 인코딩한 vibe가 필요하므로 보내지 않는다
+            if hasattr(self, 'vibe_settings_group') and hasattr(self.vibe_settings_group, 'src') and self.vibe_settings_group.src \
+                    and data.get("model") != "nai-diffusion-3":
+                logger.warning("Vibe Transfer 이미지는 V3 모델에서만 적용됩니다 - 이번 요청에서는 제외")
+            elif hasattr(self, 'vibe_settings_group') and hasattr(self.vibe_settings_group, 'src') and self.vibe_settings_group.src:
                 try:
-                    imgdata_vibe = self.nai.convert_src_to_imagedata(
-                        self.vibe_settings_group.src)
+                    imgdata_vibe = get_payload_cache().encode_file(self.vibe_settings_group.src)
                     if imgdata_vibe:
                         data["reference_image"] = imgdata_vibe
                     else:
@@ -399,6 +385,15 @@ class GenerationMixin:
                 except Exception as e:
                     logger.error(f"캐릭터 프롬프트 처리 중 오류: {e}")
 
+            # 파일명 [character]용 첫 캐릭터 프롬프트 (저장은 다른 스레드에서 하므로 위젯은 여기서 읽음)
+            data[FILENAME_CHARACTER_KEY] = ""
+            try:
+                if hasattr(self, 'character_prompts_container'):
+                    characters = self.character_prompts_container.get_data().get("characters") or []
+                    if characters:
+                        data[FILENAME_CHARACTER_KEY] = characters[0].get("prompt", "")
+            except Exception as e:
+                logger.debug(f"캐릭터 프롬프트 가져오기 실패: {e}")
                     
             # 모든 필수 필드가 있는지 확인
             required_fields = ["prompt", "negative_prompt", "width", "height", "steps", "scale"]
@@ -416,14 +411,10 @@ class GenerationMixin:
             
             # Character Reference 데이터 추가            
             if self.character_reference_image is not None:
-                # 이미지를 권장 해상도로 조정
-                processed_image = self._prepare_character_reference_image(self.character_reference_image)
-                
-                # 이미지를 Base64로 인코딩
-                img_byte_arr = io.BytesIO()
-                processed_image.save(img_byte_arr, format='PNG')
-                img_byte_arr.seek(0)
-                image_base64 = base64.b64encode(img_byte_arr.read()).decode('utf-8')
+                # 이미지를 권장 해상도로 조정한 뒤 Base64로 인코딩 (같은 이미지면 캐시 사용)
+                image_base64 = get_payload_cache().encode_image(
+                    self.character_reference_image, "character_reference",
+                    self._prepare_character_reference_image)
                 
                 data["reference_image_multiple"] = [image_base64]
                 data["reference_information_extracted_multiple"] = [1 if self.character_reference_style_aware else 0]
@@ -431,7 +422,6 @@ class GenerationMixin:
                 data["reference_fidelity_multiple"] = [self.character_reference_fidelity]  # Fidelity 추가
                 
                 logger.debug(f"Character Reference added - Style Aware: {self.character_reference_style_aware}, Fidelity: {self.character_reference_fidelity}")
-                logger.debug(f"Processed image size: {processed_image.size}")
             else:
                 # Character Reference 이미지가 없을 때는 초기화된 None 값 유지
                 # (이미 lines 2083-2086에서 None으로 초기화됨)
@@ -509,40 +499,10 @@ class GenerationMixin:
 
 
     def _preedit_prompt(self, prompt, nprompt):
-        try_count = 0
-        edited_prompt = prompt
-        while try_count < MAX_COUNT_FOR_WHILE:
-            try_count += 1
-
-            before_edit_prompt = edited_prompt
-
-            # 줄바꿈을 공백으로 대체
-            edited_prompt = edited_prompt.replace("\n", " ")
-            
-            edited_prompt = pickedit_lessthan_str(edited_prompt)
-            edited_prompt = self.apply_wildcards(edited_prompt)
-
-            if before_edit_prompt == edited_prompt:
-                break
-
-        try_count = 0
-        edited_nprompt = nprompt
-        while try_count < MAX_COUNT_FOR_WHILE:
-            try_count += 1
-
-            before_edit_nprompt = edited_nprompt
-            
-            # 줄바꿈을 공백으로 대체
-            edited_nprompt = edited_nprompt.replace("\n", " ")
-            
-            # lessthan pick
-            edited_nprompt = pickedit_lessthan_str(edited_nprompt)
-            # wildcards pick
-            edited_nprompt = self.apply_wildcards(edited_nprompt)
-
-            if before_edit_nprompt == edited_nprompt:
-                break
-
+        # 줄바꿈을 공백으로 대체한 뒤 <> 선택 구문과 와일드카드를 한 번에 적용
+        # (선택된 값 안의 구문은 템플릿 렌더링 중 재귀적으로 적용됨)
+        edited_prompt = self.apply_wildcards(prompt.replace("\n", " "))
+        edited_nprompt = self.apply_wildcards(nprompt.replace("\n", " "))
         return edited_prompt, edited_nprompt
     
     def _preprocess_character_prompt(self, prompt_text):
@@ -557,19 +517,8 @@ class GenerationMixin:
         import re
         processed = re.sub(r'\s+', ' ', processed).strip()
         
-        # 3. 와일드카드와 기타 전처리 적용 (기존 _preedit_prompt 로직과 동일)
-        try_count = 0
-        while try_count < MAX_COUNT_FOR_WHILE:
-            try_count += 1
-            before_edit = processed
-            
-            # lessthan pick (<>)
-            processed = pickedit_lessthan_str(processed)
-            # wildcards pick
-            processed = self.apply_wildcards_with_snapshot(processed)
-            
-            if before_edit == processed:
-                break
+        # 3. <> 선택 구문과 와일드카드 적용 (_preedit_prompt와 동일, 스냅샷 인덱스 사용)
+        processed = self.apply_wildcards_with_snapshot(processed)
         
         return processed
         
@@ -617,7 +566,7 @@ class GenerationMixin:
             self.nai.set_param_dict(data)
             self._on_after_create_data_apply_gui()
             
-            generate_thread = GenerateThread(self)
+            generate_thread = GenerateThread(self, data.get(FILENAME_CHARACTER_KEY, ""))
             generate_thread.generate_result.connect(self._on_result_generate)
             generate_thread.start()
 
@@ -679,44 +628,57 @@ class GenerationMixin:
 
         return flat_metadata
 
+    def _show_generated_result(self, result_str):
+        """생성 결과를 한 번만 디코딩해 미리보기, Enhance용 이미지, 메타데이터 표시에 함께 사용"""
+        image = None
+        try:
+            if os.path.isfile(result_str):
+                image = Image.open(result_str)
+                image.load()
+        except Exception as e:
+            logger.error(f"Failed to decode generated image: {e}")
+            image = None
+
+        self.image_result.set_custom_pixmap(result_str, image)
+
+        # 생성된 이미지를 last_generated_image에 저장 (Enhance 기능용)
+        if image is not None:
+            self.last_generated_image = image
+            logger.debug("Last generated image saved for enhance feature")
+
+        # 실제 PNG 메타데이터를 읽어서 결과 프롬프트 업데이트
+        try:
+            import naiinfo_getter
+            if image is not None:
+                actual_metadata, errcode = naiinfo_getter.get_naidict_from_img(image)
+            else:
+                actual_metadata, errcode = naiinfo_getter.get_naidict_from_file(result_str)
+            if errcode == 3 and actual_metadata:
+                # 성공적으로 메타데이터를 읽었을 경우
+                flat_metadata = self._build_flat_metadata_from_naidict(actual_metadata)
+
+                # 결과 프롬프트 업데이트
+                self.set_result_text(flat_metadata)
+                logger.info("Result prompt updated with actual PNG metadata")
+            else:
+                logger.warning(f"Could not read PNG metadata (error code: {errcode}), using local parameters")
+        except Exception as e:
+            logger.error(f"Failed to read PNG metadata: {e}")
+
     def _on_result_generate(self, error_code, result_str):
         """세션 추적이 포함된 생성 결과 처리"""
         try:
             if error_code == 0:
-                # 성공적인 생성 - 이미지 결과 설정
-                self.image_result.set_custom_pixmap(result_str)
+                # 성공적인 생성 - 이미지 결과, Enhance용 이미지, 메타데이터 표시
+                self._show_generated_result(result_str)
                 self.set_statusbar_text("IDLE")
 
-                # 생성된 이미지를 last_generated_image에 저장 (Enhance 기능용)
-                try:
-                    if os.path.isfile(result_str):
-                        self.last_generated_image = Image.open(result_str).copy()
-                        logger.debug("Last generated image saved for enhance feature")
-                except Exception as e:
-                    logger.error(f"Failed to save last generated image: {e}")
-
-                # 실제 PNG 메타데이터를 읽어서 결과 프롬프트 업데이트
-                try:
-                    import naiinfo_getter
-                    actual_metadata, errcode = naiinfo_getter.get_naidict_from_file(result_str)
-                    if errcode == 3 and actual_metadata:
-                        # 성공적으로 메타데이터를 읽었을 경우
-                        flat_metadata = self._build_flat_metadata_from_naidict(actual_metadata)
-
-                        # 결과 프롬프트 업데이트
-                        self.set_result_text(flat_metadata)
-                        logger.info("Result prompt updated with actual PNG metadata")
-                    else:
-                        logger.warning(f"Could not read PNG metadata (error code: {errcode}), using local parameters")
-                except Exception as e:
-                    logger.error(f"Failed to read PNG metadata: {e}")
-
                 # 세션 모니터링 업데이트
                 if hasattr(self, 'session_manager'):
                     self.session_manager.increment_image_count()
 
-                # Anlas 실시간 업데이트 추가 (서버 업데이트 대기 시간 고려)
-                QTimer.singleShot(1000, self.refresh_anlas)  # 1초 후 Anlas 새로고침
+                # Anlas는 추정치로 바로 갱신하고 서버 조회는 AnlasTracker가 모아서 수행
+                self.anlas_tracker.charge(self.nai.parameters)
 
                 # 벌크 Enhancement 모드인 경우 다음 이미지 처리
                 if self.enhance_bulk_mode and self.enhance_image_list:
@@ -837,6 +799,20 @@ class GenerationMixin:
                 QMessageBox.warning(self, tr('validation.title'), "\n".join(validation_errors))
                 return
 
+            job_queue = get_default_queue()
+            run = job_queue.get_resumable_run()
+            if run is not None:
+                total = run.total if run.total >= 0 else "∞"
+                answer = QMessageBox.question(
+                    self, tr('generate_dialog.resume_title'),
+                    tr('generate_dialog.resume_prompt').format(run.done, total),
+                    QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel)
+                if answer == QMessageBox.Cancel:
+                    return
+                if answer == QMessageBox.Yes:
+                    self._resume_autogenerate(job_queue, run)
+                    return
+
             d = GenerateDialog(self)
             if d.exec_() == QDialog.Accepted:
                 self.list_settings_batch_target = setting_batch_target
@@ -848,22 +824,80 @@ class GenerationMixin:
                             self, tr('errors.warning'), tr('errors.settings_load_failed'))
                         return
 
-                agt = AutoGenerateThread(
-                    self, d.count, d.delay, d.ignore_error)
-                agt.on_data_created.connect(
-                    self._on_after_create_data_apply_gui)
-                agt.on_error.connect(self._on_error_autogenerate)
-                agt.on_end.connect(self._on_end_autogenerate)
-                agt.on_statusbar_change.connect(self.set_statusbar_text)
-                agt.on_success.connect(self._on_success_autogenerate)
-                agt.on_progress.connect(self._on_autogenerate_progress)
-                agt.start()
-
-                self.set_autogenerate_mode(True)
-                self.autogenerate_thread = agt
+                run_state = {
+                    "delay": d.delay,
+                    "ignore_error": d.ignore_error,
+                    "settings_batch_targets": setting_batch_target or [],
+                }
+                count = int(d.count or -1)
+                run_id = job_queue.create_run(count, dict(run_state, **self._get_autogenerate_state()))
+                job_queue.prune()
+                self._start_autogenerate_thread(AutoGenerateThread(
+                    self, count, d.delay, d.ignore_error, job_queue, run_id, 0, run_state))
         else:
+            # 사용자가 중지한 실행은 다음에 이어서 실행하자고 묻지 않음
+            self.autogenerate_thread.cancel()
             self._on_end_autogenerate()
 
+    def _start_autogenerate_thread(self, agt):
+        agt.on_data_created.connect(
+            self._on_after_create_data_apply_gui)
+        agt.on_error.connect(self._on_error_autogenerate)
+        agt.on_end.connect(self._on_end_autogenerate)
+        agt.on_statusbar_change.connect(self.set_statusbar_text)
+        agt.on_success.connect(self._on_success_autogenerate)
+        agt.on_progress.connect(self._on_autogenerate_progress)
+        agt.start()
+
+        self.set_autogenerate_mode(True)
+        self.autogenerate_thread = agt
+
+    # Warning! 자동 생성 스레드에서도 호출되므로 GUI 위젯에 접근하지 않음
+    def _get_autogenerate_state(self) -> dict:
+        """작업 큐에 기록할 진행 위치 (이어서 실행할 때 다음 작업을 같은 상태에서 계획)"""
+        state = {
+            "settings_batch_index": self.index_settings_batch_target,
+            "img2img_foldersrc": self.dict_img_batch_target["img2img_foldersrc"],
+            "img2img_index": self.dict_img_batch_target["img2img_index"],
+            "vibe_foldersrc": self.dict_img_batch_target["vibe_foldersrc"],
+            "vibe_index": self.dict_img_batch_target["vibe_index"],
+        }
+        if getattr(self, 'wcapplier', None):
+            state["loopcard"] = self.wcapplier.get_loopcard_state()
+        return state
+
+    def _resume_autogenerate(self, job_queue, run):
+        """중단된 자동 생성 실행을 기록된 상태에서 이어서 시작"""
+        state = run.state
+        job_queue.prepare_resume(run.id)
+
+        # 끝나지 않은 작업이 남았으면 (또는 아직 계획된 작업이 없으면) 그 작업의 배치 위치를,
+        # 아니면 다음 배치 위치를 불러옴 (성공할 때마다 _on_success_autogenerate가 다음으로 진행)
+        step_back = 1 if run.planned == 0 or job_queue.next_unfinished_job(run.id) is not None else 0
+
+        if getattr(self, 'wcapplier', None) and "loopcard" in state:
+            self.wcapplier.set_loopcard_state(state["loopcard"])
+
+        self.list_settings_batch_target = state.get("settings_batch_targets") or None
+        if self.list_settings_batch_target:
+            self.index_settings_batch_target = state.get("settings_batch_index", 0) - step_back
+            if not self.proceed_settings_batch():
+                QMessageBox.information(
+                    self, tr('errors.warning'), tr('errors.settings_load_failed'))
+                return
+
+        for mode in ("img2img", "vibe"):
+            foldersrc = state.get(mode + "_foldersrc")
+            if foldersrc and foldersrc == self.dict_img_batch_target[mode + "_foldersrc"]:
+                self.dict_img_batch_target[mode + "_index"] = state.get(mode + "_index", 0) - step_back
+                self.proceed_image_batch(mode)
+
+        logger.info(f"자동 생성 이어서 실행: run {run.id}, {run.done}/{run.total} 완료")
+        run_state = {k: state[k] for k in ("delay", "ignore_error", "settings_batch_targets") if k in state}
+        self._start_autogenerate_thread(AutoGenerateThread(
+            self, run.total, state.get("delay", 3), state.get("ignore_error", False),
+            job_queue, run.id, run.done, run_state))
+
     def _on_error_autogenerate(self, error_code, result):
         QMessageBox.information(
             self, tr('errors.warning'), tr('errors.autogenerate_error').format(str(result)))
@@ -878,32 +912,7 @@ class GenerationMixin:
         self.refresh_anlas()
 
     def _on_success_autogenerate(self, result_str):
-        self._on_refresh_anlas(self.nai.get_anlas() or -1)
-
-        self.image_result.set_custom_pixmap(result_str)
-
-        # 생성된 이미지를 last_generated_image에 저장 (Enhance 기능용)
-        try:
-            if os.path.isfile(result_str):
-                self.last_generated_image = Image.open(result_str).copy()
-                logger.debug("Last generated image saved for enhance feature")
-        except Exception as e:
-            logger.error(f"Failed to save last generated image: {e}")
-
-        # 실제 PNG 메타데이터를 읽어서 결과 프롬프트 업데이트
-        try:
-            import naiinfo_getter
-            actual_metadata, errcode = naiinfo_getter.get_naidict_from_file(result_str)
-            if errcode == 3 and actual_metadata:
-                flat_metadata = self._build_flat_metadata_from_naidict(actual_metadata)
-
-                # 결과 프롬프트 업데이트
-                self.set_result_text(flat_metadata)
-                logger.info("Auto-generate result prompt updated with actual PNG metadata")
-            else:
-                logger.warning(f"Could not read PNG metadata (error code: {errcode}), using local parameters")
-        except Exception as e:
-            logger.error(f"Failed to read PNG metadata: {e}")
+        self._show_generated_result(result_str)
 
         if self.dict_img_batch_target["img2img_foldersrc"]:
             self.proceed_image_batch("img2img")
@@ -968,8 +977,8 @@ class GenerationMixin:
 
     def apply_wildcards(self, prompt):
         """와일드카드와 루프카드를 적용하는 메서드"""
-        if not prompt or ("__" not in prompt and "##" not in prompt):
-            return prompt  # 와일드카드/루프카드가 없으면 반환
+        if not prompt or ("__" not in prompt and "##" not in prompt and "<" not in prompt):
+            return prompt  # 와일드카드/루프카드/선택 구문이 없으면 반환
         
         self.check_folders()
         
@@ -980,7 +989,7 @@ class GenerationMixin:
 
     def apply_wildcards_with_snapshot(self, prompt):
         """스냅샷을 사용한 와일드카드 적용"""
-        if not prompt or ("__" not in prompt and "##" not in prompt):
+        if not prompt or ("__" not in prompt and "##" not in prompt and "<" not in prompt):
             return prompt
         if not hasattr(self, 'wcapplier') or not self.wcapplier:
             self.init_wc()
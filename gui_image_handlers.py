@@ -5,12 +5,11 @@ NAIAutoGeneratorWindow에 mix-in되는 Image-to-Image 및 Character Reference 
 이미지 선택, 제거, 슬라이더 핸들링, 인페인팅 마스크 등을 담당합니다.
 """
 
-import io
-
 from PyQt5.QtCore import Qt
 from PyQt5.QtWidgets import QFileDialog, QMessageBox, QDialog
 
 from i18n_manager import tr
+from thumbnail_cache import get_default_cache as get_thumbnail_cache
 from logger import get_logger
 logger = get_logger()
 
@@ -61,21 +60,13 @@ class ImageHandlersMixin:
                 from PIL import Image
                 self.character_reference_image = Image.open(file_path)
                 self.character_reference_path = file_path
-                
-                # 미리보기 업데이트
-                thumbnail = self.character_reference_image.copy()
-                thumbnail.thumbnail((164, 198), Image.LANCZOS)
-                
-                # PIL Image를 QPixmap으로 변환
-                img_byte_arr = io.BytesIO()
-                thumbnail.save(img_byte_arr, format='PNG')
-                img_byte_arr.seek(0)
-                
-                from PyQt5.QtGui import QPixmap
-                pixmap = QPixmap()
-                pixmap.loadFromData(img_byte_arr.read())
-                
-                self.character_image_label.setPixmap(pixmap)
+
+                # 미리보기 업데이트 (썸네일 캐시, 백그라운드 디코딩)
+                def show_thumbnail(pixmap):
+                    if pixmap is not None and self.character_reference_path == file_path:
+                        self.character_image_label.setPixmap(pixmap)
+
+                get_thumbnail_cache().request(file_path, show_thumbnail)
                 self.btn_remove_character_image.setEnabled(True)
                 
                 logger.info(f"Character Reference image loaded: {file_path}")
@@ -116,20 +107,12 @@ class ImageHandlersMixin:
             self.img2img_image = Image.open(file_path)
             self.img2img_path = file_path
 
-            # 미리보기 업데이트
-            thumbnail = self.img2img_image.copy()
-            thumbnail.thumbnail((164, 198), Image.LANCZOS)
-
-            # PIL Image를 QPixmap으로 변환
-            img_byte_arr = io.BytesIO()
-            thumbnail.save(img_byte_arr, format='PNG')
-            img_byte_arr.seek(0)
-
-            from PyQt5.QtGui import QPixmap
-            pixmap = QPixmap()
-            pixmap.loadFromData(img_byte_arr.read())
+            # 미리보기 업데이트 (썸네일 캐시, 백그라운드 디코딩)
+            def show_thumbnail(pixmap):
+                if pixmap is not None and self.img2img_path == file_path:
+                    self.img2img_image_label.setPixmap(pixmap)
 
-            self.img2img_image_label.setPixmap(pixmap)
+            get_thumbnail_cache().request(file_path, show_thumbnail)
             self.img2img_image_label.setStyleSheet("background-color: rgba(0, 0, 0, 128); border: 2px solid #559977;")
             self.btn_remove_img2img_image.setEnabled(True)
 
@@ -4,16 +4,19 @@ from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QGr
                              QRadioButton, QButtonGroup, QSizePolicy, QMessageBox,
                              QFileDialog, QApplication, QCompleter, QFrame, QSlider,
                              QTabWidget)
-from PyQt5.QtCore import Qt, pyqtSignal, QSettings, QSize
+from PyQt5.QtCore import Qt, pyqtSignal, QSettings, QSize, QRect, QRectF, QPointF, QLineF, QTimer
 from PyQt5.QtGui import QPixmap, QImage, QPainter, QPen, QColor, QMouseEvent, QBrush, QPalette, QDrag
 from consts import RESOLUTION_FAMILIY, COLOR, DEFAULT_CUSTOM_RESOLUTIONS
 from completer import CompletionTextEdit
 from character_prompts_ui import CharacterPromptsContainer
+import collections
 import random
 import os
+from PIL import Image
 from logger import get_logger
 
 from i18n_manager import tr
+from thumbnail_cache import get_default_cache as get_thumbnail_cache, pil_to_qimage
 
 logger = get_logger()
 
@@ -1260,6 +1263,12 @@ class LoginStateWidget(QWidget):
             self.state_label.setStyleSheet("color:red;")
 
 
+MASK_PEN_WIDTH = 10
+MASK_OVERLAY_COLOR = QColor(255, 0, 0, 128)
+MASK_PREVIEW_HEIGHT = 128
+PREVIEW_SIZE = (MASK_PREVIEW_HEIGHT * 8, MASK_PREVIEW_HEIGHT)   # 높이 128에 맞춘 썸네일
+
+
 class ImageToImageWidget(QGroupBox):
     is_active_changed = pyqtSignal(bool)
 
@@ -1269,9 +1278,13 @@ class ImageToImageWidget(QGroupBox):
         self.parent = parent
         self.mode = mode
         self.src = None
+        self.src_pixmap = None       # 마스크 모드에서만 읽는 원본 (이미지마다 한 번)
 
         self.setMinimumHeight(150)
         self.mask = None
+        self.mask_overlay = None     # 마스크를 반투명 빨간색으로 그린 오버레이 (원본 크기)
+        self.mask_composite = None   # 원본 + 오버레이 (원본 크기)
+        self.mask_preview = None     # 라벨에 표시하는 축소본
         self.init_ui()
 
         self.is_maskmode = False
@@ -1359,20 +1372,32 @@ class ImageToImageWidget(QGroupBox):
 
     def set_image(self, src):
         self.src = src
+        self.src_pixmap = None
         if src:
-            pixmap = QPixmap(src)
-            scaled_pixmap = pixmap.scaledToHeight(
-                128, Qt.SmoothTransformation)
-            self.image_label.setPixmap(scaled_pixmap)
+            if self.is_maskmode:
+                self.reset_mask()
+            else:
+                self.show_preview()
         else:
             self.image_label.setText(tr('ui.no_uploaded_image'))
             self.image_label.setPixmap(QPixmap())
 
         self.is_active_changed.emit(bool(src))
 
+    def show_preview(self):
+        """썸네일 캐시에서 미리보기를 가져와 표시 (폴더 배치에서도 디코딩은 이미지당 한 번)"""
+        src = self.src
+
+        def apply(pixmap):
+            if pixmap is not None and self.src == src and not self.is_maskmode:
+                self.image_label.setPixmap(pixmap)
+
+        get_thumbnail_cache().request(src, apply, PREVIEW_SIZE)
+
     def on_click_removebutton(self):
         self.src = None
-        self.mask = None
+        self.src_pixmap = None
+        self.clear_mask()
         self.is_maskmode = False
         if hasattr(self, 'mask_checkbox'):
             self.mask_checkbox.setChecked(False)
@@ -1385,15 +1410,16 @@ class ImageToImageWidget(QGroupBox):
         self.is_maskmode = (state == Qt.Checked)
         if self.is_maskmode:
             if self.src:
-                self.mask = QImage(QPixmap(self.src).toImage().size(), QImage.Format_ARGB32)
-                self.mask.fill(Qt.black)
+                self.reset_mask()
                 self.image_label.setCursor(Qt.CrossCursor)
                 self.image_label.mousePressEvent = self.mousePressEvent
                 self.image_label.mouseMoveEvent = self.mouseMoveEvent
                 self.image_label.mouseReleaseEvent = self.mouseReleaseEvent
                 self.mousePressPos = None
         else:
-            self.mask = None
+            self.clear_mask()
+            if self.src:
+                self.show_preview()
             self.image_label.setCursor(Qt.ArrowCursor)
             self.image_label.mousePressEvent = None
             self.image_label.mouseMoveEvent = None
@@ -1429,71 +1455,102 @@ class ImageToImageWidget(QGroupBox):
             return
         self.mousePressPos = None
 
+    def reset_mask(self):
+        """현재 원본 크기의 빈 마스크와 오버레이/합성 캐시를 만든다"""
+        if self.src_pixmap is None:
+            self.src_pixmap = QPixmap(self.src)
+        size = self.src_pixmap.size()
+        self.mask = QImage(size, QImage.Format_ARGB32)
+        self.mask.fill(Qt.black)
+        self.mask_overlay = QImage(size, QImage.Format_ARGB32_Premultiplied)
+        self.mask_overlay.fill(Qt.transparent)
+        self.mask_composite = QPixmap(self.src_pixmap)
+        self.mask_preview = self.src_pixmap.scaledToHeight(MASK_PREVIEW_HEIGHT, Qt.SmoothTransformation)
+        self.image_label.setPixmap(self.mask_preview)
+
+    def clear_mask(self):
+        self.mask = None
+        self.mask_overlay = None
+        self.mask_composite = None
+        self.mask_preview = None
+
     def drawMask(self, pos):
-        if not self.mask:
+        if not self.mask or self.src_pixmap is None:
             return
 
-        # 원본 이미지 크기와 라벨 크기 비율 계산
-        pixmap = QPixmap(self.src)
-        img_w, img_h = pixmap.width(), pixmap.height()
-        label_w, label_h = self.image_label.width(), self.image_label.height()
-
-        # 이미지가 라벨 내 어떻게 스케일되는지 계산
-        ratio = min(label_w / img_w, label_h / img_h)
-        scaled_w, scaled_h = img_w * ratio, img_h * ratio
-
-        # 라벨 내 이미지 위치 계산
-        offset_x = (label_w - scaled_w) / 2
-        offset_y = (label_h - scaled_h) / 2
+        # 라벨 중앙에 표시된 축소본 기준으로 라벨 좌표를 이미지 좌표로 변환
+        img_w, img_h = self.src_pixmap.width(), self.src_pixmap.height()
+        ratio = self.mask_preview.height() / img_h if img_h else 0
+        if ratio <= 0:
+            return
+        offset_x = (self.image_label.width() - self.mask_preview.width()) / 2
+        offset_y = (self.image_label.height() - self.mask_preview.height()) / 2
 
-        # 라벨 좌표를 이미지 좌표로 변환
-        x = (pos.x() - offset_x) / ratio if ratio > 0 else 0
-        y = (pos.y() - offset_y) / ratio if ratio > 0 else 0
+        x = (pos.x() - offset_x) / ratio
+        y = (pos.y() - offset_y) / ratio
 
         if 0 <= x < img_w and 0 <= y < img_h:
-            # 마스크에 그리기
-            painter = QPainter(self.mask)
-            painter.setPen(QPen(Qt.white, 10, Qt.SolidLine, Qt.RoundCap))
-            
+            end = QPointF(x, y)
+            start = None
             if self.mousePressPos:
-                prev_x = (self.mousePressPos.x() - offset_x) / ratio
-                prev_y = (self.mousePressPos.y() - offset_y) / ratio
-                painter.drawLine(prev_x, prev_y, x, y)
+                start = QPointF((self.mousePressPos.x() - offset_x) / ratio,
+                                (self.mousePressPos.y() - offset_y) / ratio)
+            dirty = self.paintMaskStroke(start, end)
+            self.mousePressPos = pos
+
+            # 바뀐 영역만 오버레이 합성
+            self.updateMaskOverlay(dirty)
+
+    def paintMaskStroke(self, start, end) -> QRect:
+        """마스크와 오버레이에 같은 획을 그리고 바뀐 영역(이미지 좌표)을 반환"""
+        for target, color in ((self.mask, QColor(Qt.white)), (self.mask_overlay, MASK_OVERLAY_COLOR)):
+            painter = QPainter(target)
+            # 겹쳐 그려도 오버레이 알파가 누적되지 않도록 덮어쓰기
+            painter.setCompositionMode(QPainter.CompositionMode_Source)
+            painter.setPen(QPen(color, MASK_PEN_WIDTH, Qt.SolidLine, Qt.RoundCap))
+            if start is not None:
+                painter.drawLine(QLineF(start, end))
             else:
-                painter.drawPoint(x, y)
-            
+                painter.drawPoint(end)
             painter.end()
-            self.mousePressPos = pos
 
-            # 마스크 오버레이와 함께 이미지 표시
-            self.updateMaskOverlay()
+        margin = MASK_PEN_WIDTH
+        bounds = QRectF(start if start is not None else end, end).normalized()
+        return bounds.adjusted(-margin, -margin, margin, margin).toAlignedRect() & self.mask.rect()
 
-    def updateMaskOverlay(self):
-        if not self.src or not self.mask:
+    def updateMaskOverlay(self, dirty: QRect | None = None):
+        """원본 + 마스크 오버레이를 합성해 표시. dirty가 있으면 그 영역만 다시 합성"""
+        if self.src_pixmap is None or self.mask_overlay is None:
             return
 
-        pixmap = QPixmap(self.src)
-        overlay = QImage(pixmap.size(), QImage.Format_ARGB32)
-        overlay.fill(Qt.transparent)
-
-        # 마스크를 반투명 빨간색 오버레이로 변환
-        for y in range(self.mask.height()):
-            for x in range(self.mask.width()):
-                if self.mask.pixelColor(x, y).value() > 0:  # 마스크에 그려진 부분
-                    overlay.setPixelColor(x, y, QColor(255, 0, 0, 128))
-
-        # 원본 이미지와 오버레이 합성
-        result = QPixmap(pixmap.size())
-        result.fill(Qt.transparent)
+        full = self.mask_composite.rect()
+        rect = full if dirty is None else dirty & full
+        if rect.isEmpty():
+            return
 
-        painter = QPainter(result)
-        painter.drawPixmap(0, 0, pixmap)
-        painter.drawImage(0, 0, overlay)
+        painter = QPainter(self.mask_composite)
+        painter.setCompositionMode(QPainter.CompositionMode_Source)
+        painter.drawPixmap(rect, self.src_pixmap, rect)
+        painter.setCompositionMode(QPainter.CompositionMode_SourceOver)
+        painter.drawImage(rect, self.mask_overlay, rect)
         painter.end()
 
-        # 결과 표시
-        scaled_pixmap = result.scaledToHeight(128, Qt.SmoothTransformation)
-        self.image_label.setPixmap(scaled_pixmap)
+        if rect == full:
+            self.mask_preview = self.mask_composite.scaledToHeight(MASK_PREVIEW_HEIGHT, Qt.SmoothTransformation)
+        else:
+            # 축소본에서도 해당 영역(+경계 1px)만 다시 축소해 덮어씀
+            scale = self.mask_preview.height() / full.height()
+            target = QRectF(rect.x() * scale, rect.y() * scale, rect.width() * scale, rect.height() * scale)
+            target = target.toAlignedRect().adjusted(-1, -1, 1, 1) & self.mask_preview.rect()
+            source = QRectF(target.x() / scale, target.y() / scale,
+                            target.width() / scale, target.height() / scale)
+            painter = QPainter(self.mask_preview)
+            painter.setCompositionMode(QPainter.CompositionMode_Source)
+            painter.setRenderHint(QPainter.SmoothPixmapTransform)
+            painter.drawPixmap(QRectF(target), self.mask_composite, source)
+            painter.end()
+
+        self.image_label.setPixmap(self.mask_preview)
 
 
 def set_sampler_by_api_value(parent, api_value):
@@ -1539,6 +1596,8 @@ class ResizableImageWidget(QFrame):
     # 기본 크기 상수 정의
     DEFAULT_WIDTH = 512
     DEFAULT_HEIGHT = 512
+    SCALED_CACHE_SIZE = 4       # 라벨 크기별 축소본 보관 개수
+    RESIZE_DEBOUNCE_MS = 60     # 연속 리사이즈는 멈춘 뒤 한 번만 다시 축소
     
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -1564,6 +1623,12 @@ class ResizableImageWidget(QFrame):
         # 이미지 데이터
         self.image_path = None
         self.original_image_data = None
+        self.source_pixmap = None   # 한 번만 디코딩한 원본
+        self._scaled_cache = collections.OrderedDict()   # (w, h) -> 축소 QPixmap
+        self._resize_timer = QTimer(self)
+        self._resize_timer.setSingleShot(True)
+        self._resize_timer.setInterval(self.RESIZE_DEBOUNCE_MS)
+        self._resize_timer.timeout.connect(self._apply_scaled_pixmap)
         
         # 리사이즈 핸들 설정
         self.setMouseTracking(True)
@@ -1620,10 +1685,11 @@ class ResizableImageWidget(QFrame):
         """)
 
     def resizeEvent(self, event):
-        """위젯 크기 변경 시 오버레이 위치 갱신"""
+        """위젯 크기 변경 시 오버레이 위치 갱신 및 이미지 크기 갱신 예약"""
         super().resizeEvent(event)
         if self._overlay_visible:
             self._position_overlay()
+        self.refresh_size()
 
     def load_widget_size(self):
         """저장된 위젯 크기 불러오기"""
@@ -1662,72 +1728,68 @@ class ResizableImageWidget(QFrame):
         # 로그 출력
         logger.info(f"이미지 크기 기본값으로 재설정: {self.DEFAULT_WIDTH}x{self.DEFAULT_HEIGHT}")
     
-    def set_custom_pixmap(self, src):
-        """이미지 설정"""
+    def set_custom_pixmap(self, src, image=None):
+        """이미지 설정 (파일 경로, 바이트 데이터 또는 PIL 이미지)
+
+        image: 호출 측에서 이미 디코딩한 PIL 이미지 (경로와 같은 내용). 있으면 다시 디코딩하지 않는다.
+        """
         self.image_path = src
         self.original_image_data = None  # 초기화
+        self.source_pixmap = None
+        self._scaled_cache.clear()
 
         try:
-            if isinstance(src, str):
+            if isinstance(src, Image.Image):
+                image, self.image_path = src, None
+            if image is not None:
+                pixmap = QPixmap.fromImage(pil_to_qimage(image))
+            elif isinstance(src, str):
                 pixmap = QPixmap(src)
-                if not pixmap.isNull():
-                    # 원본 이미지 데이터 저장
-                    with open(src, 'rb') as f:
-                        self.original_image_data = f.read()
-                    self.image_label.setPixmap(pixmap.scaled(
-                        self.image_label.width(), self.image_label.height(), 
-                        Qt.KeepAspectRatio, Qt.SmoothTransformation))
-                else:
-                    self.image_label.setText("이미지 로드 실패")
-                    self.image_path = None
             else:
-                # 바이트 데이터인 경우
-                self.original_image_data = src  # 원본 이미지 데이터 저장
-                image = QImage()
-                image.loadFromData(src)
-                pixmap = QPixmap.fromImage(image)
-                if not pixmap.isNull():
-                    self.image_label.setPixmap(pixmap.scaled(
-                        self.image_label.width(), self.image_label.height(), 
-                        Qt.KeepAspectRatio, Qt.SmoothTransformation))
-                else:
-                    self.image_label.setText("이미지 로드 실패")
-                    self.image_path = None
-                    self.original_image_data = None
+                # 바이트 데이터인 경우 (파일이 없으므로 저장용 원본 보관)
+                self.original_image_data = src
+                qimage = QImage()
+                qimage.loadFromData(src)
+                pixmap = QPixmap.fromImage(qimage)
+
+            if pixmap.isNull():
+                self.image_label.setText("이미지 로드 실패")
+                self.image_path = None
+                self.original_image_data = None
+                return
+
+            self.source_pixmap = pixmap
+            self._apply_scaled_pixmap()
         except Exception as e:
             logger.error(f"Error loading custom pixmap: {e}")
             self.image_label.setText("이미지 로드 오류: " + str(e))
             self.image_path = None
             self.original_image_data = None
-    
+
     def refresh_size(self):
-        """이미지 크기 새로고침"""
-        if not self.image_path and not self.original_image_data:
+        """이미지 크기 새로고침 (연속 호출은 묶어서 마지막에 한 번, 디스크에서 다시 읽지 않음)"""
+        if self.source_pixmap is None:
             return  # 이미지가 없으면 아무 작업도 하지 않음
-            
-        try:
-            if isinstance(self.image_path, str) and os.path.isfile(self.image_path):
-                # 파일 경로가 있는 경우
-                pixmap = QPixmap(self.image_path)
-                if not pixmap.isNull():
-                    self.image_label.setPixmap(pixmap.scaled(
-                        self.image_label.width(), self.image_label.height(), 
-                        Qt.KeepAspectRatio, Qt.SmoothTransformation))
-            elif self.original_image_data:
-                # 저장된 원본 데이터가 있는 경우
-                image = QImage()
-                image.loadFromData(self.original_image_data)
-                pixmap = QPixmap.fromImage(image)
-                if not pixmap.isNull():
-                    self.image_label.setPixmap(pixmap.scaled(
-                        self.image_label.width(), self.image_label.height(), 
-                        Qt.KeepAspectRatio, Qt.SmoothTransformation))
-        except Exception as e:
-            logger.error(f"Error refreshing image size: {e}")
-    
+        self._resize_timer.start()
+
+    def _apply_scaled_pixmap(self):
+        """현재 라벨 크기에 맞는 축소본 표시 (크기별 캐시)"""
+        if self.source_pixmap is None:
+            return
+        size = (self.image_label.width(), self.image_label.height())
+        pixmap = self._scaled_cache.get(size)
+        if pixmap is None:
+            pixmap = self.source_pixmap.scaled(size[0], size[1], Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            self._scaled_cache[size] = pixmap
+            while len(self._scaled_cache) > self.SCALED_CACHE_SIZE:
+                self._scaled_cache.popitem(last=False)
+        else:
+            self._scaled_cache.move_to_end(size)
+        self.image_label.setPixmap(pixmap)
+
     def save_image(self):
         """이미지 저장 기능"""
-        if not self.image_path and not self.original_image_data:
+        if not self.image_path and not self.original_image_data and self.source_pixmap is None:
             QMessageBox.warning(self, "경고", "저장할 이미지가 없습니다.")
             return
             
@@ -1745,19 +1807,14 @@ class ResizableImageWidget(QFrame):
                     # 파일 경로가 있는 경우, 해당 파일을 복사
                     import shutil
                     shutil.copy2(self.image_path, filename)
-                elif self.original_image_data:
-                    # 원본 이미지 데이터가 있는 경우
-                    from PIL import Image
+                elif isinstance(self.original_image_data, bytes):
+                    # 원본 바이트 데이터가 있는 경우
                     import io
-                    if isinstance(self.original_image_data, bytes):
-                        # 바이트 데이터인 경우
-                        img = Image.open(io.BytesIO(self.original_image_data))
-                        img.save(filename)
-                    else:
-                        # pixmap에서 이미지 저장
-                        pixmap = self.image_label.pixmap()
-                        if pixmap and not pixmap.isNull():
-                            pixmap.save(filename)
+                    img = Image.open(io.BytesIO(self.original_image_data))
+                    img.save(filename)
+                elif self.source_pixmap is not None:
+                    # 원본 크기 pixmap에서 저장
+                    self.source_pixmap.save(filename)
                 
                 # 성공 메시지 표시
                 QMessageBox.information(self, "정보", f"이미지가 성공적으로 저장되었습니다.\n{filename}")
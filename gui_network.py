@@ -153,11 +153,10 @@ class NetworkMixin:
     def keepalive(self):
         """세션 유지를 위한 경량 API 호출"""
         if hasattr(self, 'nai') and self.nai and self.nai.access_token:
-            try:
-                self.nai.get_anlas()  # 가벼운 API 호출
-                logger.debug("Keepalive 성공")
-            except Exception as e:
-                logger.warning(f"Keepalive 실패: {e}")
+            # 가벼운 Anlas 조회를 백그라운드로 요청 (GUI 스레드를 막지 않음, 최근 조회와는 합쳐짐)
+            since = self.anlas_tracker.seconds_since_refresh()
+            if since is None or since >= self.keepalive_timer.interval() / 1000:
+                self.anlas_tracker.request_refresh(force=True)
 
     def update_session_status(self):
         """세션 상태 UI 업데이트"""
@@ -10,7 +10,7 @@ import os
 
 from PyQt5.QtWidgets import QFileDialog, QMessageBox
 
-from gui_utils import pickedit_lessthan_str, create_folder_if_not_exists, MAX_COUNT_FOR_WHILE
+from gui_utils import create_folder_if_not_exists
 from consts import DEFAULT_PARAMS, DEFAULT_PATH
 from logger import get_logger
 logger = get_logger()
@@ -224,15 +224,7 @@ class SettingsIOMixin:
         if not prompt_text:
             return ""
             
-        edited_text = prompt_text
-        try_count = 0
-        while try_count < MAX_COUNT_FOR_WHILE:
-            try_count += 1
-            before_edit = edited_text
-            edited_text = pickedit_lessthan_str(edited_text)
-            edited_text = self.apply_wildcards(edited_text)
-            if before_edit == edited_text:
-                break
+        edited_text = self.apply_wildcards(prompt_text)
         
         # 줄바꿈 제거
         return edited_text.replace("\n", " ")
@@ -17,6 +17,7 @@ from PyQt5.QtCore import QBuffer
 from PyQt5.QtGui import QImage
 
 from logger import get_logger
+from prompt_template import compile_template, render_choices
 logger = get_logger()
 
 
@@ -92,39 +93,8 @@ def strtobool(val):
 
 
 def pickedit_lessthan_str(original_str):
-    try_count = 0
-
-    edited_str = original_str
-    while try_count < MAX_COUNT_FOR_WHILE:
-        try_count += 1
-
-        before_edit_str = edited_str
-        pos_prev = 0
-        while True:
-            pos_r = edited_str.find(">", pos_prev + 1)
-            if pos_r == -1:
-                break
-
-            pos_l = edited_str.rfind("<", pos_prev, pos_r)
-            if pos_l != -1:
-                left = edited_str[0:pos_l]
-                center = edited_str[pos_l + 1:pos_r]
-                right = edited_str[pos_r + 1:len(edited_str)]
-
-                center_splited = center.split("|")
-                center_picked = center_splited[random.randrange(
-                    0, len(center_splited))]
-
-                result_left = left + center_picked
-                pos_prev = len(result_left)
-                edited_str = result_left + right
-            else:
-                pos_prev = pos_r
-
-        if before_edit_str == edited_str:
-            break
-
-    return edited_str
+    """<a|b|c> 선택 구문만 적용 (와일드카드/루프카드 구문은 그대로 둠)"""
+    return render_choices(compile_template(original_str).nodes)
 
 
 def create_windows_filepath(base_path, filename, extension, max_length=150):
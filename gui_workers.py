@@ -2,31 +2,39 @@
 gui_workers.py - 백그라운드 워커 스레드 모음
 
 gui.py에서 분리된 QThread 서브클래스들.
-이미지 생성, 태그 로딩, 토큰 검증, Anlas 조회 등의 백그라운드 작업을 담당합니다.
+이미지 생성, 태그 로딩, 토큰 검증, 폴더 스캔 등의 백그라운드 작업을 담당합니다.
 """
 
 import os
-import io
 import time
+import queue
 import threading
-import zipfile
-import datetime
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 
-from PIL import Image
-
-from PyQt5.QtCore import QThread, pyqtSignal
+from PyQt5.QtCore import QObject, QThread, Qt, pyqtSignal
 
 from gui_utils import resource_path, create_folder_if_not_exists, get_filename_only
 from consts import DEFAULT_PATH, DEFAULT_TAGCOMPLETION_PATH
-from nai_generator import NAIAction
-from completer import parse_tag_line, format_tag_display
+from nai_generator import action_for_parameters
+from job_queue import RUN_CANCELLED
+from image_saver import (open_result_member, save_result_image, format_result_filename, make_result_path,
+                         SAVE_MODE_RAW, DEFAULT_FILENAME_FORMAT, FILENAME_CHARACTER_KEY)
+from completer import TagIndex
+from tag_cache import load_tag_dictionary
+from metadata_scanner import list_image_files, scan_files, get_default_cache
 from i18n_manager import tr
 from logger import get_logger
 logger = get_logger()
 
+# 자동 생성 파이프라인에서 저장 대기 중인 응답의 최대 개수
+WRITER_QUEUE_SIZE = 2
+# 저장 실패 시 보관한 응답 바이트로 다시 저장해 보는 횟수와 간격 (API는 다시 요청하지 않음)
+SAVE_ATTEMPTS = 3
+SAVE_RETRY_DELAY = 1.0
+
 
 class CompletionTagLoadThread(QThread):
-    on_load_completiontag_sucess = pyqtSignal(list)
+    on_load_completiontag_sucess = pyqtSignal(list, object)
 
     def __init__(self, parent, force_reload=False):
         super(CompletionTagLoadThread, self).__init__(parent)
@@ -36,12 +44,19 @@ class CompletionTagLoadThread(QThread):
         # 태그 목록을 캐시하는 클래스 변수 추가 (모든 인스턴스가 공유)
         if not hasattr(CompletionTagLoadThread, 'cached_tags'):
             CompletionTagLoadThread.cached_tags = None
+        # 자동 완성 검색 인덱스 (cached_tags로부터 한 번만 생성)
+        if not hasattr(CompletionTagLoadThread, 'cached_index'):
+            CompletionTagLoadThread.cached_index = None
 
     def run(self):
         # 이미 캐시된 태그가 있고, 강제 새로고침이 아니면 재사용
         if CompletionTagLoadThread.cached_tags is not None and not self.force_reload:
             logger.debug("캐시된 태그 사용 (다시 로드하지 않음)")
-            self.on_load_completiontag_sucess.emit(CompletionTagLoadThread.cached_tags)
+            tag_index = CompletionTagLoadThread.cached_index
+            if tag_index is None or tag_index.words is not CompletionTagLoadThread.cached_tags:
+                tag_index = TagIndex(CompletionTagLoadThread.cached_tags)
+                CompletionTagLoadThread.cached_index = tag_index
+            self.on_load_completiontag_sucess.emit(CompletionTagLoadThread.cached_tags, tag_index)
             return
 
         try:
@@ -77,6 +92,7 @@ class CompletionTagLoadThread(QThread):
             download_url = "https://raw.githubusercontent.com/DCP-arca/NAI-Auto-Generator/main/danbooru_tags_post_count.csv"
             
             tag_list = []
+            tag_index = None
             
             # 파일이 없으면 다운로드 시도
             if not os.path.exists(tag_path):
@@ -99,31 +115,80 @@ class CompletionTagLoadThread(QThread):
             # CSV 파일 처리
             if os.path.exists(tag_path):
                 logger.error(f"태그 파일 로딩 중: {tag_path}")
-                tags = []
-                with open(tag_path, "r", encoding='utf8') as f:
-                    for line in f:
-                        parsed = parse_tag_line(line)
-                        if parsed is not None:
-                            tags.append(parsed)
-                tags = sorted(tags, key=lambda t: t.post_count, reverse=True)
-                tag_list = [format_tag_display(t) for t in tags]
+                # 원본이 바뀌지 않았으면 바이너리 캐시에서 태그 목록과 검색 인덱스를 한 번에 읽음
+                tag_dict = load_tag_dictionary(tag_path)
+                tag_list = tag_dict.display
+                tag_index = tag_dict.tag_index
                         
                 logger.info(f"태그 로딩 완료: {len(tag_list)}개 태그")
                 
                 # 첫 10개 태그 샘플 출력
             if len(tag_list) > 0:
                 CompletionTagLoadThread.cached_tags = tag_list
+                CompletionTagLoadThread.cached_index = tag_index
                 
-                self.on_load_completiontag_sucess.emit(tag_list)
+                self.on_load_completiontag_sucess.emit(tag_list, tag_index)
         except Exception as e:
             logger.error(f"태그 로딩 실패: {str(e)}")
             import traceback
             traceback.print_exc()
-            self.on_load_completiontag_sucess.emit([])
+            self.on_load_completiontag_sucess.emit([], None)
 
         logger.info("----- 태그 자동 완성 로딩 종료 -----")
 
 
+class _GuiDataPrefetcher(QObject):
+    """다음 요청 데이터를 GUI 스레드에서 미리 준비한다.
+
+    _get_data_for_generate는 위젯/QSettings를 읽고 와일드카드 루프카드 상태를 진행시키므로
+    다른 스레드에서 GUI 슬롯과 동시에 돌리지 않고, 큐 연결 시그널로 GUI 스레드에 맡긴다.
+    준비된 데이터가 쓰이지 않고 버려지면 준비 전의 루프카드 상태로 되돌린다.
+    반드시 GUI 스레드에서 생성한다.
+    """
+
+    _build_requested = pyqtSignal(object)
+    _discard_requested = pyqtSignal(object)
+
+    def __init__(self, window):
+        super().__init__()
+        self.window = window
+        self._loopcard_before = None  # (future, 준비 전 루프카드 상태)
+        self._build_requested.connect(self._build, Qt.QueuedConnection)
+        self._discard_requested.connect(self._discard, Qt.QueuedConnection)
+
+    def submit(self) -> Future:
+        """준비를 요청하고 결과를 받을 Future 반환 (어느 스레드에서나 호출 가능)"""
+        future = Future()
+        self._build_requested.emit(future)
+        return future
+
+    def discard(self, future: Future) -> None:
+        """쓰지 않을 준비 결과를 버림 (루프카드 상태 복원은 GUI 스레드에서)"""
+        self._discard_requested.emit(future)
+
+    def _build(self, future: Future) -> None:
+        if not future.set_running_or_notify_cancel():
+            return
+        wcapplier = getattr(self.window, 'wcapplier', None)
+        self._loopcard_before = (future, wcapplier.get_loopcard_state() if wcapplier else None)
+        try:
+            future.set_result(self.window._get_data_for_generate())
+        except Exception as e:
+            future.set_exception(e)
+
+    def _discard(self, future: Future) -> None:
+        if future.cancel():
+            return  # 아직 준비 전
+        if self._loopcard_before is None or self._loopcard_before[0] is not future:
+            return
+        state = self._loopcard_before[1]
+        self._loopcard_before = None
+        wcapplier = getattr(self.window, 'wcapplier', None)
+        if wcapplier and state is not None:
+            wcapplier.set_loopcard_state(state)
+            logger.debug("미리 준비한 요청 데이터를 버리고 루프카드 상태 복원")
+
+
 class AutoGenerateThread(QThread):
     on_data_created = pyqtSignal()
     on_error = pyqtSignal(int, str)
@@ -132,45 +197,117 @@ class AutoGenerateThread(QThread):
     on_statusbar_change = pyqtSignal(str, list)
     on_progress = pyqtSignal(int, int)  # (current, total); total=-1 means indeterminate
 
-    def __init__(self, parent, count: int | str, delay: float | str, ignore_error: bool):
+    def __init__(self, parent, count: int | str, delay: float | str, ignore_error: bool,
+                 job_queue=None, run_id: int | None = None, done: int = 0, run_state: dict | None = None):
+        """
+        Args:
+            job_queue: 작업별 확정 파라미터와 상태를 기록할 JobQueue (없으면 기록하지 않음)
+            run_id: job_queue의 실행 ID
+            done: 이어서 실행할 때 이미 완료된 작업 수 (진행률 표시용)
+            run_state: 작업을 계획할 때마다 실행 상태에 함께 기록할 고정 값 (매수, 딜레이 등)
+        """
         super(AutoGenerateThread, self).__init__(parent)
         self.count = int(count or -1)
         self.delay = float(delay or 0.01)
         self.ignore_error = ignore_error
+        self.job_queue = job_queue
+        self.run_id = run_id
+        self.done = done
+        self.run_state = run_state or {}
         self.is_dead = False
         self._pause_event = threading.Event()
         self._pause_event.set()  # 초기 상태: 실행 중
+        self._prefetcher = _GuiDataPrefetcher(parent)
 
     def run(self):
+        """준비 → API 요청 → 저장을 파이프라인으로 실행한다.
+
+        다음 요청의 데이터 준비(와일드카드 전개, 이미지 base64 인코딩)는 현재 요청이
+        진행되는 동안 GUI 스레드에서 수행되고, 응답 zip의 해제/저장은 쓰기 단계가
+        bounded queue를 통해 넘겨받아 처리한다.
+        """
         parent = self.parent()
 
-        count = self.count
+        # 설정/이미지 배치 모드에서는 다음 데이터가 GUI 쪽 배치 진행(_on_success_autogenerate)에
+        # 의존하므로 미리 준비하지 않고, 저장이 끝난 뒤 순차적으로 준비한다
+        is_batch_mode = bool(parent.list_settings_batch_target) or \
+            bool(parent.dict_img_batch_target["img2img_foldersrc"]) or \
+            bool(parent.dict_img_batch_target["vibe_foldersrc"])
+
+        writer = _ImageWriterStage(self)
+        writer.start()
+        try:
+            is_completed = self._run_pipeline(parent, writer, is_batch_mode)
+        finally:
+            writer.finish()
+
+        if not is_completed or self.is_dead:
+            return
+        if writer.error and not self.ignore_error:
+            self.on_error.emit(*writer.error)
+            return
+        if self.job_queue is not None:
+            self.job_queue.finish_run(self.run_id)
+        self.on_end.emit()
+
+    def _run_pipeline(self, parent, writer, is_batch_mode) -> bool:
+        """요청 단계 루프. 중단/오류로 끝나면 False, 모든 요청을 마치면 True를 반환한다."""
+        self._next_data_future = None
+        try:
+            return self._run_requests(parent, writer, is_batch_mode)
+        finally:
+            # 중단/오류로 쓰이지 않은 미리 준비 데이터는 루프카드 상태를 되돌리고 버림
+            if self._next_data_future is not None:
+                self._prefetcher.discard(self._next_data_future)
+                self._next_data_future = None
+
+    def _run_requests(self, parent, writer, is_batch_mode) -> bool:
+        count = self.count - self.done if self.count > 0 else self.count
         delay = float(self.delay)
 
         temp_preserve_data_once = False
+        job = None
         while count != 0:
             # 일시정지 대기 (is_dead 체크도 함께)
             while not self._pause_event.is_set():
                 if self.is_dead:
-                    return
+                    return False
                 time.sleep(0.2)
             if self.is_dead:
-                return
+                return False
+
+            # 이전 이미지 저장 실패 확인
+            if writer.error and not self.ignore_error:
+                return True
 
             # 1. Generate
 
             # generate data
             if not temp_preserve_data_once:
+                if is_batch_mode:
+                    writer.wait_idle()
+                # 이어서 실행: 기록된 작업 중 끝나지 않은 것을 기록된 파라미터 그대로 다시 요청
+                job = self.job_queue.next_unfinished_job(self.run_id) if self.job_queue is not None else None
                 try:
-                    data = parent._get_data_for_generate()
+                    if job is not None:
+                        data = job.params
+                    else:
+                        # 미리 준비한 것이 없으면 지금 GUI 스레드에 준비를 맡기고 기다림
+                        future = self._next_data_future or self._prefetcher.submit()
+                        self._next_data_future = None
+                        data = self._wait_prepared(future)
+                        if self.is_dead:
+                            self._prefetcher.discard(future)
+                            return False
                     if data is None:
                         self.on_error.emit(1, tr('errors.data_generation_failed'))
-                        return
+                        return False
                     parent.nai.set_param_dict(data)
                     self.on_data_created.emit()
                 except Exception as e:
                     self.on_error.emit(1, tr('errors.data_generation_error').format(str(e)))
-                    return
+                    return False
+            temp_preserve_data_once = False
 
             # progress bar 업데이트
             if self.count <= -1:
@@ -192,26 +329,50 @@ class AutoGenerateThread(QThread):
                 path = path + "/" + setting_name
                 create_folder_if_not_exists(path)
 
+            if self.job_queue is not None:
+                if job is None:
+                    # 다음 작업 데이터를 미리 준비하기 전에 기록해야 루프카드 상태가 이 작업까지만 반영됨
+                    state = dict(self.run_state, **parent._get_autogenerate_state())
+                    job = self.job_queue.add_job(self.run_id, data, path, state)
+                else:
+                    path = job.path
+                    create_folder_if_not_exists(path)
+                self.job_queue.mark_running(job.id)
+
+            # 현재 요청이 진행되는 동안 다음 요청 데이터를 미리 준비
+            if not is_batch_mode and count != 1 and self._next_data_future is None:
+                self._next_data_future = self._prefetcher.submit()
+
             # generate image
-            error_code, result_str = _threadfunc_generate_image(
-                self, path)
+            error_code, result = _request_generate_image(parent.nai)
             if self.is_dead:
-                return
+                return False
             if error_code == 0:
-                self.on_success.emit(result_str)
+                # 잔액은 서버에 묻지 않고 추정해 바로 반영 (실제 조회는 AnlasTracker가 모아서)
+                if getattr(parent, 'anlas_tracker', None) is not None:
+                    parent.anlas_tracker.charge(parent.nai.parameters)
+                # 이미 과금되었으므로 이후 저장이 실패해도 이 작업은 다시 요청하지 않음
+                if job is not None:
+                    self.job_queue.mark_generated(job.id)
+                # 파일명 생성에 필요한 파라미터는 다음 요청이 덮어쓰기 전에 스냅샷
+                params = dict(parent.nai.parameters)
+                params[FILENAME_CHARACTER_KEY] = data.get(FILENAME_CHARACTER_KEY, "")
+                writer.put(result, params, path, job.id if job is not None else None)
             else:
+                if job is not None:
+                    self.job_queue.mark_failed(job.id, result)
                 if self.ignore_error:
                     for t in range(int(delay), 0, -1):
                         self.on_statusbar_change.emit("AUTO_ERROR_WAIT", [t])
                         time.sleep(1)
                         if self.is_dead:
-                            return
+                            return False
 
                     temp_preserve_data_once = True
                     continue
                 else:
-                    self.on_error.emit(error_code, result_str)
-                    return
+                    self.on_error.emit(error_code, result)
+                    return False
 
             # 2. Wait
             count -= 1
@@ -221,15 +382,24 @@ class AutoGenerateThread(QThread):
                     # 일시정지 상태면 대기 중 메시지 유지하며 블로킹
                     while not self._pause_event.is_set():
                         if self.is_dead:
-                            return
+                            return False
                         time.sleep(0.2)
                     self.on_statusbar_change.emit("AUTO_WAIT", [temp_delay])
                     time.sleep(1)
                     if self.is_dead:
-                        return
+                        return False
                     temp_delay -= 1
 
-        self.on_end.emit()
+        return True
+
+    def _wait_prepared(self, future: Future):
+        """GUI 스레드의 데이터 준비를 기다림 (중단되면 None)"""
+        while True:
+            try:
+                return future.result(timeout=0.2)
+            except FutureTimeoutError:
+                if self.is_dead:
+                    return None
 
     def pause(self) -> None:
         self._pause_event.clear()
@@ -245,13 +415,170 @@ class AutoGenerateThread(QThread):
         self.is_dead = True
         self.quit()
 
+    def cancel(self) -> None:
+        """사용자 중지: 스레드를 멈추고 실행을 취소 처리한다.
+
+        취소된 실행은 이어서 실행 대상이 아니다 (오류나 비정상 종료로 끝난 실행만 이어서 실행).
+        """
+        self.stop()
+        if self.job_queue is not None:
+            self.job_queue.finish_run(self.run_id, RUN_CANCELLED)
+
+
+class _ImageWriterStage(threading.Thread):
+    """자동 생성 파이프라인의 쓰기 단계.
+
+    API 응답(zip 바이트)을 bounded queue로 넘겨받아 해제/저장하고,
+    저장이 끝나면 소유 스레드의 on_success 시그널을 발생시킨다.
+    저장에 실패하면 보관한 바이트로 다시 저장해 보고, 그래도 실패하면 작업을
+    save_failed로 끝낸다 (요청 실패와 달리 다시 요청하지 않음).
+    """
+
+    def __init__(self, owner: AutoGenerateThread, maxsize: int = WRITER_QUEUE_SIZE):
+        super().__init__(name="autogen-writer", daemon=True)
+        self.owner = owner
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.error = None  # (error_code, message) - 마지막 저장 실패
+
+    def put(self, result: bytes, params: dict, path: str, job_id: int | None = None) -> None:
+        # 큐가 가득 차면 이전 이미지 저장이 끝날 때까지 요청 단계가 대기
+        self.queue.put((result, params, path, job_id))
+
+    def wait_idle(self) -> None:
+        """대기 중인 저장 작업이 모두 끝날 때까지 블로킹"""
+        self.queue.join()
+
+    def finish(self) -> None:
+        """남은 저장 작업을 처리한 뒤 스레드를 종료"""
+        self.queue.put(None)
+        self.join()
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                result, params, path, job_id = item
+                try:
+                    error_code, result_str = self._save(result, params, path)
+                except Exception as e:
+                    logger.error(f"쓰기 단계 오류: {e}", exc_info=True)
+                    error_code, result_str = 4, str(e)
+                job_queue = self.owner.job_queue
+                if error_code == 0:
+                    if job_id is not None:
+                        job_queue.mark_done(job_id, result_str)
+                    if not self.owner.is_dead:
+                        self.owner.on_success.emit(result_str)
+                else:
+                    logger.error(f"자동 생성 이미지 저장 실패 ({error_code}): {result_str}")
+                    if job_id is not None:
+                        job_queue.mark_save_failed(job_id, result_str)
+                    self.error = (error_code, result_str)
+            except Exception as e:
+                logger.error(f"쓰기 단계 오류: {e}", exc_info=True)
+                self.error = (4, str(e))
+            finally:
+                self.queue.task_done()
+
+
+    def _save(self, result: bytes, params: dict, path: str) -> tuple[int, str]:
+        """저장 오류(3)는 보관한 응답 바이트로 SAVE_ATTEMPTS번까지 다시 시도"""
+        for attempt in range(1, SAVE_ATTEMPTS + 1):
+            error_code, result_str = _save_generated_image(self.owner.parent(), result, params, path)
+            if error_code != 3 or attempt == SAVE_ATTEMPTS:
+                return error_code, result_str
+            logger.warning(f"이미지 저장 재시도 {attempt}/{SAVE_ATTEMPTS - 1}: {result_str}")
+            time.sleep(SAVE_RETRY_DELAY)
+
+
+def _request_generate_image(nai) -> tuple[int, bytes | str]:
+    """현재 nai.parameters로 API를 호출한다.
+
+    Returns:
+        tuple: (0, zip 바이트) 또는 (1, 오류 메시지)
+    """
+    action = action_for_parameters(nai.parameters)
+
+    # 액션 타입 로깅
+    logger.debug(f"Image generation action: {action}")
+
+    result = nai.generate_image(action)
+
+    # 튜플 반환 확인 (오류 발생 시)
+    if isinstance(result, tuple) and len(result) == 2 and result[0] is None:
+        error_message = result[1]
+        logger.error(f"API 오류: {error_message}")
+        return 1, error_message  # 오류 코드와 메시지 반환
+
+    if not result:
+        logger.error("서버에서 정보를 가져오는데 실패했습니다.")
+        return 1, tr('errors.gen_err_1')
+
+    return 0, result
+
+
+def _format_filename(format_template, nai_params, parent_window):
+    """파일명 템플릿을 실제 파일명으로 변환 (플레이스홀더는 format_result_filename 참고)
 
-def _threadfunc_generate_image(thread_self, path: str) -> tuple[int, str]:
+    저장 스레드에서 호출되므로 위젯은 읽지 않는다. 캐릭터 프롬프트는 요청 데이터를 만들 때
+    GUI 스레드에서 읽어 nai_params[FILENAME_CHARACTER_KEY]에 담아 둔 값을 쓴다.
+    """
+    prompt_limit = int(parent_window.settings.value("filename_prompt_word_limit", 50))
+    character_limit = int(parent_window.settings.value("filename_character_word_limit", 30))
+    character_prompt = nai_params.get(FILENAME_CHARACTER_KEY) or ""
+
+    return format_result_filename(format_template, nai_params, prompt_limit,
+                                  character_prompt, character_limit)
+
+
+def _save_generated_image(parent, result: bytes, nai_params: dict, path: str) -> tuple[int, str]:
+    """API 응답 zip의 이미지를 저장한다.
+
+    Returns:
+        tuple: (error_code, result_str) - _threadfunc_generate_image와 동일한 오류 코드 체계
+    """
+    # 2: 이미지 열기 (zip 구조만 확인하고 픽셀은 디코딩하지 않음)
+    try:
+        open_result_member(result)
+    except Exception as e:
+        logger.error(f"이미지 열기 오류: {e}")
+        return 2, str(e)
+
+    # 3: 이미지 저장
+    create_folder_if_not_exists(path)
+
+    # 파일명 생성 로직
+    # 사용자 정의 포맷 가져오기
+    filename_format = parent.settings.value("filename_format", DEFAULT_FILENAME_FORMAT)
+    filename = _format_filename(filename_format, nai_params, parent)
+
+    # 최종 저장 경로 생성 (빈 파일명은 시각으로 대체, 중복 파일명 처리)
+    dst = make_result_path(path, filename)
+
+    # 상세 로깅
+    logger.debug(f"최종 저장 경로: {dst}")
+
+    try:
+        # 기본(raw) 모드는 API가 준 PNG 바이트를 그대로 원자적으로 기록
+        save_mode = parent.settings.value("image_save_mode", SAVE_MODE_RAW)
+        save_result_image(result, dst, save_mode)
+        logger.info(f"이미지 성공적으로 저장: {dst}")
+    except Exception as e:
+        logger.error(f"이미지 저장 오류: {e}")
+        return 3, str(e)
+
+    return 0, dst
+
+
+def _threadfunc_generate_image(thread_self, path: str, character_prompt: str = "") -> tuple[int, str]:
     """이미지 생성 스레드의 핵심 로직.
     
     Args:
         thread_self: 호출하는 QThread 인스턴스 (parent() 접근용)
         path: 이미지 저장 경로
+        character_prompt: 파일명 [character]용 첫 캐릭터 프롬프트 (GUI 스레드에서 읽은 값)
         
     Returns:
         tuple: (error_code, result_str)
@@ -262,159 +589,20 @@ def _threadfunc_generate_image(thread_self, path: str) -> tuple[int, str]:
             - error_code 4: 예기치 못한 오류
     """
     try:
-        # 중앙 로거 가져오기
-        from logger import get_logger
-        logger = get_logger()
-        
         # 1: 이미지 생성
         parent = thread_self.parent()
         nai = parent.nai
 
-        # action 결정 (순서 중요: mask 체크를 먼저!)
-        if nai.parameters.get("mask"):
-            action = NAIAction.infill
-            logger.info("✓ Mask detected - using NAIAction.infill")
-        elif nai.parameters.get("image"):
-            action = NAIAction.img2img
-            logger.info("img2img mode detected - using NAIAction.img2img")
-        else:
-            action = NAIAction.generate
-
-        # 액션 타입 로깅
-        logger.debug(f"Image generation action: {action}")
-        
-        # 이 부분 수정: 튜플 반환값 확인 및 처리
-        result = nai.generate_image(action)
-        
-        # 튜플 반환 확인 (오류 발생 시)
-        if isinstance(result, tuple) and len(result) == 2 and result[0] is None:
-            error_message = result[1]
-            logger.error(f"API 오류: {error_message}")
-            return 1, error_message  # 오류 코드와 메시지 반환
-            
-        if not result:
-            logger.error("서버에서 정보를 가져오는데 실패했습니다.")
-            return 1, tr('errors.gen_err_1')
-        
-        # 2: 이미지 열기
-        try:
-            zipped = zipfile.ZipFile(io.BytesIO(result))
-            image_bytes = zipped.read(zipped.infolist()[0])
-            img = Image.open(io.BytesIO(image_bytes))
-        except Exception as e:
-            logger.error(f"이미지 열기 오류: {e}")
-            return 2, str(e)
-        
-        # 3: 이미지 저장
-        create_folder_if_not_exists(path)
-
-        # 안전한 파일명 생성
-        def sanitize_filename(filename):
-            # 윈도우 파일명에 허용되지 않는 문자 제거
-            return "".join(c for c in filename if c.isalnum() or c in (' ', '_', '-', '.')).rstrip()
-
-        # 파일명 형식화 함수
-        def format_filename(format_template, nai_params, parent_window):
-            """
-            파일명 템플릿을 실제 파일명으로 변환
-
-            지원되는 플레이스홀더:
-            [datetime] - 날짜+시간 (251118_11240833)
-            [date] - 날짜만 (251118)
-            [time] - 시간만 (11240833)
-            [prompt] - 프롬프트 텍스트
-            [character] - 캐릭터 프롬프트 (첫 번째)
-            [seed] - 시드 값
-            """
-            now = datetime.datetime.now()
-
-            # 날짜/시간 포맷
-            datetime_str = now.strftime("%y%m%d_%H%M%S%f")[:-4]
-            date_str = now.strftime("%y%m%d")
-            time_str = now.strftime("%H%M%S%f")[:-4]
-
-            # 프롬프트 가져오기 및 길이 제한
-            prompt_limit = int(parent_window.settings.value("filename_prompt_word_limit", 50))
-            prompt_text = sanitize_filename(nai_params.get("prompt", ""))[:prompt_limit]
-
-            # 캐릭터 프롬프트 가져오기
-            character_text = ""
-            try:
-                if hasattr(parent_window, 'character_prompts_container'):
-                    char_data = parent_window.character_prompts_container.get_data()
-                    if char_data and "characters" in char_data and len(char_data["characters"]) > 0:
-                        first_char = char_data["characters"][0]
-                        char_prompt = first_char.get("prompt", "")
-                        if char_prompt:
-                            character_limit = int(parent_window.settings.value("filename_character_word_limit", 30))
-                            character_text = sanitize_filename(char_prompt)[:character_limit]
-            except Exception as e:
-                logger.debug(f"캐릭터 프롬프트 가져오기 실패: {e}")
-
-            # 시드 가져오기
-            seed = nai_params.get("seed", "")
-
-            # 플레이스홀더 치환
-            result = format_template
-            result = result.replace("[datetime]", datetime_str)
-            result = result.replace("[date]", date_str)
-            result = result.replace("[time]", time_str)
-            result = result.replace("[prompt]", prompt_text)
-            result = result.replace("[character]", character_text)
-            result = result.replace("[seed]", str(seed))
-
-            # 빈 플레이스홀더로 인한 연속 구분자 제거 (예: "__" -> "_")
-            while "__" in result:
-                result = result.replace("__", "_")
-            while "  " in result:
-                result = result.replace("  ", " ")
-
-            # 시작/끝의 구분자 제거
-            result = result.strip("_- ")
-
-            return result
-
-        # 파일명 생성 로직
-        # 사용자 정의 포맷 가져오기
-        filename_format = thread_self.parent().settings.value("filename_format", "[datetime]_[prompt]")
-        filename = format_filename(filename_format, nai.parameters, thread_self.parent())
-
-        # 파일명이 비어있거나 너무 짧으면 기본 포맷 사용
-        if not filename or len(filename) < 3:
-            logger.warning("파일명 형식화 결과가 비어있음, 기본 포맷 사용")
-            timename = datetime.datetime.now().strftime("%y%m%d_%H%M%S%f")[:-4]
-            filename = timename
-
-        # 파일 확장자 추가
-        filename += ".png"
-        
-        # 최종 저장 경로 생성
-        dst = os.path.join(path, filename)
-        
-        # 중복 파일명 처리
-        counter = 1
-        base, ext = os.path.splitext(dst)
-        while os.path.exists(dst):
-            dst = f"{base}_{counter}{ext}"
-            counter += 1
-        
-        # 상세 로깅
-        logger.debug(f"최종 저장 경로: {dst}")
-        logger.debug(f"파일명: {filename}")
-        
-        try:
-            img.save(dst)
-            logger.info(f"이미지 성공적으로 저장: {dst}")
-        except Exception as e:
-            logger.error(f"이미지 저장 오류: {e}")
-            return 3, str(e)
-        
-        return 0, dst
-    
+        error_code, result = _request_generate_image(nai)
+        if error_code != 0:
+            return error_code, result
+
+        # 2~3: 이미지 열기 및 저장
+        params = dict(nai.parameters)
+        params[FILENAME_CHARACTER_KEY] = character_prompt
+        return _save_generated_image(parent, result, params, path)
+
     except Exception as e:
-        # 중앙 로거 사용 및 예외 정보 포함
-        from logger import get_logger
-        logger = get_logger()
         logger.critical(f"예기치 못한 오류: {e}", exc_info=True)
         return 4, str(e)
 
@@ -422,14 +610,15 @@ def _threadfunc_generate_image(thread_self, path: str) -> tuple[int, str]:
 class GenerateThread(QThread):
     generate_result = pyqtSignal(int, str)
 
-    def __init__(self, parent):
+    def __init__(self, parent, character_prompt: str = ""):
         super(GenerateThread, self).__init__(parent)
         self.is_stopped = False
+        self.character_prompt = character_prompt
 
     def run(self):
         path = self.parent().settings.value(
             "path_results", DEFAULT_PATH["path_results"])
-        error_code, result_str = _threadfunc_generate_image(self, path)
+        error_code, result_str = _threadfunc_generate_image(self, path, self.character_prompt)
         
         if not self.is_stopped:
             self.generate_result.emit(error_code, result_str)
@@ -460,13 +649,54 @@ class TokenValidateThread(QThread):
             self.validation_result.emit(1)  # 오류 발생 시 실패로 처리
 
 
-class AnlasThread(QThread):
-    anlas_result = pyqtSignal(int)
+class EnhanceFolderScanThread(QThread):
+    """Bulk Enhancement 폴더의 NAI 이미지를 백그라운드에서 병렬로 찾는다.
 
-    def __init__(self, parent):
-        super(AnlasThread, self).__init__(parent)
+    유효한 이미지는 찾는 즉시 폴더 목록 순서대로 on_found로 전달되고,
+    파일별 결과는 디스크 캐시에 남아 같은 폴더를 다시 스캔하면 바뀐 파일만 읽는다.
+    """
+    on_found = pyqtSignal(str)
+    on_progress = pyqtSignal(int, int)  # (done, total)
+    on_finished = pyqtSignal(list, bool)  # (유효 이미지 목록, 취소 여부)
+    on_error = pyqtSignal(str)
+
+    def __init__(self, parent, folder_path, read_stealth=True):
+        super(EnhanceFolderScanThread, self).__init__(parent)
+        self.folder_path = folder_path
+        self.read_stealth = read_stealth
+        self.is_stopped = False
 
     def run(self):
-        anlas = self.parent().nai.get_anlas() or -1
+        try:
+            file_paths = list_image_files(self.folder_path)
+        except Exception as e:
+            logger.error(f"Error scanning folder: {e}")
+            self.on_error.emit(str(e))
+            return
 
-        self.anlas_result.emit(anlas)
+        cache = get_default_cache()
+        total = len(file_paths)
+        valid_images = []
+        self.on_progress.emit(0, total)
+        try:
+            for done, (file_path, valid) in enumerate(
+                    scan_files(file_paths, self.read_stealth, cache, is_cancelled=lambda: self.is_stopped), 1):
+                if valid:
+                    valid_images.append(file_path)
+                    self.on_found.emit(file_path)
+                self.on_progress.emit(done, total)
+        except Exception as e:
+            logger.error(f"Error scanning folder: {e}")
+            self.on_error.emit(str(e))
+            return
+        finally:
+            if not self.is_stopped:
+                cache.prune(self.folder_path, file_paths)
+            cache.save()
+
+        logger.info(f"Folder scan {'cancelled' if self.is_stopped else 'finished'}: "
+                    f"{len(valid_images)}/{total} NAI images")
+        self.on_finished.emit(valid_images, self.is_stopped)
+
+    def stop(self) -> None:
+        self.is_stopped = True
@@ -0,0 +1,379 @@
+"""
+headless_runner.py - GUI 없이 설정 파일로 이미지 자동 생성
+
+GUI의 "세팅 저장"으로 만든 설정 파일(.txt, JSON)을 읽어 요청마다 와일드카드를 전개하고
+NAIGenerator로 생성한 결과를 저장합니다. PyQt를 불러오지 않으므로 서버에서 실행하거나
+로컬 테스트 서버를 상대로 처리량을 측정할 때 사용합니다.
+
+사용법:
+    python headless_runner.py SETTINGS.txt --count 10 [--concurrency 2] [--delay 1.0] [--rate 0.5]
+                              [--output DIR] [--wildcards DIR] [--api-url URL] [--image-url URL]
+
+인증 (둘 중 하나):
+    --api-key pst-... 또는 환경변수 NAI_API_KEY
+    환경변수 NAI_USERNAME / NAI_PASSWORD
+"""
+
+import argparse
+import json
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+
+from consts import DEFAULT_PATH
+from image_saver import (open_result_member, save_result_image, format_result_filename, make_result_path,
+                         SAVE_MODE_RAW, DEFAULT_FILENAME_FORMAT)
+from nai_generator import NAIGenerator, BASE_URL_DEPRE, BASE_URL
+from nai_transport import NAITransport
+from request_scheduler import RequestScheduler
+from wildcard_applier import WildcardApplier
+
+from logger import get_logger
+logger = get_logger()
+
+DEFAULT_CONCURRENCY = 1
+# 설정 파일 값이 문자열로 저장된 경우를 위한 타입 변환 (GUI get_data(True)와 동일)
+_INT_FIELDS = ("width", "height", "steps")
+_FLOAT_FIELDS = ("scale", "cfg_rescale", "strength", "noise", "reference_information_extracted",
+                 "reference_strength", "anti_artifacts")
+_BOOL_FIELDS = ("autoSmea", "quality_toggle", "dynamic_thresholding", "legacy")
+
+
+def _to_bool(value) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in ("true", "1", "yes")
+    return bool(value)
+
+
+def load_settings_file(path: str) -> dict:
+    """GUI에서 저장한 설정 파일(.txt, JSON) 읽기"""
+    with open(path, "r", encoding="utf8") as f:
+        return json.load(f)
+
+
+class GenerationDataBuilder:
+    """설정 파일 내용으로 요청마다 새 파라미터 dict를 만든다.
+
+    GUI의 _get_data_for_generate 중 설정 파일로 표현되는 부분(프롬프트, 캐릭터 프롬프트,
+    시드, Variety+, V4 고정값)만 재현하며 이미지 입력(img2img/vibe/enhance)은 다루지 않는다.
+    """
+
+    def __init__(self, settings: dict, wcapplier: WildcardApplier | None = None):
+        self.settings = settings
+        # 폴더가 없어도 <a|b> 선택 문법은 GUI처럼 항상 전개되어야 하므로 WildcardApplier는 항상 둠
+        self.wcapplier = wcapplier if wcapplier is not None else WildcardApplier(DEFAULT_PATH["path_wildcards"])
+
+    def _apply_wildcards(self, text: str, use_snapshot: bool = False) -> str:
+        if not text:
+            return text
+        if use_snapshot:
+            return self.wcapplier.apply_wildcards_with_snapshot(text)
+        return self.wcapplier.apply_wildcards(text)
+
+    def _build_character_prompts(self, data: dict) -> None:
+        characters = self.settings.get("characterPrompts") or []
+        # GUI의 설정 불러오기(gui_settings_io)와 같은 기본값 - 값이 없으면 좌표 사용
+        use_coords = _to_bool(self.settings.get("use_character_coords", True))
+        data["use_character_coords"] = use_coords
+        data["characterPrompts"] = []
+        if not characters:
+            return
+
+        self.wcapplier.create_index_snapshot()
+        for char in characters:
+            char_prompt = {}
+            for key in ("prompt", "negative_prompt"):
+                text = re.sub(r'\s+', ' ', (char.get(key) or "").replace("\n", " ")).strip()
+                char_prompt[key] = self._apply_wildcards(text, use_snapshot=True)
+            position = char.get("position")
+            if use_coords and isinstance(position, (list, tuple)) and len(position) == 2:
+                char_prompt["position"] = [float(position[0]), float(position[1])]
+            data["characterPrompts"].append(char_prompt)
+        self.wcapplier.advance_loopcard_indices()
+
+    def build(self) -> dict:
+        settings = self.settings
+        data = {k: v for k, v in settings.items()
+                if k not in ("metadata", "seed_fix_checkbox", "variety_plus", "characterPrompts")}
+
+        for key in _INT_FIELDS:
+            if key in data:
+                data[key] = int(data[key])
+        for key in _FLOAT_FIELDS:
+            if key in data:
+                data[key] = float(data[key])
+        for key in _BOOL_FIELDS:
+            if key in data:
+                data[key] = _to_bool(data[key])
+
+        data["prompt"] = self._apply_wildcards(str(data.get("prompt", "")).replace("\n", " "))
+        data["negative_prompt"] = self._apply_wildcards(str(data.get("negative_prompt", "")).replace("\n", " "))
+
+        seed = int(data.get("seed") or -1)
+        if not _to_bool(settings.get("seed_fix_checkbox", False)) or seed == -1:
+            seed = random.randint(0, 2**32-1)
+        data["seed"] = seed
+
+        # 이미지 입력은 사용하지 않음
+        for key in ("image", "reference_image", "mask", "reference_image_multiple",
+                    "reference_information_extracted_multiple", "reference_strength_multiple",
+                    "reference_fidelity_multiple"):
+            data[key] = None
+
+        # V4 고정값 (GUI와 동일)
+        data["params_version"] = 3
+        data["add_original_image"] = True
+        data["skip_cfg_above_sigma"] = 19 if _to_bool(settings.get("variety_plus", False)) else None
+        data["legacy_v3_extend"] = False
+        data["prefer_brownian"] = True
+        data["deliberate_euler_ancestral_bug"] = False
+        data["controlnet_strength"] = 1
+        data["dynamic_thresholding"] = False
+        data["sm_dyn"] = False
+        data["quality_toggle"] = True
+        if data.get("sampler") == "ddim_v3":
+            data["autoSmea"] = False
+
+        self._build_character_prompts(data)
+        return data
+
+
+@dataclass
+class JobResult:
+    index: int
+    success: bool
+    result: str          # 저장 경로 또는 오류 메시지
+    latency: float       # API 요청 ~ 저장 완료 (초)
+
+
+@dataclass
+class RunStats:
+    results: list = field(default_factory=list)
+    elapsed: float = 0.0
+    cpu_seconds: float = 0.0
+
+    @property
+    def succeeded(self) -> int:
+        return sum(1 for r in self.results if r.success)
+
+    @property
+    def failed(self) -> int:
+        return len(self.results) - self.succeeded
+
+    @property
+    def images_per_min(self) -> float:
+        return self.succeeded * 60.0 / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def cpu_ms_per_image(self) -> float:
+        return self.cpu_seconds * 1000.0 / self.succeeded if self.succeeded else 0.0
+
+    def latency_percentile(self, percent: float) -> float:
+        latencies = sorted(r.latency for r in self.results if r.success)
+        if not latencies:
+            return 0.0
+        rank = min(len(latencies) - 1, max(0, int(round(percent / 100.0 * len(latencies) + 0.5)) - 1))
+        return latencies[rank]
+
+
+class HeadlessRunner:
+    """요청 데이터는 호출 스레드에서 순서대로 만들고, concurrency개의 작업 스레드가
+    각자의 NAIGenerator로 API 요청과 저장을 수행한다.
+
+    Args:
+        nai_factory: 작업 스레드마다 호출되어 로그인된 NAIGenerator를 반환하는 함수
+        builder: 요청 데이터 생성기
+        output_dir: 결과 저장 폴더
+        concurrency: 동시에 진행할 요청 수
+        delay: 작업 스레드가 요청 사이에 쉬는 시간 (초)
+        ignore_error: False면 첫 실패에서 남은 작업을 중단
+        scheduler: 요청 앞단의 동시 요청/속도 제한기 (없으면 concurrency 한도로 생성)
+    """
+
+    def __init__(self, nai_factory, builder: GenerationDataBuilder, output_dir: str,
+                 concurrency: int = DEFAULT_CONCURRENCY, delay: float = 0.0,
+                 filename_format: str = DEFAULT_FILENAME_FORMAT, save_mode: str = SAVE_MODE_RAW,
+                 ignore_error: bool = False, scheduler: RequestScheduler | None = None):
+        self.nai_factory = nai_factory
+        self.builder = builder
+        self.output_dir = output_dir
+        self.concurrency = max(1, int(concurrency))
+        self.delay = max(0.0, float(delay))
+        self.filename_format = filename_format
+        self.save_mode = save_mode
+        self.ignore_error = ignore_error
+        self.scheduler = scheduler or RequestScheduler(max_in_flight=self.concurrency)
+
+        self._stop = threading.Event()
+        self._results_lock = threading.Lock()
+        self._save_lock = threading.Lock()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self.scheduler.stop()
+
+    def _character_prompt(self) -> str:
+        characters = self.builder.settings.get("characterPrompts") or []
+        return characters[0].get("prompt", "") if characters else ""
+
+    def _generate_one(self, nai: NAIGenerator, data: dict) -> tuple[bool, str]:
+        nai.set_param_dict(data)
+        result = self.scheduler.generate(nai)
+        if isinstance(result, tuple) or not result:
+            return False, result[1] if isinstance(result, tuple) else "빈 응답"
+
+        try:
+            open_result_member(result)
+        except Exception as e:
+            return False, f"이미지 열기 오류: {e}"
+
+        filename = format_result_filename(self.filename_format, nai.parameters,
+                                          character_prompt=self._character_prompt())
+        try:
+            # 같은 이름을 고른 두 스레드가 서로 덮어쓰지 않도록 경로 선택과 저장을 묶음
+            with self._save_lock:
+                dst = make_result_path(self.output_dir, filename)
+                save_result_image(result, dst, self.save_mode)
+        except Exception as e:
+            return False, f"이미지 저장 오류: {e}"
+        return True, dst
+
+    def _worker(self, jobs: queue.Queue, stats: RunStats) -> None:
+        nai = None
+        while True:
+            job = jobs.get()
+            if job is None:
+                return
+            if self._stop.is_set():
+                continue
+
+            index, data = job
+            start = time.perf_counter()
+            try:
+                if nai is None:
+                    nai = self.nai_factory()
+                success, result = self._generate_one(nai, data)
+            except Exception as e:
+                logger.error(f"헤드리스 생성 오류 [{index}]: {e}", exc_info=True)
+                success, result = False, str(e)
+            latency = time.perf_counter() - start
+
+            with self._results_lock:
+                stats.results.append(JobResult(index, success, result, latency))
+            if success:
+                logger.info(f"[{index + 1}] 저장: {result} ({latency:.2f}s)")
+            else:
+                logger.error(f"[{index + 1}] 실패: {result}")
+                if not self.ignore_error:
+                    self._stop.set()
+
+            if self.delay and not self._stop.is_set():
+                self._stop.wait(self.delay)
+
+    def run(self, count: int) -> RunStats:
+        os.makedirs(self.output_dir, exist_ok=True)
+        stats = RunStats()
+        # 작업 스레드 수만큼만 미리 준비 (와일드카드 전개 순서는 요청 순서와 같음)
+        jobs = queue.Queue(maxsize=self.concurrency)
+        workers = [threading.Thread(target=self._worker, args=(jobs, stats),
+                                    name=f"headless-{i}", daemon=True)
+                   for i in range(self.concurrency)]
+
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        for w in workers:
+            w.start()
+        try:
+            for index in range(count):
+                if self._stop.is_set():
+                    break
+                jobs.put((index, self.builder.build()))
+        except KeyboardInterrupt:
+            logger.warning("중단 요청 - 진행 중인 요청이 끝나면 종료합니다")
+            self._stop.set()
+        finally:
+            for _ in workers:
+                jobs.put(None)
+            for w in workers:
+                w.join()
+
+        stats.elapsed = time.perf_counter() - wall_start
+        stats.cpu_seconds = time.process_time() - cpu_start
+        stats.results.sort(key=lambda r: r.index)
+        return stats
+
+
+def login(nai: NAIGenerator, api_key: str | None = None,
+          username: str | None = None, password: str | None = None) -> bool:
+    if api_key:
+        return nai.try_login_with_api_key(api_key)
+    if username and password:
+        return nai.try_login(username, password)
+    logger.error("인증 정보 없음: --api-key, NAI_API_KEY 또는 NAI_USERNAME/NAI_PASSWORD 필요")
+    return False
+
+
+def make_generator_factory(base: NAIGenerator):
+    """로그인된 base의 토큰과 연결 풀을 공유하는 NAIGenerator를 만드는 함수 반환.
+
+    NAIGenerator.parameters는 요청마다 바뀌므로 작업 스레드마다 별도 인스턴스를 사용한다.
+    """
+    def factory() -> NAIGenerator:
+        nai = NAIGenerator(base.transport, base.api_url, base.image_url)
+        for attr in ("access_token", "api_key", "login_method", "username", "password",
+                     "_last_successful_login", "_last_token_check"):
+            setattr(nai, attr, getattr(base, attr))
+        return nai
+    return factory
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="NAI Auto Generator 헤드리스 자동 생성")
+    parser.add_argument("settings", help="GUI에서 저장한 설정 파일 (.txt)")
+    parser.add_argument("--count", type=int, default=1, help="생성할 이미지 수")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="동시 요청 수")
+    parser.add_argument("--delay", type=float, default=0.0, help="요청 사이 대기 시간 (초)")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="초기 최대 요청 속도 (요청/초, 기본: 429를 받기 전까지 제한 없음)")
+    parser.add_argument("--output", default=DEFAULT_PATH["path_results"], help="결과 저장 폴더")
+    parser.add_argument("--wildcards", default=DEFAULT_PATH["path_wildcards"], help="와일드카드 폴더")
+    parser.add_argument("--filename-format", default=DEFAULT_FILENAME_FORMAT)
+    parser.add_argument("--ignore-error", action="store_true", help="실패해도 남은 요청을 계속 진행")
+    parser.add_argument("--api-key", default=os.environ.get("NAI_API_KEY"))
+    parser.add_argument("--api-url", default=BASE_URL_DEPRE, help="로그인/계정 API 주소")
+    parser.add_argument("--image-url", default=BASE_URL, help="이미지 생성 API 주소")
+    args = parser.parse_args(argv)
+
+    try:
+        settings = load_settings_file(args.settings)
+    except (OSError, ValueError) as e:
+        print(f"설정 파일을 읽을 수 없습니다: {e}", file=sys.stderr)
+        return 2
+
+    builder = GenerationDataBuilder(settings, WildcardApplier(args.wildcards))
+
+    base = NAIGenerator(NAITransport(pool_maxsize=max(args.concurrency, 1)), args.api_url, args.image_url)
+    if not login(base, args.api_key, os.environ.get("NAI_USERNAME"), os.environ.get("NAI_PASSWORD")):
+        print("로그인에 실패했습니다.", file=sys.stderr)
+        return 2
+
+    scheduler = RequestScheduler(max_in_flight=args.concurrency, rate=args.rate)
+    runner = HeadlessRunner(make_generator_factory(base), builder, args.output,
+                            concurrency=args.concurrency, delay=args.delay,
+                            filename_format=args.filename_format, ignore_error=args.ignore_error,
+                            scheduler=scheduler)
+    stats = runner.run(args.count)
+    logger.info(f"스케줄러 상태: {scheduler.get_stats()}")
+
+    print(f"완료 {stats.succeeded}/{args.count}, 실패 {stats.failed}, "
+          f"{stats.elapsed:.1f}s ({stats.images_per_min:.1f} images/min)")
+    return 0 if stats.failed == 0 and stats.succeeded == args.count else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
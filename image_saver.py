@@ -0,0 +1,165 @@
+"""
+image_saver.py - 생성 결과 이미지 저장
+
+NovelAI API는 메타데이터가 포함된 완성된 PNG를 zip으로 반환하므로,
+디코딩/재압축 없이 zip 멤버 바이트를 그대로 파일에 기록합니다.
+GUI 미리보기는 저장된 파일을 필요할 때 디코딩합니다.
+"""
+
+import datetime
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+
+from PIL import Image
+
+from logger import get_logger
+logger = get_logger()
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+SAVE_MODE_RAW = "raw"            # zip 멤버 바이트를 그대로 기록 (기본값)
+SAVE_MODE_REENCODE = "reencode"  # PIL로 디코딩 후 다시 PNG 인코딩 (이전 동작)
+
+DEFAULT_FILENAME_FORMAT = "[datetime]_[prompt]"
+
+
+def _read_umask() -> int:
+    # os.umask는 값을 바꿔야만 읽을 수 있고 스레드 사이에 안전하지 않으므로 import 시 한 번만 읽음
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+# mkstemp는 0600으로 파일을 만들므로 일반 open()/Image.save와 같은 권한으로 맞출 때 사용
+_FILE_MODE = 0o666 & ~_read_umask()
+
+
+def open_result_member(result: bytes):
+    """API 응답 zip에서 첫 번째 이미지 멤버의 (ZipFile, ZipInfo)를 반환"""
+    zipped = zipfile.ZipFile(io.BytesIO(result))
+    return zipped, zipped.infolist()[0]
+
+
+def _is_png_member(zipped: zipfile.ZipFile, info: zipfile.ZipInfo) -> bool:
+    with zipped.open(info) as f:
+        return f.read(len(PNG_SIGNATURE)) == PNG_SIGNATURE
+
+
+def write_atomic(dst: str, write_func) -> None:
+    """같은 폴더의 임시 파일에 기록한 뒤 rename하여 반쯤 쓰인 파일이 남지 않도록 한다.
+
+    Args:
+        dst: 최종 파일 경로
+        write_func: 열린 바이너리 파일 객체를 받아 내용을 기록하는 함수
+    """
+    folder = os.path.dirname(os.path.abspath(dst))
+    fd, tmp_path = tempfile.mkstemp(prefix=".saving_", suffix=".tmp", dir=folder)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write_func(f)
+        os.chmod(tmp_path, _FILE_MODE)
+        os.replace(tmp_path, dst)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def save_result_image(result: bytes, dst: str, mode: str = SAVE_MODE_RAW) -> None:
+    """API 응답 zip의 이미지를 dst에 저장한다.
+
+    raw 모드에서는 PNG 멤버를 스트리밍 복사만 하며, 멤버가 PNG가 아니면
+    reencode 모드로 대체하여 확장자와 포맷이 어긋나지 않게 한다.
+
+    Raises:
+        zipfile.BadZipFile, IndexError: 응답이 올바른 zip이 아닌 경우
+        OSError: 파일 기록 실패
+    """
+    zipped, info = open_result_member(result)
+
+    if mode == SAVE_MODE_RAW and _is_png_member(zipped, info):
+        def copy_member(f):
+            with zipped.open(info) as src:
+                shutil.copyfileobj(src, f, 1024 * 1024)
+        write_atomic(dst, copy_member)
+        return
+
+    if mode == SAVE_MODE_RAW:
+        logger.warning(f"응답 이미지가 PNG가 아님 ({info.filename}) - 재인코딩하여 저장")
+
+    img = Image.open(io.BytesIO(zipped.read(info)))
+    write_atomic(dst, lambda f: img.save(f, format="PNG"))
+
+
+def sanitize_filename(filename: str) -> str:
+    # 윈도우 파일명에 허용되지 않는 문자 제거
+    return "".join(c for c in filename if c.isalnum() or c in (' ', '_', '-', '.')).rstrip()
+
+
+# 요청 데이터에 함께 담는 파일명 [character]용 첫 캐릭터 프롬프트 (API 파라미터가 아님)
+FILENAME_CHARACTER_KEY = "filename_character_prompt"
+
+
+def format_result_filename(format_template: str, nai_params: dict, prompt_limit: int = 50,
+                           character_prompt: str = "", character_limit: int = 30) -> str:
+    """
+    파일명 템플릿을 실제 파일명으로 변환 (확장자 제외)
+
+    지원되는 플레이스홀더:
+    [datetime] - 날짜+시간 (251118_11240833)
+    [date] - 날짜만 (251118)
+    [time] - 시간만 (11240833)
+    [prompt] - 프롬프트 텍스트
+    [character] - 캐릭터 프롬프트 (첫 번째)
+    [seed] - 시드 값
+    """
+    now = datetime.datetime.now()
+
+    # 날짜/시간 포맷
+    datetime_str = now.strftime("%y%m%d_%H%M%S%f")[:-4]
+    date_str = now.strftime("%y%m%d")
+    time_str = now.strftime("%H%M%S%f")[:-4]
+
+    prompt_text = sanitize_filename(nai_params.get("prompt", ""))[:prompt_limit]
+    character_text = sanitize_filename(character_prompt)[:character_limit] if character_prompt else ""
+    seed = nai_params.get("seed", "")
+
+    # 플레이스홀더 치환
+    result = format_template
+    result = result.replace("[datetime]", datetime_str)
+    result = result.replace("[date]", date_str)
+    result = result.replace("[time]", time_str)
+    result = result.replace("[prompt]", prompt_text)
+    result = result.replace("[character]", character_text)
+    result = result.replace("[seed]", str(seed))
+
+    # 빈 플레이스홀더로 인한 연속 구분자 제거 (예: "__" -> "_")
+    while "__" in result:
+        result = result.replace("__", "_")
+    while "  " in result:
+        result = result.replace("  ", " ")
+
+    # 시작/끝의 구분자 제거
+    result = result.strip("_- ")
+
+    return result
+
+
+def make_result_path(folder: str, filename: str) -> str:
+    """folder/filename.png 경로. 비어있거나 너무 짧은 이름은 시각으로 대체하고 중복 시 _N을 붙인다."""
+    if not filename or len(filename) < 3:
+        logger.warning("파일명 형식화 결과가 비어있음, 기본 포맷 사용")
+        filename = datetime.datetime.now().strftime("%y%m%d_%H%M%S%f")[:-4]
+
+    dst = os.path.join(folder, filename + ".png")
+    counter = 1
+    base, ext = os.path.splitext(dst)
+    while os.path.exists(dst):
+        dst = f"{base}_{counter}{ext}"
+        counter += 1
+    return dst
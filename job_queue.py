@@ -0,0 +1,328 @@
+"""
+job_queue.py - 자동 생성 작업 큐 (SQLite)
+
+자동 생성 실행(run)마다 계획된 각 작업의 확정 파라미터(와일드카드 적용 후 set_param_dict에
+넘기는 데이터)와 상태를 디스크에 기록합니다. 프로그램이 중간에 종료되어도
+    - 완료된 작업은 건너뛰고
+    - 계획만 되었거나 요청이 실패한 작업은 기록된 파라미터 그대로 다시 요청하며
+    - 응답은 받았지만 저장하지 못한 작업은 다시 요청하지 않고 (이미 Anlas가 차감됨) 오류로 끝내며
+    - 새 작업은 기록된 루프카드/설정 배치 위치부터 이어서 계획
+할 수 있습니다.
+
+이미지 base64 같은 큰 문자열은 작업 행에 직접 넣지 않고 내용 해시로 payloads 테이블에 한 번만
+저장한 뒤 참조합니다 (같은 img2img/vibe/마스크 이미지를 쓰는 작업 수천 개가 같은 행을 공유).
+
+상태 전이: pending → running → generated → done | save_failed
+                          └→ failed (요청 실패. 최대 시도 횟수까지 다시 pending으로 취급)
+save_failed는 "생성은 되었지만 저장 실패"로, 다시 요청하지 않고 완료 수에 포함한다.
+"""
+
+import json
+import os
+from contextlib import contextmanager
+from hashlib import blake2b
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+
+from consts import DEFAULT_CACHE_PATH
+
+from logger import get_logger
+logger = get_logger()
+
+JOB_QUEUE_FILENAME = "autogen_jobs.sqlite3"
+DEFAULT_MAX_ATTEMPTS = 3
+# 이 길이 이상의 문자열(이미지 base64 등)은 payloads 테이블로 분리
+PAYLOAD_MIN_LENGTH = 4096
+PAYLOAD_REF_KEY = "$payload"
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_GENERATED = "generated"        # API 응답 수신 (과금됨), 저장 전
+JOB_DONE = "done"
+JOB_SAVE_FAILED = "save_failed"    # 생성되었지만 저장 실패 - 다시 요청하지 않음
+JOB_FAILED = "failed"
+# 실행의 완료 수에 포함하는 상태
+FINISHED_STATUSES = (JOB_DONE, JOB_SAVE_FAILED)
+
+RUN_ACTIVE = "active"
+RUN_COMPLETED = "completed"
+RUN_CANCELLED = "cancelled"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    total INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    state TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    params TEXT NOT NULL,
+    path TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    result_path TEXT,
+    updated REAL NOT NULL,
+    UNIQUE (run_id, seq)
+);
+CREATE INDEX IF NOT EXISTS jobs_run_status ON jobs (run_id, status);
+CREATE TABLE IF NOT EXISTS payloads (
+    hash TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS job_payloads (
+    job_id INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+    hash TEXT NOT NULL,
+    PRIMARY KEY (job_id, hash)
+);
+CREATE INDEX IF NOT EXISTS job_payloads_hash ON job_payloads (hash);
+"""
+
+
+def _split_payloads(obj, payloads: dict):
+    """큰 문자열을 {"$payload": 해시} 참조로 바꾼 사본을 반환하고 원본 문자열은 payloads에 모은다"""
+    if isinstance(obj, dict):
+        return {k: _split_payloads(v, payloads) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_split_payloads(v, payloads) for v in obj]
+    if isinstance(obj, str) and len(obj) >= PAYLOAD_MIN_LENGTH:
+        digest = blake2b(obj.encode("utf-8"), digest_size=20).hexdigest()
+        payloads[digest] = obj
+        return {PAYLOAD_REF_KEY: digest}
+    return obj
+
+
+def _join_payloads(obj, payloads: dict):
+    """_split_payloads의 역변환"""
+    if isinstance(obj, dict):
+        if len(obj) == 1 and PAYLOAD_REF_KEY in obj:
+            return payloads[obj[PAYLOAD_REF_KEY]]
+        return {k: _join_payloads(v, payloads) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_join_payloads(v, payloads) for v in obj]
+    return obj
+
+
+@dataclass
+class Job:
+    id: int
+    run_id: int
+    seq: int
+    params: dict
+    path: str
+    status: str
+    attempts: int
+
+
+@dataclass
+class RunInfo:
+    id: int
+    total: int            # -1이면 무한 생성
+    status: str
+    state: dict           # 다음 작업을 계획할 때 복원할 상태 (루프카드 인덱스, 설정 배치 위치 등)
+    planned: int          # 계획된 작업 수
+    done: int             # 끝난 작업 수 (저장 실패 포함)
+    created: float
+
+    @property
+    def remaining(self) -> int:
+        """남은 생성 수 (무한 생성이면 -1)"""
+        return -1 if self.total < 0 else max(0, self.total - self.done)
+
+
+class JobQueue:
+    """자동 생성 작업 큐.
+
+    QThread(요청 단계)와 쓰기 단계 스레드가 함께 쓰므로 연결 하나를 잠금으로 보호한다.
+    각 변경은 단일 트랜잭션으로 커밋되며 WAL 모드로 기록 중 종료되어도 이전 상태가 유지된다.
+    """
+
+    def __init__(self, db_path: str | None = None, max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.db_path = db_path or os.path.join(DEFAULT_CACHE_PATH, JOB_QUEUE_FILENAME)
+        self.max_attempts = max_attempts
+        if self.db_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        """잠금을 잡고 BEGIN IMMEDIATE ~ COMMIT 구간의 커서를 넘겨줌 (예외 시 ROLLBACK)"""
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                yield cur
+                cur.execute("COMMIT")
+            except BaseException:
+                cur.execute("ROLLBACK")
+                raise
+
+    def _write(self, sql_list: list) -> list:
+        """(sql, args) 목록을 한 트랜잭션으로 실행하고 각 lastrowid 반환"""
+        with self._transaction() as cur:
+            rowids = []
+            for sql, args in sql_list:
+                cur.execute(sql, args)
+                rowids.append(cur.lastrowid)
+            return rowids
+
+    def _query(self, sql: str, args=()) -> list:
+        with self._lock:
+            return self._conn.execute(sql, args).fetchall()
+
+    # ── 실행(run) ────────────────────────────────────────────────────
+
+    def create_run(self, total: int, state: dict | None = None) -> int:
+        """새 실행을 만든다. 이전에 끝나지 않은 실행은 취소 처리한다."""
+        now = time.time()
+        rowids = self._write([
+            ("UPDATE runs SET status = ?, updated = ? WHERE status = ?", (RUN_CANCELLED, now, RUN_ACTIVE)),
+            ("INSERT INTO runs (created, updated, total, status, state) VALUES (?, ?, ?, ?, ?)",
+             (now, now, int(total), RUN_ACTIVE, json.dumps(state or {}))),
+        ])
+        return rowids[-1]
+
+    def get_run(self, run_id: int) -> RunInfo | None:
+        rows = self._query(
+            "SELECT id, total, status, state, created, "
+            "(SELECT COUNT(*) FROM jobs WHERE run_id = runs.id), "
+            "(SELECT COUNT(*) FROM jobs WHERE run_id = runs.id AND status IN (?, ?)) "
+            "FROM runs WHERE id = ?", (*FINISHED_STATUSES, run_id))
+        if not rows:
+            return None
+        rid, total, status, state, created, planned, done = rows[0]
+        return RunInfo(rid, total, status, json.loads(state), planned, done, created)
+
+    def get_resumable_run(self) -> RunInfo | None:
+        """이어서 실행할 수 있는 마지막 실행 (진행 중 상태로 남아 있고 남은 작업이 있는 것)"""
+        rows = self._query("SELECT id FROM runs WHERE status = ? ORDER BY id DESC LIMIT 1", (RUN_ACTIVE,))
+        if not rows:
+            return None
+        run = self.get_run(rows[0][0])
+        if run.total >= 0 and run.done >= run.total:
+            self.finish_run(run.id, RUN_COMPLETED)
+            return None
+        return run
+
+    def finish_run(self, run_id: int, status: str = RUN_COMPLETED) -> None:
+        self._write([("UPDATE runs SET status = ?, updated = ? WHERE id = ?", (status, time.time(), run_id))])
+
+    def prepare_resume(self, run_id: int) -> None:
+        """비정상 종료로 남은 작업 정리.
+
+        running(응답을 받기 전에 끊긴 요청)은 pending으로 되돌리고,
+        generated(응답은 받았지만 저장 전에 종료)는 다시 요청하지 않도록 save_failed로 끝낸다.
+        """
+        now = time.time()
+        self._write([
+            ("UPDATE jobs SET status = ?, updated = ? WHERE run_id = ? AND status = ?",
+             (JOB_PENDING, now, run_id, JOB_RUNNING)),
+            ("UPDATE jobs SET status = ?, error = ?, updated = ? WHERE run_id = ? AND status = ?",
+             (JOB_SAVE_FAILED, "저장 전에 종료됨", now, run_id, JOB_GENERATED)),
+        ])
+
+    # ── 작업(job) ────────────────────────────────────────────────────
+
+    def add_job(self, run_id: int, params: dict, path: str, state: dict | None = None) -> Job:
+        """계획된 작업을 기록한다. state가 있으면 같은 트랜잭션에서 실행 상태도 갱신한다."""
+        now = time.time()
+        payloads = {}
+        params_json = json.dumps(_split_payloads(params, payloads), ensure_ascii=False)
+        with self._transaction() as cur:
+            # 이미 저장된 내용은 건너뜀 (같은 이미지를 쓰는 작업끼리 한 행을 공유)
+            cur.executemany("INSERT OR IGNORE INTO payloads (hash, data) VALUES (?, ?)", payloads.items())
+            cur.execute(
+                "INSERT INTO jobs (run_id, seq, params, path, status, updated) "
+                "VALUES (?, (SELECT COALESCE(MAX(seq), -1) + 1 FROM jobs WHERE run_id = ?), ?, ?, ?, ?)",
+                (run_id, run_id, params_json, path, JOB_PENDING, now))
+            job_id = cur.lastrowid
+            cur.executemany("INSERT OR IGNORE INTO job_payloads (job_id, hash) VALUES (?, ?)",
+                            [(job_id, digest) for digest in payloads])
+            if state is not None:
+                cur.execute("UPDATE runs SET state = ?, updated = ? WHERE id = ?",
+                            (json.dumps(state), now, run_id))
+            seq = cur.execute("SELECT seq FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+        return Job(job_id, run_id, seq, params, path, JOB_PENDING, 0)
+
+    def _load_params(self, job_id: int, params_json: str) -> dict:
+        """작업 행의 params를 payloads 참조까지 풀어서 반환"""
+        rows = self._query("SELECT p.hash, p.data FROM job_payloads j JOIN payloads p ON p.hash = j.hash "
+                           "WHERE j.job_id = ?", (job_id,))
+        params = json.loads(params_json)
+        return _join_payloads(params, dict(rows)) if rows else params
+
+    def next_unfinished_job(self, run_id: int) -> Job | None:
+        """다시 요청할 작업 (pending 또는 시도 횟수가 남은 failed 중 가장 앞선 것)"""
+        rows = self._query(
+            "SELECT id, seq, params, path, status, attempts FROM jobs "
+            "WHERE run_id = ? AND (status = ? OR (status = ? AND attempts < ?)) ORDER BY seq LIMIT 1",
+            (run_id, JOB_PENDING, JOB_FAILED, self.max_attempts))
+        if not rows:
+            return None
+        job_id, seq, params, path, status, attempts = rows[0]
+        return Job(job_id, run_id, seq, self._load_params(job_id, params), path, status, attempts)
+
+    def mark_running(self, job_id: int) -> None:
+        self._write([("UPDATE jobs SET status = ?, attempts = attempts + 1, updated = ? WHERE id = ?",
+                      (JOB_RUNNING, time.time(), job_id))])
+
+    def mark_generated(self, job_id: int) -> None:
+        """API 응답을 받음 (이후로는 다시 요청하지 않음)"""
+        self._write([("UPDATE jobs SET status = ?, updated = ? WHERE id = ?",
+                      (JOB_GENERATED, time.time(), job_id))])
+
+    def mark_done(self, job_id: int, result_path: str) -> None:
+        self._write([("UPDATE jobs SET status = ?, result_path = ?, error = NULL, updated = ? WHERE id = ?",
+                      (JOB_DONE, result_path, time.time(), job_id))])
+
+    def mark_failed(self, job_id: int, error: str) -> None:
+        """요청 실패 (시도 횟수가 남았으면 다시 요청)"""
+        self._write([("UPDATE jobs SET status = ?, error = ?, updated = ? WHERE id = ?",
+                      (JOB_FAILED, str(error)[:500], time.time(), job_id))])
+
+    def mark_save_failed(self, job_id: int, error: str) -> None:
+        """생성은 되었지만 저장 실패 (다시 요청하지 않고 끝난 작업으로 취급)"""
+        self._write([("UPDATE jobs SET status = ?, error = ?, updated = ? WHERE id = ?",
+                      (JOB_SAVE_FAILED, str(error)[:500], time.time(), job_id))])
+
+    def count_jobs(self, run_id: int, status: str | None = None) -> int:
+        if status is None:
+            return self._query("SELECT COUNT(*) FROM jobs WHERE run_id = ?", (run_id,))[0][0]
+        return self._query("SELECT COUNT(*) FROM jobs WHERE run_id = ? AND status = ?", (run_id, status))[0][0]
+
+    def prune(self, keep_runs: int = 5) -> None:
+        """최근 keep_runs개를 제외한 끝난 실행과 작업 기록, 더 이상 참조되지 않는 payload 삭제"""
+        self._write([
+            ("DELETE FROM runs WHERE status != ? AND id NOT IN (SELECT id FROM runs ORDER BY id DESC LIMIT ?)",
+             (RUN_ACTIVE, keep_runs)),
+            ("DELETE FROM payloads WHERE hash NOT IN (SELECT hash FROM job_payloads)", ()),
+        ])
+
+
+_default_queue = None
+_default_queue_lock = threading.Lock()
+
+
+def get_default_queue() -> JobQueue:
+    """DEFAULT_CACHE_PATH 아래의 공유 작업 큐 (처음 사용할 때 생성)"""
+    global _default_queue
+    with _default_queue_lock:
+        if _default_queue is None:
+            _default_queue = JobQueue()
+        return _default_queue
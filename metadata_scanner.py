@@ -0,0 +1,188 @@
+"""
+metadata_scanner.py - 폴더 단위 NAI 메타데이터 스캔
+
+Bulk Enhancement 폴더 선택 시 각 이미지의 NAI 메타데이터 유무를 스레드 풀로 병렬 확인하고,
+파일별 결과를 (경로, mtime, 크기) 기준으로 캐시하여 같은 폴더를 다시 스캔할 때
+바뀐 파일만 읽도록 합니다. 캐시는 DEFAULT_CACHE_PATH 아래 JSON 파일로 유지됩니다.
+
+PNG는 텍스트 청크만 읽고, stealth 확인은 NumPy 연산이므로 GIL을 오래 잡지 않아
+프로세스 풀 없이 스레드 풀로 충분합니다.
+"""
+
+import itertools
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import naiinfo_getter
+from consts import DEFAULT_CACHE_PATH
+from image_saver import write_atomic
+
+from logger import get_logger
+logger = get_logger()
+
+SUPPORTED_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+SCAN_CACHE_VERSION = 1
+SCAN_CACHE_FILENAME = "metadata_scan.json"
+DEFAULT_SCAN_WORKERS = min(8, (os.cpu_count() or 1) + 2)
+# 여러 폴더를 스캔해도 캐시 파일이 한없이 커지지 않도록 유지하는 최대 항목 수 (오래 쓰지 않은 것부터 제거)
+MAX_SCAN_CACHE_ENTRIES = 50000
+
+
+def list_image_files(folder_path: str) -> list:
+    """폴더 안의 지원 확장자 이미지 파일 경로 목록 (os.listdir 순서)"""
+    files = []
+    for filename in os.listdir(folder_path):
+        if os.path.splitext(filename)[1].lower() not in SUPPORTED_EXTENSIONS:
+            continue
+        file_path = os.path.join(folder_path, filename)
+        if os.path.isfile(file_path):
+            files.append(file_path)
+    return files
+
+
+def has_nai_metadata(file_path: str, read_stealth: bool = True) -> bool:
+    result = naiinfo_getter.get_naidict_from_file(file_path, read_stealth)
+    if not result:
+        return False
+    nai_dict, error_code = result
+    return error_code == 3 and bool(nai_dict)
+
+
+class MetadataScanCache:
+    """파일별 NAI 메타데이터 유무 캐시.
+
+    키는 절대 경로, 값은 [mtime_ns, size, read_stealth, valid] 이며
+    mtime/크기/stealth 설정 중 하나라도 다르면 캐시를 쓰지 않는다.
+    항목은 최근 사용 순서로 유지되며 max_entries를 넘으면 가장 오래된 것부터 제거한다.
+    """
+
+    def __init__(self, cache_path: str | None = None, max_entries: int = MAX_SCAN_CACHE_ENTRIES):
+        self.cache_path = cache_path
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        if cache_path:
+            self._load()
+
+    def _load(self):
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, "r", encoding="utf8") as f:
+                data = json.load(f)
+            if data.get("version") == SCAN_CACHE_VERSION:
+                self._entries = data.get("entries", {})
+                self._trim()
+        except (OSError, ValueError) as e:
+            logger.warning(f"메타데이터 스캔 캐시 읽기 실패 ({self.cache_path}): {e}")
+
+    def lookup(self, file_path: str, stat, read_stealth: bool):
+        """캐시된 valid 값 반환, 없거나 오래된 항목이면 None"""
+        key = os.path.abspath(file_path)
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._entries[key] = entry  # 최근 사용으로 이동
+        if entry and entry[:3] == [stat.st_mtime_ns, stat.st_size, read_stealth]:
+            return entry[3]
+        return None
+
+    def store(self, file_path: str, stat, read_stealth: bool, valid: bool) -> None:
+        key = os.path.abspath(file_path)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = [stat.st_mtime_ns, stat.st_size, read_stealth, valid]
+            self._dirty = True
+            self._trim()
+
+    def _trim(self) -> None:
+        # _lock 보유 상태(또는 로드 중)에서 호출. dict 순서 = 사용 순서
+        excess = len(self._entries) - self.max_entries
+        if excess <= 0:
+            return
+        for key in list(itertools.islice(self._entries, excess)):
+            del self._entries[key]
+        self._dirty = True
+
+    def prune(self, folder_path: str, existing: list) -> None:
+        """folder_path 바로 아래에서 사라진 파일 항목 제거"""
+        folder = os.path.abspath(folder_path)
+        keep = {os.path.abspath(p) for p in existing}
+        with self._lock:
+            stale = [p for p in self._entries if os.path.dirname(p) == folder and p not in keep]
+            for p in stale:
+                del self._entries[p]
+            self._dirty = self._dirty or bool(stale)
+
+    def save(self) -> None:
+        if not self.cache_path or not self._dirty:
+            return
+        with self._lock:
+            payload = json.dumps({"version": SCAN_CACHE_VERSION, "entries": self._entries},
+                                 ensure_ascii=False).encode("utf8")
+            self._dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            write_atomic(self.cache_path, lambda f: f.write(payload))
+        except OSError as e:
+            logger.warning(f"메타데이터 스캔 캐시 저장 실패 ({self.cache_path}): {e}")
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> MetadataScanCache:
+    """프로세스 전체에서 공유하는 디스크 캐시 (처음 사용할 때 로드)"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = MetadataScanCache(os.path.join(DEFAULT_CACHE_PATH, SCAN_CACHE_FILENAME))
+        return _default_cache
+
+
+def _check_file(file_path: str, read_stealth: bool, cache: MetadataScanCache | None) -> bool:
+    try:
+        stat = os.stat(file_path)
+    except OSError as e:
+        logger.debug(f"Skipping {file_path}: {e}")
+        return False
+
+    if cache is not None:
+        cached = cache.lookup(file_path, stat, read_stealth)
+        if cached is not None:
+            return cached
+
+    try:
+        valid = has_nai_metadata(file_path, read_stealth)
+    except Exception as e:
+        # 쓰는 중인 파일 등 일시적인 실패일 수 있으므로 캐시하지 않음
+        logger.debug(f"Skipping {file_path}: {e}")
+        return False
+
+    if cache is not None:
+        cache.store(file_path, stat, read_stealth, valid)
+    return valid
+
+
+def scan_files(file_paths: list, read_stealth: bool = True, cache: MetadataScanCache | None = None,
+               max_workers: int = DEFAULT_SCAN_WORKERS, is_cancelled=None):
+    """파일을 병렬로 확인하며 입력 순서대로 (path, valid)를 yield 한다.
+
+    is_cancelled()가 True를 반환하면 대기 중인 작업을 취소하고 즉시 멈춘다.
+    """
+    if not file_paths:
+        return
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="nai-scan") as executor:
+        futures = [executor.submit(_check_file, p, read_stealth, cache) for p in file_paths]
+        try:
+            for file_path, future in zip(file_paths, futures):
+                if is_cancelled is not None and is_cancelled():
+                    return
+                yield file_path, future.result()
+        finally:
+            for future in futures:
+                future.cancel()
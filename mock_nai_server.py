@@ -0,0 +1,326 @@
+"""
+mock_nai_server.py - 로컬 NovelAI API 대역 서버
+
+Anlas를 쓰지 않고 NAIGenerator / 헤드리스 실행기의 처리량을 측정하기 위한 테스트 서버입니다.
+표준 라이브러리 http.server만 사용하며 다음 엔드포인트를 흉내냅니다.
+
+    POST /user/login          → {"accessToken": ...}
+    GET  /user/subscription   → trainingStepsLeft (Anlas)
+    GET  /user/information    → 계정 정보
+    POST /ai/generate-image   → 요청 파라미터가 Comment 청크에 담긴 PNG 한 장을 zip으로 반환
+
+지연 시간, 오류 비율(401/429/500), 응답 이미지 크기(엔트로피)를 설정할 수 있습니다.
+
+사용법:
+    python mock_nai_server.py [--port 8765] [--latency 0.5] [--jitter 0.1]
+                              [--error-401 0.0] [--error-429 0.0] [--error-500 0.0] [--entropy 0.5]
+                              [--max-concurrent N]
+    → NAIGenerator(api_url=URL, image_url=URL) 또는 headless_runner.py --api-url URL --image-url URL
+"""
+
+import argparse
+import io
+import json
+import random
+import struct
+import sys
+import threading
+import time
+import zipfile
+import zlib
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+MOCK_ACCESS_TOKEN = "mock-access-token"
+DEFAULT_ANLAS = 10000
+
+
+@dataclass
+class MockServerConfig:
+    latency: float = 0.0        # 생성 요청 평균 지연 (초)
+    jitter: float = 0.0         # 지연 편차 (초, 균등 분포 ±jitter)
+    error_401: float = 0.0      # 생성 요청 중 401을 돌려줄 비율
+    error_429: float = 0.0      # 429 (Retry-After 포함) 비율
+    error_500: float = 0.0      # 500 비율
+    retry_after: int = 1        # 429 응답의 Retry-After (초)
+    max_concurrent: int = 0     # 동시에 처리할 생성 요청 수 (초과 시 429, 0이면 제한 없음)
+    entropy: float = 0.5        # 0~1, 무작위 픽셀 행 비율 (응답 PNG 크기 조절)
+    seed: int = 0
+
+
+def _png_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + chunk_type + data + \
+        struct.pack(">I", zlib.crc32(chunk_type + data) & 0xFFFFFFFF)
+
+
+def _text_chunk(key: str, value: str) -> bytes:
+    # NovelAI는 긴 값을 tEXt로 기록하므로 같은 형식을 사용 (latin-1 밖의 문자는 iTXt)
+    try:
+        return _png_chunk(b"tEXt", key.encode("latin-1") + b"\x00" + value.encode("latin-1"))
+    except UnicodeEncodeError:
+        return _png_chunk(b"iTXt", key.encode("latin-1") + b"\x00\x00\x00\x00\x00" + value.encode("utf8"))
+
+
+class _ImageBodyCache:
+    """(width, height)별 IHDR+IDAT+IEND 바이트. 픽셀은 한 번만 만들고 텍스트 청크만 요청마다 붙인다."""
+
+    def __init__(self, entropy: float, seed: int):
+        self.entropy = min(1.0, max(0.0, entropy))
+        self.seed = seed
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def get(self, width: int, height: int) -> tuple[bytes, bytes]:
+        key = (width, height)
+        with self._lock:
+            parts = self._cache.get(key)
+            if parts is None:
+                parts = self._build(width, height)
+                self._cache[key] = parts
+            return parts
+
+    def _build(self, width: int, height: int) -> tuple[bytes, bytes]:
+        rng = random.Random(self.seed)
+        row_bytes = width * 3
+        flat_row = bytes([0]) + bytes([200, 180, 170]) * width
+        raw = bytearray()
+        for _ in range(height):
+            if rng.random() < self.entropy:
+                raw += b"\x00" + rng.randbytes(row_bytes)
+            else:
+                raw += flat_row
+        ihdr = _png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        tail = _png_chunk(b"IDAT", zlib.compress(bytes(raw), 6)) + _png_chunk(b"IEND", b"")
+        return ihdr, tail
+
+
+def build_result_zip(body_cache: _ImageBodyCache, request: dict) -> bytes:
+    """요청 파라미터를 NovelAI와 같은 형식의 메타데이터로 담은 PNG를 zip으로 감싼다."""
+    params = request.get("parameters", {}) or {}
+    width = int(params.get("width", 832))
+    height = int(params.get("height", 1216))
+    ihdr, tail = body_cache.get(width, height)
+
+    comment = dict(params)
+    comment.pop("image", None)
+    comment.pop("mask", None)
+    comment["request_type"] = "PromptGenerateRequest"
+    comment["signed_hash"] = "mock"
+    text = [
+        _text_chunk("Title", "NovelAI generated image"),
+        _text_chunk("Description", str(request.get("input", params.get("prompt", "")))),
+        _text_chunk("Software", "NovelAI"),
+        _text_chunk("Source", "Stable Diffusion XL " + str(request.get("model", ""))),
+        _text_chunk("Generation time", "1.0"),
+        _text_chunk("Comment", json.dumps(comment, ensure_ascii=False)),
+    ]
+    png = PNG_SIGNATURE + ihdr + b"".join(text) + tail
+
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as z:
+        z.writestr("image_0.png", png)
+    return buf.getvalue()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "_MockHTTPServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json", headers: dict | None = None):
+        self.server.owner._record(self.path, status)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, obj: dict, headers: dict | None = None):
+        self._send(status, json.dumps(obj).encode("utf8"), headers=headers)
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        data = self.rfile.read(length) if length else b""
+        return json.loads(data) if data else {}
+
+    def _authorized(self) -> bool:
+        return self.headers.get("Authorization", "").startswith("Bearer ")
+
+    def do_GET(self):
+        if not self._authorized():
+            return self._send_json(401, {"statusCode": 401, "message": "Unauthorized"})
+        if self.path == "/user/subscription":
+            return self._send_json(200, {
+                "tier": 3, "active": True,
+                "trainingStepsLeft": {"fixedTrainingStepsLeft": self.server.owner.anlas, "purchasedTrainingSteps": 0},
+            })
+        if self.path == "/user/information":
+            return self._send_json(200, {"emailVerified": True, "trialImagesLeft": 0, "accountCreatedAt": 0})
+        self._send_json(404, {"statusCode": 404, "message": "Not Found"})
+
+    def do_POST(self):
+        try:
+            request = self._read_json()
+        except ValueError:
+            return self._send_json(400, {"statusCode": 400, "message": "Bad Request"})
+
+        if self.path == "/user/login":
+            if not request.get("key"):
+                return self._send_json(401, {"statusCode": 401, "message": "Invalid credentials"})
+            return self._send_json(201, {"accessToken": MOCK_ACCESS_TOKEN})
+        if self.path != "/ai/generate-image":
+            return self._send_json(404, {"statusCode": 404, "message": "Not Found"})
+        if not self._authorized():
+            return self._send_json(401, {"statusCode": 401, "message": "Unauthorized"})
+
+        owner = self.server.owner
+        config = owner.config
+        if not owner._enter_generation():
+            return self._send_json(429, {"statusCode": 429, "message": "Concurrent generation is locked"},
+                                   headers={"Retry-After": str(config.retry_after)})
+        try:
+            self._generate(owner, config, request)
+        finally:
+            owner._leave_generation()
+
+    def _generate(self, owner, config, request):
+        delay = owner._next_latency()
+        if delay > 0:
+            time.sleep(delay)
+
+        roll = owner._next_random()
+        if roll < config.error_401:
+            return self._send_json(401, {"statusCode": 401, "message": "Unauthorized"})
+        roll -= config.error_401
+        if roll < config.error_429:
+            return self._send_json(429, {"statusCode": 429, "message": "Too many concurrent requests"},
+                                   headers={"Retry-After": str(config.retry_after)})
+        roll -= config.error_429
+        if roll < config.error_500:
+            return self._send_json(500, {"statusCode": 500, "message": "Internal Server Error"})
+
+        try:
+            body = build_result_zip(owner._bodies, request)
+        except (TypeError, ValueError) as e:
+            return self._send_json(400, {"statusCode": 400, "message": str(e)})
+        owner._charge(request)
+        self._send(200, body, "application/x-zip-compressed")
+
+
+class _MockHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # 동시 연결이 많은 측정에서 listen 백로그(기본 5)가 넘쳐 SYN 재전송(1초)이 섞이지 않도록
+    request_queue_size = 128
+
+
+class MockNAIServer:
+    """백그라운드 스레드에서 동작하는 테스트 서버.
+
+    with MockNAIServer(MockServerConfig(latency=0.5)) as server:
+        nai = NAIGenerator(api_url=server.url, image_url=server.url)
+    """
+
+    def __init__(self, config: MockServerConfig | None = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or MockServerConfig()
+        self.anlas = DEFAULT_ANLAS
+        self._bodies = _ImageBodyCache(self.config.entropy, self.config.seed)
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self.status_counts = {}  # (path, status) -> count
+        self._generating = 0
+        self._httpd = _MockHTTPServer((host, port), _Handler)
+        self._httpd.owner = self
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _enter_generation(self) -> bool:
+        with self._lock:
+            if self.config.max_concurrent and self._generating >= self.config.max_concurrent:
+                return False
+            self._generating += 1
+            return True
+
+    def _leave_generation(self) -> None:
+        with self._lock:
+            self._generating -= 1
+
+    def _next_random(self) -> float:
+        with self._lock:
+            return self._rng.random()
+
+    def _next_latency(self) -> float:
+        config = self.config
+        if config.jitter <= 0:
+            return config.latency
+        with self._lock:
+            return max(0.0, config.latency + self._rng.uniform(-config.jitter, config.jitter))
+
+    def _charge(self, request: dict) -> None:
+        # 실제 비용 계산 대신 요청마다 고정 차감 (Opus 무료 구간 무시)
+        with self._lock:
+            self.anlas = max(0, self.anlas - 20)
+
+    def _record(self, path: str, status: int) -> None:
+        with self._lock:
+            key = (path, status)
+            self.status_counts[key] = self.status_counts.get(key, 0) + 1
+
+    def start(self) -> "MockNAIServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-nai-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "MockNAIServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="로컬 NovelAI API 테스트 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765, help="0이면 빈 포트 자동 선택")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-401", type=float, default=0.0)
+    parser.add_argument("--error-429", type=float, default=0.0)
+    parser.add_argument("--error-500", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--max-concurrent", type=int, default=0)
+    parser.add_argument("--entropy", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    config = MockServerConfig(args.latency, args.jitter, args.error_401, args.error_429, args.error_500,
+                              args.retry_after, args.max_concurrent, args.entropy, args.seed)
+    server = MockNAIServer(config, args.host, args.port)
+    # 벤치마크가 자식 프로세스로 띄울 때 이 줄에서 주소를 읽음
+    print(f"listening on {server.url}", flush=True)
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
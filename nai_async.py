@@ -0,0 +1,585 @@
+"""
+nai_async.py - asyncio 기반 NovelAI API 클라이언트
+
+하나의 이벤트 루프 스레드와 하나의 keep-alive 연결 풀에서 모든 요청을 처리하여,
+동시 생성 작업/keepalive/Anlas 조회가 요청마다 OS 스레드를 차지하지 않도록 합니다.
+
+    AsyncNAITransport   - asyncio 스트림 위의 HTTP/1.1 keep-alive 연결 풀 (표준 라이브러리만 사용)
+    AsyncNAIGenerator   - NAIGenerator와 같은 이름의 코루틴 API
+                          (try_login, try_login_with_api_key, get_anlas, check_logged_in, generate_image)
+    EventLoopThread     - 백그라운드 이벤트 루프 하나 (get_event_loop_thread()로 공유)
+    LoopTransport       - NAITransport와 같은 동기 인터페이스. NAIGenerator(transport=LoopTransport())로
+                          기존 동기 API의 모든 요청을 공유 루프/연결 풀로 위임
+
+프록시 환경 변수(HTTPS_PROXY 등)는 지원하지 않으므로 프록시가 필요하면 NAITransport를 사용하세요.
+"""
+
+import asyncio
+import json
+import socket
+import ssl
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from nai_generator import (NAIGenerator, NAIAction, BASE_URL_DEPRE, BASE_URL, STATUS_NO_RESPONSE, argon_hash,
+                           parse_anlas, parse_retry_after, response_error_message)
+from nai_transport import DEFAULT_POOL_MAXSIZE
+
+from logger import get_logger
+logger = get_logger()
+
+DEFAULT_TIMEOUT = 60.0
+MAX_HEADER_LINE = 64 * 1024
+# 유휴 연결이 끊겼을 때 새 연결로 재전송해도 되는 메서드 (POST 생성 요청은 Anlas가 두 번 차감될 수 있어 제외)
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+
+class _NoResponseError(ConnectionResetError):
+    """응답 바이트를 하나도 받기 전에 연결이 끊김 (멱등 요청 재전송 판단용)"""
+
+
+class AsyncResponse:
+    """requests.Response와 같은 필드를 가진 응답 (status_code, headers, content, text, json())"""
+
+    def __init__(self, status_code: int, reason: str, headers: CaseInsensitiveDict, content: bytes, url: str):
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = headers
+        self.content = content
+        self.url = url
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class _Connection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    def close(self) -> None:
+        try:
+            self.writer.close()
+        except Exception:
+            pass
+
+
+class AsyncNAITransport:
+    """asyncio 스트림 기반 HTTP/1.1 keep-alive 연결 풀.
+
+    한 이벤트 루프 안에서만 사용해야 한다 (다른 스레드에서는 LoopTransport 사용).
+    통계는 NAITransport.get_stats()와 같은 키를 가진다.
+
+    Args:
+        pool_maxsize: 호스트당 유지할 최대 유휴 연결 수
+        keepalive: False면 매 요청 후 연결을 닫음 (비교 측정용)
+    """
+
+    def __init__(self, pool_maxsize: int = DEFAULT_POOL_MAXSIZE, keepalive: bool = True):
+        self.pool_maxsize = pool_maxsize
+        self.keepalive = keepalive
+        self._idle = {}  # (scheme, host, port) → [_Connection]
+        self._ssl_context = None
+        self.request_count = 0
+        self.error_count = 0
+        self.new_connections = 0
+        self.reused_connections = 0
+
+    async def _connect(self, key) -> _Connection:
+        scheme, host, port = key
+        ssl_context = None
+        if scheme == "https":
+            if self._ssl_context is None:
+                self._ssl_context = ssl.create_default_context()
+            ssl_context = self._ssl_context
+        reader, writer = await asyncio.open_connection(host, port, ssl=ssl_context, limit=MAX_HEADER_LINE)
+        self.new_connections += 1
+        return _Connection(reader, writer)
+
+    def _take_idle(self, key) -> _Connection | None:
+        idle = self._idle.get(key)
+        while idle:
+            conn = idle.pop()
+            if not conn.reader.at_eof() and not conn.writer.is_closing():
+                self.reused_connections += 1
+                return conn
+            conn.close()
+        return None
+
+    def _put_idle(self, key, conn: _Connection) -> None:
+        idle = self._idle.setdefault(key, [])
+        if len(idle) < self.pool_maxsize:
+            idle.append(conn)
+        else:
+            conn.close()
+
+    async def request(self, method: str, url: str, json=None, data: bytes | None = None,
+                      headers: dict | None = None, timeout: float | None = DEFAULT_TIMEOUT) -> AsyncResponse:
+        """요청을 보내고 본문까지 읽은 응답을 반환.
+
+        시간 초과는 asyncio.TimeoutError, 연결 오류는 OSError 계열로 전달된다.
+        """
+        self.request_count += 1
+        try:
+            return await asyncio.wait_for(self._request(method, url, json, data, headers), timeout)
+        except BaseException:
+            self.error_count += 1
+            raise
+
+    async def _request(self, method, url, json_body, data, headers) -> AsyncResponse:
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        port = parts.port or (443 if scheme == "https" else 80)
+        key = (scheme, parts.hostname, port)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        body = data or b""
+        request_headers = CaseInsensitiveDict()
+        request_headers["Host"] = parts.netloc
+        request_headers["User-Agent"] = requests.utils.default_user_agent()
+        request_headers["Accept"] = "*/*"
+        request_headers["Accept-Encoding"] = "identity"
+        request_headers["Connection"] = "keep-alive" if self.keepalive else "close"
+        if json_body is not None:
+            body = _json_dumps(json_body)
+            request_headers["Content-Type"] = "application/json"
+        if headers:
+            request_headers.update(headers)
+        if body or method in ("POST", "PUT", "PATCH"):
+            request_headers["Content-Length"] = str(len(body))
+
+        head = f"{method} {path} HTTP/1.1\r\n" + "".join(f"{k}: {v}\r\n" for k, v in request_headers.items())
+        payload = head.encode("latin-1") + b"\r\n" + body
+
+        conn = self._take_idle(key)
+        if conn is not None:
+            try:
+                return await self._exchange(key, conn, method, url, payload)
+            except _NoResponseError:
+                # 서버가 유휴 연결을 먼저 닫은 경우 - 응답을 한 바이트도 받지 못한 멱등 요청만 새 연결로 한 번 재전송.
+                # 그 외에는 서버가 이미 처리(과금)했을 수 있으므로 호출자의 재시도 규칙에 맡긴다.
+                if method not in IDEMPOTENT_METHODS:
+                    raise
+        conn = await self._connect(key)
+        return await self._exchange(key, conn, method, url, payload)
+
+    async def _exchange(self, key, conn: _Connection, method: str, url: str, payload: bytes) -> AsyncResponse:
+        try:
+            try:
+                conn.writer.write(payload)
+                await conn.writer.drain()
+            except ConnectionError as e:
+                raise _NoResponseError(f"요청 전송 중 연결이 끊겼습니다: {e!r}") from e
+            response, reusable = await _read_response(conn.reader, method, url)
+        except BaseException:
+            conn.close()
+            raise
+        if reusable and self.keepalive:
+            self._put_idle(key, conn)
+        else:
+            conn.close()
+        return response
+
+    async def get(self, url: str, **kwargs) -> AsyncResponse:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> AsyncResponse:
+        return await self.request("POST", url, **kwargs)
+
+    def get_stats(self) -> dict:
+        total = self.new_connections + self.reused_connections
+        return {
+            "requests": self.request_count,
+            "errors": self.error_count,
+            "new_connections": self.new_connections,
+            "reused_connections": self.reused_connections,
+            "reuse_ratio": (self.reused_connections / total) if total else 0.0,
+        }
+
+    def reset_stats(self) -> None:
+        self.request_count = 0
+        self.error_count = 0
+        self.new_connections = 0
+        self.reused_connections = 0
+
+    async def close(self) -> None:
+        """유휴 연결을 모두 닫는다."""
+        idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+
+def _json_dumps(obj) -> bytes:
+    # requests와 같은 직렬화 (ensure_ascii 기본값)
+    return json.dumps(obj).encode("utf-8")
+
+
+async def _read_response(reader: asyncio.StreamReader, method: str, url: str) -> tuple[AsyncResponse, bool]:
+    """상태줄/헤더/본문을 읽어 (응답, 연결 재사용 가능 여부) 반환"""
+    first = True
+    while True:
+        status_line = await reader.readline()
+        if not status_line:
+            if first:
+                raise _NoResponseError("서버가 응답 전에 연결을 닫았습니다")
+            raise ConnectionResetError("서버가 응답 도중 연결을 닫았습니다")
+        first = False
+        version, status, reason = (status_line.decode("latin-1").rstrip("\r\n").split(" ", 2) + [""])[:3]
+        status_code = int(status)
+
+        headers = CaseInsensitiveDict()
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip()] = value.strip()
+        # 1xx 중간 응답은 건너뜀
+        if status_code >= 200 or status_code == 101:
+            break
+
+    reusable = version == "HTTP/1.1" and headers.get("Connection", "").lower() != "close"
+    if method == "HEAD" or status_code in (204, 304):
+        content = b""
+    elif "chunked" in headers.get("Transfer-Encoding", "").lower():
+        content = await _read_chunked(reader)
+    elif "Content-Length" in headers:
+        content = await reader.readexactly(int(headers["Content-Length"]))
+    else:
+        content = await reader.read()
+        reusable = False
+    return AsyncResponse(status_code, reason, headers, content, url), reusable
+
+
+async def _read_chunked(reader: asyncio.StreamReader) -> bytes:
+    chunks = []
+    while True:
+        size_line = await reader.readline()
+        size = int(size_line.split(b";", 1)[0].strip() or b"0", 16)
+        if size == 0:
+            # trailer 헤더 건너뜀
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            return b"".join(chunks)
+        chunks.append(await reader.readexactly(size))
+        await reader.readexactly(2)
+
+
+class AsyncNAIGenerator:
+    """NAIGenerator와 같은 이름의 코루틴 API.
+
+    파라미터 구성, 토큰, 세션 상태는 감싼 NAIGenerator(self.nai)를 그대로 쓰고
+    네트워크 요청만 AsyncNAITransport로 보낸다. 여러 작업을 동시에 돌리려면
+    작업마다 AsyncNAIGenerator를 만들되 transport는 공유한다 (parameters가 요청마다 바뀜).
+
+    Args:
+        nai: 상태를 공유할 NAIGenerator (없으면 새로 생성)
+        transport: 공유할 AsyncNAITransport (없으면 새로 생성)
+    """
+
+    def __init__(self, nai: NAIGenerator | None = None, transport: AsyncNAITransport | None = None,
+                 api_url: str = BASE_URL_DEPRE, image_url: str = BASE_URL):
+        self.nai = nai or NAIGenerator(api_url=api_url, image_url=image_url)
+        self.transport = transport or AsyncNAITransport()
+        self._refresh_lock = asyncio.Lock()
+
+    @property
+    def parameters(self) -> dict:
+        return self.nai.parameters
+
+    @property
+    def access_token(self):
+        return self.nai.access_token
+
+    @access_token.setter
+    def access_token(self, value):
+        self.nai.access_token = value
+
+    def _auth_headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.nai.access_token}"}
+
+    async def try_login(self, username: str, password: str) -> bool:
+        # argon2 해시는 CPU 작업이므로 루프를 막지 않도록 기본 실행기에서 계산
+        loop = asyncio.get_running_loop()
+        access_key = (await loop.run_in_executor(
+            None, argon_hash, username, password, 64, "novelai_data_access_key"))[:64]
+        try:
+            response = await self.transport.post(
+                f"{self.nai.api_url}/user/login", json={"key": access_key}, timeout=30)
+            self.nai.access_token = response.json()["accessToken"]
+            self.nai.username = username
+            self.nai.password = password
+            self.nai._mark_login_success()
+            return True
+        except Exception as e:
+            logger.error(f"로그인 실패: {e}")
+        return False
+
+    async def try_login_with_api_key(self, api_key: str) -> bool:
+        """pst-... 형식의 영구 API 토큰으로 로그인"""
+        if not api_key or not api_key.startswith("pst-"):
+            logger.error("API 키 형식 오류: 'pst-'로 시작해야 합니다")
+            return False
+
+        nai = self.nai
+        nai.access_token, nai.api_key, nai.login_method = api_key, api_key, "api_key"
+        if await self.get_anlas() is None:
+            logger.error("API 키 검증 실패: 토큰이 유효하지 않습니다")
+            nai.access_token, nai.api_key, nai.login_method = None, None, None
+            return False
+
+        nai._mark_login_success()
+        logger.info("API 키 로그인 성공")
+        return True
+
+    async def get_anlas(self) -> int | None:
+        try:
+            response = await self.transport.get(
+                self.nai.api_url + "/user/subscription", headers=self._auth_headers(), timeout=30)
+            data_dict = json.loads(response.content)
+            # Opus(3) 무료 생성 여부 판단용 (AnlasTracker)
+            self.nai.subscription_tier = data_dict.get('tier')
+            return parse_anlas(data_dict)
+        except Exception as e:
+            logger.error(f"Error getting ANLAS: {e}")
+        return None
+
+    async def check_logged_in(self) -> bool:
+        if not self.nai.access_token:
+            return False
+        try:
+            response = await self.transport.get(
+                self.nai.api_url + "/user/information", headers=self._auth_headers(), timeout=5)
+            return self.nai._logged_in_from_status(response.status_code)
+        except (asyncio.TimeoutError, OSError, asyncio.IncompleteReadError) as e:
+            # 시간 초과/네트워크 오류는 동기 API와 같이 여전히 유효하다고 가정
+            logger.warning(f"로그인 상태 확인 실패 (유효하다고 가정): {e!r}")
+            return True
+        except Exception as e:
+            logger.error(f"로그인 상태 확인 오류: {e}")
+            return False
+
+    async def refresh_token(self) -> bool:
+        """401 응답 후 토큰 재검증/재로그인. 동시에 여러 작업이 401을 받아도 한 번만 수행"""
+        if self._refresh_lock.locked():
+            async with self._refresh_lock:
+                return self.nai.access_token is not None
+        async with self._refresh_lock:
+            nai = self.nai
+            if nai.login_method == "api_key" and nai.api_key:
+                return await self.check_logged_in()
+            if await self.check_logged_in():
+                return True
+            if not (nai.username and nai.password):
+                logger.error("토큰 갱신 실패: 자격 증명 없음")
+                return False
+            for attempt in range(3):
+                if await self.try_login(nai.username, nai.password):
+                    return True
+                await asyncio.sleep(2 ** attempt)
+            return False
+
+    async def generate_image(self, action: NAIAction) -> bytes | tuple[None, str]:
+        url, data, headers, request_id = self.nai._build_generate_request(action)
+
+        session_manager = getattr(self.nai, 'session_manager', None)
+        if session_manager is not None and not session_manager.network_available:
+            logger.error("네트워크 연결 없음 - 이미지 생성 요청 실패")
+            return None, "인터넷 연결이 없습니다. 네트워크 상태를 확인해주세요."
+
+        return await self._execute_api_request(url, data, headers, request_id)
+
+    async def _execute_api_request(self, url: str, data: dict, headers: dict,
+                                   request_id: str) -> bytes | tuple[None, str]:
+        """NAIGenerator._execute_api_request와 같은 재시도 규칙의 코루틴 버전"""
+        nai = self.nai
+        max_retries = 3
+        retry_delay = 3
+
+        for retry in range(max_retries):
+            wait_time = retry_delay * (2 ** retry)
+            try:
+                logger.info(f"API request attempt [ID: {request_id}] - {retry+1}/{max_retries}")
+                response = await self.transport.post(url, json=data, headers=headers, timeout=60)
+                retry_after = parse_retry_after(response.headers.get("Retry-After")) \
+                    if response.status_code in (429, 503) else None
+                if nai.on_response_status is not None:
+                    nai.on_response_status(response.status_code, retry_after)
+
+                if response.status_code in (200, 201):
+                    logger.info(f"API request successful [ID: {request_id}] - {response.status_code}")
+                    if hasattr(nai, 'session_manager'):
+                        nai.session_manager.consecutive_errors = 0
+                    return response.content
+
+                logger.error(f"API error [ID: {request_id}] {response.status_code}: "
+                             f"{response_error_message(response)}")
+
+                if response.status_code == 401:
+                    if await self.refresh_token():
+                        headers = self._auth_headers()
+                        continue
+                    return None, "인증 오류: 로그인이 필요합니다."
+                if response.status_code == 402:
+                    return None, "결제 필요: Anlas가 부족합니다."
+                if response.status_code == 429:
+                    wait_time = retry_after if retry_after is not None else wait_time
+                    logger.warning(f"요청 제한(429), {wait_time:.1f}초 후 재시도... [ID: {request_id}]")
+                    if nai.retry_rate_limited and retry < max_retries - 1:
+                        await asyncio.sleep(wait_time)
+                        continue
+                    return None, "요청 제한: 잠시 후 다시 시도해주세요."
+                if response.status_code >= 500:
+                    if not nai.retry_transient_errors:
+                        return None, f"서버 오류({response.status_code}): 잠시 후 다시 시도해주세요."
+                    wait_time = retry_after if retry_after is not None else wait_time
+                    logger.warning(f"서버 오류, {wait_time}초 후 재시도... [ID: {request_id}]")
+                    await asyncio.sleep(wait_time)
+                    continue
+
+            except asyncio.TimeoutError:
+                logger.error(f"API timeout [ID: {request_id}] attempt {retry+1}")
+                if nai.on_response_status is not None:
+                    nai.on_response_status(STATUS_NO_RESPONSE, None)
+                if not nai.retry_transient_errors:
+                    return None, "요청 시간 초과: 잠시 후 다시 시도해주세요."
+                await asyncio.sleep(wait_time)
+                continue
+
+            except (OSError, asyncio.IncompleteReadError) as e:
+                logger.error(f"API connection error [ID: {request_id}]: {e!r}")
+                if isinstance(e, socket.gaierror):
+                    if hasattr(nai, 'session_manager'):
+                        nai.session_manager.network_available = False
+                        # 연결 확인은 블로킹 소켓 호출이므로 이벤트 루프 밖에서 수행
+                        await asyncio.get_running_loop().run_in_executor(
+                            None, nai.session_manager.check_network_availability)
+                    return None, "인터넷 연결 문제: 서버에 연결할 수 없습니다. 네트워크 상태를 확인해주세요."
+                if nai.on_response_status is not None:
+                    nai.on_response_status(STATUS_NO_RESPONSE, None)
+                if not nai.retry_transient_errors:
+                    return None, f"연결 오류: {e!r}"
+                await asyncio.sleep(wait_time)
+                continue
+
+            except Exception as e:
+                logger.error(f"API exception [ID: {request_id}]: {e}", exc_info=True)
+                if nai.retry_transient_errors and retry < max_retries - 1:
+                    await asyncio.sleep(wait_time)
+                    continue
+                return None, f"API 요청 오류: {e}"
+
+        return None, "최대 재시도 횟수 초과: 서버에 연결할 수 없습니다."
+
+
+class EventLoopThread:
+    """백그라운드 스레드 하나에서 도는 asyncio 이벤트 루프.
+
+    다른 스레드(QThread 등)에서 run()으로 코루틴을 넘겨 결과를 기다리거나,
+    submit()으로 concurrent.futures.Future를 받아 비동기로 처리할 수 있다.
+    """
+
+    def __init__(self, name: str = "nai-async-loop"):
+        self._name = name
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                ready = threading.Event()
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._run, args=(self._loop, ready),
+                                                name=self._name, daemon=True)
+                self._thread.start()
+                ready.wait()
+            return self._loop
+
+    @staticmethod
+    def _run(loop: asyncio.AbstractEventLoop, ready: threading.Event) -> None:
+        asyncio.set_event_loop(loop)
+        loop.call_soon(ready.set)
+        loop.run_forever()
+        loop.close()
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout: float | None = None):
+        """코루틴을 루프에서 실행하고 결과를 기다린다 (루프 스레드 안에서 호출하면 안 됨)"""
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("이벤트 루프 스레드 안에서는 run()으로 기다릴 수 없습니다")
+        return self.submit(coro).result(timeout)
+
+    def stop(self) -> None:
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(loop.stop)
+            if thread is not None:
+                thread.join(5)
+
+
+_shared_loop_thread = None
+_shared_loop_lock = threading.Lock()
+
+
+def get_event_loop_thread() -> EventLoopThread:
+    """프로세스 전체에서 공유하는 이벤트 루프 스레드"""
+    global _shared_loop_thread
+    with _shared_loop_lock:
+        if _shared_loop_thread is None:
+            _shared_loop_thread = EventLoopThread()
+        return _shared_loop_thread
+
+
+class LoopTransport:
+    """NAITransport와 같은 동기 인터페이스로 요청을 공유 이벤트 루프에 위임.
+
+    NAIGenerator(transport=LoopTransport())로 만들면 기존 동기 API가 그대로 동작하면서
+    모든 요청이 하나의 루프와 연결 풀을 거친다. 예외는 requests 예외로 바꿔 전달하므로
+    NAIGenerator의 오류 처리(Timeout/ConnectionError 분기)가 그대로 적용된다.
+    """
+
+    def __init__(self, async_transport: AsyncNAITransport | None = None,
+                 loop_thread: EventLoopThread | None = None):
+        self.async_transport = async_transport or AsyncNAITransport()
+        self.loop_thread = loop_thread or get_event_loop_thread()
+
+    def request(self, method: str, url: str, json=None, data=None, headers=None,
+                timeout: float | None = DEFAULT_TIMEOUT) -> AsyncResponse:
+        coro = self.async_transport.request(method, url, json=json, data=data, headers=headers, timeout=timeout)
+        try:
+            return self.loop_thread.run(coro)
+        except asyncio.TimeoutError as e:
+            raise requests.exceptions.Timeout(f"{method} {url}: 시간 초과") from e
+        except (OSError, asyncio.IncompleteReadError) as e:
+            raise requests.exceptions.ConnectionError(f"{method} {url}: {e!r}") from e
+
+    def get(self, url: str, **kwargs) -> AsyncResponse:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> AsyncResponse:
+        return self.request("POST", url, **kwargs)
+
+    def get_stats(self) -> dict:
+        return self.async_transport.get_stats()
+
+    def reset_stats(self) -> None:
+        self.async_transport.reset_stats()
+
+    def close(self) -> None:
+        self.loop_thread.run(self.async_transport.close())
@@ -6,6 +6,7 @@ import random
 import json
 import io
 import time
+import functools
 import threading
 import zipfile
 import logging
@@ -13,11 +14,14 @@ from enum import Enum
 from PIL import Image
 import base64
 
+from nai_transport import NAITransport
 from logger import get_logger
 logger = get_logger()  # 기존 setup_logger() 대신 통일된 로거 사용
 
 BASE_URL_DEPRE = "https://api.novelai.net"
 BASE_URL = "https://image.novelai.net"
+# 시간 초과/연결 오류로 응답을 받지 못했을 때 on_response_status에 넘기는 상태 코드
+STATUS_NO_RESPONSE = 0
 
 
 class NAISessionManager:
@@ -49,6 +53,11 @@ class NAISessionManager:
         
         # 세션 상태
         self.session_health = 1.0  # 1.0 = 완전 건강, 0.0 = 실패
+
+        # Anlas 조회 결과를 공유할 AnlasTracker (GUI에서 설정)
+        self.anlas_tracker = None
+        # 백그라운드 keepalive(Anlas 조회)가 실패해 다음 update()에서 세션 확인이 필요한지
+        self._keepalive_failed = False
         
         # 최적 갱신 주기 학습
         self.successful_session_durations = []
@@ -83,8 +92,9 @@ class NAISessionManager:
             adjusted_check = max(self.base_check_interval / (1 + self.consecutive_errors * 0.5), 600)  # 최소 10분
             adjusted_keepalive = self.base_keepalive_interval
         
-        # 전체 세션 확인
-        if current_time - self.last_check_time > adjusted_check:
+        # 전체 세션 확인 (백그라운드 keepalive가 실패했으면 바로)
+        if self._keepalive_failed or current_time - self.last_check_time > adjusted_check:
+            self._keepalive_failed = False
             self.perform_session_check()
             self.last_check_time = current_time
             
@@ -188,6 +198,18 @@ class NAISessionManager:
     
     def perform_keepalive(self):
         """경량 keepalive 호출 - 오류 처리 개선"""
+        tracker = self.anlas_tracker
+        if tracker is not None:
+            # AnlasTracker가 최근에 잔액을 조회했다면 그 요청이 keepalive 역할을 했으므로 생략
+            since = tracker.seconds_since_refresh()
+            if since is not None and since < self.keepalive_interval:
+                self.logger.debug("Keepalive 생략 - 최근 Anlas 조회 성공")
+                return True
+            # 세션 타이머는 GUI 스레드에서 돌므로 조회는 AnlasTracker의 백그라운드 스레드에 맡김.
+            # 결과는 on_keepalive_error로 돌아오며, 여기서는 마지막 조회 결과를 보고한다
+            tracker.request_refresh(force=True)
+            self.logger.debug("Keepalive 요청 - 백그라운드 Anlas 조회")
+            return tracker.last_fetch_ok is not False
         try:
             # API 요청 부하를 최소화하는 가장 경량 호출
             result = self.nai.get_anlas()
@@ -212,6 +234,21 @@ class NAISessionManager:
                 return self.perform_session_check()
             return False
             
+    def on_keepalive_error(self, error=None) -> None:
+        """AnlasTracker의 백그라운드 조회 실패 통보 (조회 스레드에서 호출됨).
+
+        기존 keepalive와 같이 오류를 집계하고, 세션 확인은 다음 update()에서
+        GUI 스레드의 다른 세션 작업과 겹치지 않게 수행한다.
+        """
+        self.consecutive_errors += 1
+        self.last_error_time = time.time()
+        kind = 'timeout' if isinstance(error, requests.exceptions.Timeout) else 'keepalive'
+        self.error_types[kind] = self.error_types.get(kind, 0) + 1
+        self.logger.warning(f"Keepalive(Anlas 조회) 실패: {error!r}" if error else "Keepalive 응답 없음")
+        # 시간 초과는 치명적이지 않으므로 다음 조회에서 재시도 (기존 동작과 동일)
+        if kind != 'timeout':
+            self._keepalive_failed = True
+
     def force_refresh(self) -> bool:
         """타이밍과 관계없이 강제 토큰 갱신 - 재시도 로직 추가"""
         max_attempts = 3
@@ -251,6 +288,11 @@ class NAISessionManager:
         
         return self.image_count_since_login
 
+    @property
+    def transport(self):
+        """NAIGenerator와 공유하는 연결 풀"""
+        return self.nai.transport
+
     def get_status_info(self):
         """UI에 표시할 세션 상태 정보"""
         return {
@@ -258,7 +300,8 @@ class NAISessionManager:
             "image_count": self.image_count_since_login,
             "max_images": self.max_images_per_session,
             "errors": self.consecutive_errors,
-            "estimated_lifetime": self._estimated_token_lifetime
+            "estimated_lifetime": self._estimated_token_lifetime,
+            "connection_stats": self.transport.get_stats()
         }
 
 
@@ -355,6 +398,206 @@ TYPE_NAIPARAM_DICT = {
 }
 
 
+def action_for_parameters(parameters: dict) -> NAIAction:
+    """파라미터에 맞는 action 결정 (순서 중요: mask 체크를 먼저!)"""
+    if parameters.get("mask"):
+        logger.info("✓ Mask detected - using NAIAction.infill")
+        return NAIAction.infill
+    if parameters.get("image"):
+        logger.info("img2img mode detected - using NAIAction.img2img")
+        return NAIAction.img2img
+    return NAIAction.generate
+
+
+def parse_retry_after(value, now: float | None = None) -> float | None:
+    """Retry-After 헤더 (초 또는 HTTP 날짜)를 대기 시간(초)으로 변환"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        from email.utils import parsedate_to_datetime
+        target = parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+    return max(0.0, target - (time.time() if now is None else now))
+
+
+def parse_anlas(content: bytes | dict) -> int:
+    """/user/subscription 응답 (본문 또는 파싱된 dict)에서 남은 Anlas (고정 + 구매분)"""
+    data_dict = content if isinstance(content, dict) else json.loads(content)
+    trainingStepsLeft = data_dict['trainingStepsLeft']
+    return int(trainingStepsLeft['fixedTrainingStepsLeft']) + \
+        int(trainingStepsLeft['purchasedTrainingSteps'])
+
+
+def response_error_message(response) -> str:
+    """오류 응답의 message 필드, JSON이 아니면 본문 앞부분"""
+    try:
+        return response.json().get('message', '알 수 없음')
+    except Exception:
+        return response.text[:200]
+
+
+# ── 요청 파라미터 구성 (순수 함수) ─────────────────────────────────────────
+# 생성 요청 본문은 NAIGenerator.parameters의 스냅샷(얕은 복사본)에서 만들어지며
+# 원본 파라미터는 바꾸지 않는다. 여러 요청을 동시에/미리 만들어도 서로 영향을 주지 않는다.
+
+V4_ONLY_PARAM_KEYS = (
+    "v4_prompt", "v4_negative_prompt", "v4_model_preset",
+    "characterPrompts", "use_character_coords",
+)
+DIRECTOR_REFERENCE_KEYS = (
+    "director_reference_descriptions", "director_reference_images",
+    "director_reference_information_extracted",
+    "director_reference_strength_values",
+    "director_reference_secondary_strength_values",
+)
+REFERENCE_MULTIPLE_KEYS = (
+    "reference_image_multiple", "reference_information_extracted_multiple",
+    "reference_strength_multiple", "reference_fidelity_multiple",
+)
+
+
+def _character_center(position, use_coords: bool, index: int) -> tuple[float, float]:
+    """캐릭터 위치 → (x, y). 좌표 미사용이거나 변환 실패 시 중앙"""
+    if use_coords and position and isinstance(position, (tuple, list)) and len(position) >= 2:
+        try:
+            return float(position[0]), float(position[1])
+        except Exception as e:
+            logger.error(f"[GEN] 캐릭터 {index+1} 위치 변환 실패: {e} (원본: {position})")
+    return 0.5, 0.5
+
+
+@functools.lru_cache(maxsize=32)
+def _build_v4_prompts(prompt: str, negative_prompt: str, characters: tuple,
+                      use_coords: bool, legacy: bool) -> tuple[dict, dict]:
+    """(v4_prompt, v4_negative_prompt) 구조 생성.
+
+    프롬프트/캐릭터가 같으면 같은 객체를 돌려주므로 호출 측은 결과를 수정하지 않는다 (읽기 전용).
+    characters: ((prompt, negative_prompt, position), ...)
+    """
+    char_captions = []
+    neg_char_captions = []
+    for i, (char_prompt, char_negative, position) in enumerate(characters):
+        x, y = _character_center(position, use_coords, i)
+        centers = [{"x": x, "y": y}]
+        char_captions.append({"char_caption": char_prompt, "centers": centers})
+        neg_char_captions.append({"char_caption": char_negative, "centers": centers})
+
+    v4_prompt = {
+        "caption": {"base_caption": prompt, "char_captions": char_captions},
+        "use_coords": use_coords,
+        "use_order": True,
+        "legacy_format": legacy,
+    }
+    v4_negative_prompt = {
+        "caption": {"base_caption": negative_prompt, "char_captions": neg_char_captions},
+        "use_coords": False,
+        "use_order": False,
+        "legacy_uc": legacy,
+    }
+    return v4_prompt, v4_negative_prompt
+
+
+def _character_key(character_prompts) -> tuple:
+    """characterPrompts → 캐시 키로 쓸 수 있는 튜플 (prompt가 없는 항목은 제외)"""
+    key = []
+    for char in character_prompts or ():
+        if isinstance(char, dict) and "prompt" in char:
+            position = char.get("position")
+            if isinstance(position, list):
+                position = tuple(position)
+            key.append((char["prompt"], char.get("negative_prompt", ""), position))
+    return tuple(key)
+
+
+def prepare_v4_parameters(parameters: dict) -> dict:
+    """V4 API 형식의 파라미터 사본을 반환 (V3 모델은 V4 전용 파라미터 제외). 입력은 바꾸지 않는다."""
+    params = dict(parameters)
+
+    if params.get("model", "") == "nai-diffusion-3":
+        for key in V4_ONLY_PARAM_KEYS + DIRECTOR_REFERENCE_KEYS + REFERENCE_MULTIPLE_KEYS:
+            params.pop(key, None)
+        return params
+
+    # 내부 파라미터 - API로 보내지 않음
+    use_coords = params.pop("use_character_coords", False)
+    legacy_mode = bool(params.get("legacy", False))
+    characters = _character_key(params.get("characterPrompts"))
+    try:
+        params["v4_prompt"], params["v4_negative_prompt"] = _build_v4_prompts(
+            params["prompt"], params["negative_prompt"], characters, use_coords, legacy_mode)
+    except TypeError:
+        # 해시할 수 없는 위치 값 등 - 캐시 없이 생성
+        params["v4_prompt"], params["v4_negative_prompt"] = _build_v4_prompts.__wrapped__(
+            params["prompt"], params["negative_prompt"], characters, use_coords, legacy_mode)
+
+    # 단일 reference_image(V3 Vibe Transfer)는 V4 API 형식이 아니므로 보내지 않음
+    if params.get("reference_image") is not None:
+        logger.warning("[GEN] V4 모델에서는 단일 reference_image(Vibe)를 지원하지 않아 제외")
+        params.pop("reference_image")
+
+    # Character Reference는 director_reference_* 파라미터로 전송
+    ref_images = params.get("reference_image_multiple")
+    if ref_images:
+        # 기존 단일 reference 파라미터 제거 (충돌 방지)
+        for key in ("reference_image", "reference_strength", "reference_information_extracted"):
+            params.pop(key, None)
+
+        # Style Aware는 base_caption으로 제어, information_extracted는 API 요구사항상 항상 [1]
+        style_aware = params.get("reference_information_extracted_multiple", [1])[0] == 1
+        params["director_reference_descriptions"] = [{
+            "caption": {
+                "base_caption": "character&style" if style_aware else "character",
+                "char_captions": []
+            },
+            "legacy_uc": False
+        }]
+        params["director_reference_images"] = ref_images
+        params["director_reference_information_extracted"] = [1]
+        params["director_reference_strength_values"] = params.get("reference_strength_multiple", [1])
+        params["director_reference_secondary_strength_values"] = params.get("reference_fidelity_multiple", [1.0])
+        logger.debug(f"[GEN] Character Reference - 이미지 {len(ref_images)}개, Style Aware: {style_aware}, "
+                     f"Fidelity: {params['director_reference_secondary_strength_values']}")
+    else:
+        for key in DIRECTOR_REFERENCE_KEYS:
+            params.pop(key, None)
+
+    # reference_*_multiple 파라미터는 director_reference_*와 중복되므로 제거
+    for key in REFERENCE_MULTIPLE_KEYS:
+        params.pop(key, None)
+    return params
+
+
+def prepare_infill_parameters(parameters: dict) -> dict:
+    """Infill 액션용 img2img 파라미터를 구성한 사본을 반환. 입력은 바꾸지 않는다."""
+    params = dict(parameters)
+    if params.get("mask") is None:
+        logger.warning("[WARN] Infill mode but NO MASK in parameters!")
+
+    img2img_strength = params.get("strength", 0.5)
+    params["img2img"] = {"strength": img2img_strength, "color_correct": True}
+    params["inpaintImg2ImgStrength"] = img2img_strength
+    # Top-level strength는 웹 UI와 동일하게 항상 0.7
+    params["strength"] = 0.7
+    params.pop("noise", None)
+    return params
+
+
+def build_request_parameters(parameters: dict, action: NAIAction) -> dict:
+    """parameters 스냅샷에서 generate-image 요청의 parameters 값을 만든다 (원본 불변)."""
+    params = dict(parameters)
+    if params.get("extra_noise_seed") == -1:
+        params["extra_noise_seed"] = params["seed"]
+    params = prepare_v4_parameters(params)
+    if action == NAIAction.infill:
+        params = prepare_infill_parameters(params)
+    return params
+
+
 def argon_hash(email: str, password: str, size: int, domain: str) -> str:
     pre_salt = f"{password[:6]}{email}{domain}"
     # salt
@@ -375,8 +618,15 @@ def argon_hash(email: str, password: str, size: int, domain: str) -> str:
 
 
 class NAIGenerator():
-    def __init__(self):
+    def __init__(self, transport: NAITransport | None = None,
+                 api_url: str = BASE_URL_DEPRE, image_url: str = BASE_URL):
+        # 모든 API 호출이 공유하는 연결 풀 (keep-alive 재사용)
+        self.transport = transport or NAITransport()
+        # 로그인/계정 API와 이미지 생성 API 주소 (로컬 테스트 서버 등으로 교체 가능)
+        self.api_url = api_url
+        self.image_url = image_url
         self.access_token = None
+        self.subscription_tier = None  # /user/subscription의 tier (get_anlas에서 갱신)
         self.username = None
         self.password = None
         self.api_key = None        # pst-... 영구 API 토큰 원본
@@ -387,6 +637,12 @@ class NAIGenerator():
         self._last_successful_check = 0
         self._estimated_token_lifetime = 24 * 3600  # 초기 예상: 24시간
         self._refresh_lock = threading.Lock()
+        # 생성 요청 응답 상태 관찰자 (status_code, retry_after_seconds | None) - RequestScheduler가 사용
+        self.on_response_status = None
+        # False면 429를 직접 기다려 재시도하지 않고 바로 반환 (스케줄러가 재시도)
+        self.retry_rate_limited = True
+        # False면 5xx/시간 초과/연결 오류도 직접 재시도하지 않고 바로 반환 (스케줄러가 재시도)
+        self.retry_transient_errors = True
         
         self.parameters = {
             # 기본 입력
@@ -531,30 +787,29 @@ class NAIGenerator():
         access_key = argon_hash(username, password, 64, "novelai_data_access_key")[:64]
         try:
             # try login
-            response = requests.post(
-                f"{BASE_URL_DEPRE}/user/login", json={"key": access_key})
+            response = self.transport.post(
+                f"{self.api_url}/user/login", json={"key": access_key}, timeout=30)
             self.access_token = response.json()["accessToken"]
 
             # if success, save id/pw in
             self.username = username
             self.password = password
-            
-            # 로그인 성공 시 세션 타임스탬프 업데이트
-            self._last_successful_login = time.time()
-            self._last_token_check = time.time()
-            
-            # 세션 건강도 리셋
-            if hasattr(self, 'session_manager'):
-                self.session_manager.consecutive_errors = 0
-                self.session_manager.image_count_since_login = 0
-                self.session_manager.session_health = 1.0
-
+            self._mark_login_success()
             return True
         except Exception as e:
             logger.error(f"로그인 실패: {e}")
 
         return False
 
+    def _mark_login_success(self) -> None:
+        """로그인 성공 시 세션 타임스탬프 갱신 및 세션 건강도 리셋 (동기/비동기 공용)"""
+        self._last_successful_login = time.time()
+        self._last_token_check = time.time()
+        if hasattr(self, 'session_manager'):
+            self.session_manager.consecutive_errors = 0
+            self.session_manager.image_count_since_login = 0
+            self.session_manager.session_health = 1.0
+
     def try_login_with_api_key(self, api_key: str) -> bool:
         """pst-... 형식의 영구 API 토큰으로 로그인"""
         if not api_key or not api_key.startswith("pst-"):
@@ -574,13 +829,7 @@ class NAIGenerator():
             self.login_method = None
             return False
 
-        self._last_successful_login = time.time()
-        self._last_token_check = time.time()
-        if hasattr(self, 'session_manager'):
-            self.session_manager.consecutive_errors = 0
-            self.session_manager.image_count_since_login = 0
-            self.session_manager.session_health = 1.0
-
+        self._mark_login_success()
         logger.info("API 키 로그인 성공")
         return True
 
@@ -619,20 +868,30 @@ class NAIGenerator():
 
     def get_anlas(self) -> int | None:
         try:
-            response = requests.get(BASE_URL_DEPRE + "/user/subscription", headers={
-                "Authorization": f"Bearer {self.access_token}"})
+            response = self.transport.get(self.api_url + "/user/subscription", headers={
+                "Authorization": f"Bearer {self.access_token}"}, timeout=30)
             data_dict = json.loads(response.content)
-            trainingStepsLeft = data_dict['trainingStepsLeft']
-            anlas = int(trainingStepsLeft['fixedTrainingStepsLeft']) + \
-                int(trainingStepsLeft['purchasedTrainingSteps'])
-
-            return anlas
+            # Opus(3) 무료 생성 여부 판단용 (AnlasTracker)
+            self.subscription_tier = data_dict.get('tier')
+            return parse_anlas(data_dict)
         except Exception as e:
             logger.error(f"Error getting ANLAS: {e}")
 
         return None
 
     def generate_image(self, action: NAIAction) -> bytes | tuple[None, str]:
+        url, data, headers, request_id = self._build_generate_request(action)
+
+        if hasattr(self, 'session_manager') and not self.session_manager.network_available:
+            logger.error("네트워크 연결 없음 - 이미지 생성 요청 실패")
+            return None, "인터넷 연결이 없습니다. 네트워크 상태를 확인해주세요."
+
+        return self._execute_api_request(url, data, headers, request_id)
+
+    # ── generate_image 헬퍼 ──────────────────────────────────────────────
+
+    def _build_generate_request(self, action: NAIAction) -> tuple[str, dict, dict, str]:
+        """생성 요청의 (url, data, headers, request_id)를 구성한다 (동기/비동기 공용)."""
         assert isinstance(action, NAIAction)
 
         import uuid
@@ -641,32 +900,20 @@ class NAIGenerator():
 
         model = self._resolve_model(action)
 
-        if self.parameters["extra_noise_seed"] == -1:
-            self.parameters["extra_noise_seed"] = self.parameters["seed"]
+        # 현재 파라미터의 스냅샷으로 요청을 만든다 (self.parameters는 바꾸지 않음)
+        parameters = build_request_parameters(self.parameters, action)
 
-        self._prepare_v4_parameters()
-
-        if action == NAIAction.infill:
-            self._prepare_infill_params(request_id)
-
-        url = BASE_URL + "/ai/generate-image"
+        url = self.image_url + "/ai/generate-image"
         data = {
-            "input": self.parameters["prompt"],
+            "input": parameters["prompt"],
             "model": model,
             "action": action.name,
-            "parameters": self.parameters,
+            "parameters": parameters,
         }
         headers = {"Authorization": f"Bearer {self.access_token}"}
 
-        self._log_preflight(request_id, model, action)
-
-        if hasattr(self, 'session_manager') and not self.session_manager.network_available:
-            logger.error("네트워크 연결 없음 - 이미지 생성 요청 실패")
-            return None, "인터넷 연결이 없습니다. 네트워크 상태를 확인해주세요."
-
-        return self._execute_api_request(url, data, headers, request_id)
-
-    # ── generate_image 헬퍼 ──────────────────────────────────────────────
+        self._log_preflight(request_id, model, action, parameters)
+        return url, data, headers, request_id
 
     def _resolve_model(self, action: NAIAction) -> str:
         """action 에 맞는 최종 모델 이름을 반환한다."""
@@ -678,47 +925,24 @@ class NAIGenerator():
                 model = "nai-diffusion-4-full-inpainting"
         return model
 
-    def _prepare_infill_params(self, request_id: str) -> None:
-        """Infill 액션에 필요한 img2img 파라미터를 self.parameters 에 구성한다."""
-        logger.info(f"[GEN] [{request_id}] Infill 모드 - img2img 파라미터 구조화")
-
-        has_mask = "mask" in self.parameters and self.parameters["mask"] is not None
-        if has_mask:
-            mask_size = len(self.parameters["mask"]) if isinstance(self.parameters["mask"], str) else 0
-            logger.info(f"[OK] Mask detected in parameters - size: {mask_size} bytes")
-        else:
-            logger.warning("[WARN] Infill mode but NO MASK in parameters!")
-
-        img2img_strength = self.parameters.get("strength", 0.5)
-        img2img_params = {"strength": img2img_strength, "color_correct": True}
-
-        self.parameters["img2img"] = img2img_params
-        self.parameters["inpaintImg2ImgStrength"] = img2img_strength
-        # Top-level strength는 웹 UI와 동일하게 항상 0.7
-        self.parameters["strength"] = 0.7
-        self.parameters.pop("noise", None)
-
-        logger.info(f"[GEN] [{request_id}] img2img params: {img2img_params}")
-        logger.info(f"[GEN] [{request_id}] inpaintImg2ImgStrength: {img2img_strength}")
-
-    def _log_preflight(self, request_id: str, model: str, action: NAIAction) -> None:
-        """API 전송 직전 요청 내용을 INFO 레벨로 기록한다."""
-        if "director_reference_descriptions" in self.parameters:
-            logger.info("[GEN] API 전송 데이터에 director_reference_descriptions 포함됨")
-        if "director_reference_images" in self.parameters:
-            logger.info(f"[GEN] director_reference_images: {len(self.parameters['director_reference_images'])}개")
-
-        logger.info(f"[GEN] [{request_id}] 모델: {model}, 액션: {action.name}")
-
-        if "v4_prompt" in self.parameters:
-            v4_prompt = self.parameters["v4_prompt"]
-            char_captions = v4_prompt["caption"].get("char_captions", [])
-            logger.info(f"[GEN] v4_prompt use_coords={v4_prompt.get('use_coords', False)}, 캐릭터 수={len(char_captions)}")
-            for i, cc in enumerate(char_captions):
-                logger.info(f"  - 캐릭터 {i+1}: '{cc.get('char_caption','')[:30]}...' -> {cc.get('centers',[])} ")
+    def _log_preflight(self, request_id: str, model: str, action: NAIAction, parameters: dict) -> None:
+        """API 전송 직전 요청 요약을 기록한다 (상세 내용은 DEBUG)."""
+        v4_prompt = parameters.get("v4_prompt")
+        char_count = len(v4_prompt["caption"]["char_captions"]) if v4_prompt else 0
+        ref_count = len(parameters.get("director_reference_images") or ())
+        logger.info(f"[GEN] [{request_id}] 모델: {model}, 액션: {action.name}, "
+                    f"캐릭터: {char_count}, 캐릭터 참조: {ref_count}")
 
-        if "characterPrompts" in self.parameters:
-            logger.debug(f"[{request_id}] 원본 characterPrompts: {len(self.parameters['characterPrompts'])}개")
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
+        if v4_prompt:
+            logger.debug(f"[GEN] v4_prompt use_coords={v4_prompt.get('use_coords', False)}")
+            for i, cc in enumerate(v4_prompt["caption"]["char_captions"]):
+                logger.debug(f"  - 캐릭터 {i+1}: '{cc.get('char_caption','')[:30]}...' -> {cc.get('centers',[])}")
+        if action == NAIAction.infill:
+            mask = parameters.get("mask")
+            logger.debug(f"[GEN] [{request_id}] Infill - mask: {len(mask) if isinstance(mask, str) else 0} bytes, "
+                         f"img2img: {parameters.get('img2img')}")
 
     def _execute_api_request(
         self, url: str, data: dict, headers: dict, request_id: str
@@ -730,7 +954,11 @@ class NAIGenerator():
         for retry in range(max_retries):
             try:
                 logger.info(f"API request attempt [ID: {request_id}] - {retry+1}/{max_retries}")
-                response = requests.post(url, json=data, headers=headers, timeout=60)
+                response = self.transport.post(url, json=data, headers=headers, timeout=60)
+                retry_after = parse_retry_after(response.headers.get("Retry-After")) \
+                    if response.status_code in (429, 503) else None
+                if self.on_response_status is not None:
+                    self.on_response_status(response.status_code, retry_after)
 
                 if response.status_code in (200, 201):
                     logger.info(f"API request successful [ID: {request_id}] - {response.status_code}")
@@ -738,11 +966,7 @@ class NAIGenerator():
                         self.session_manager.consecutive_errors = 0
                     return response.content
 
-                # 오류 응답 분석
-                try:
-                    error_msg = response.json().get('message', '알 수 없음')
-                except Exception:
-                    error_msg = response.text[:200]
+                error_msg = response_error_message(response)
                 logger.error(f"API error [ID: {request_id}] {response.status_code}: {error_msg}")
 
                 if response.status_code == 401:
@@ -751,8 +975,18 @@ class NAIGenerator():
                     return None, "인증 오류: 로그인이 필요합니다."
                 if response.status_code == 402:
                     return None, "결제 필요: Anlas가 부족합니다."
+                if response.status_code == 429:
+                    # 동시 요청/속도 제한 - 서버가 알려준 시간만큼 기다린 뒤 재시도
+                    wait_time = retry_after if retry_after is not None else retry_delay * (2 ** retry)
+                    logger.warning(f"요청 제한(429), {wait_time:.1f}초 후 재시도... [ID: {request_id}]")
+                    if self.retry_rate_limited and retry < max_retries - 1:
+                        time.sleep(wait_time)
+                        continue
+                    return None, "요청 제한: 잠시 후 다시 시도해주세요."
                 if response.status_code >= 500:
-                    wait_time = retry_delay * (2 ** retry)
+                    if not self.retry_transient_errors:
+                        return None, f"서버 오류({response.status_code}): 잠시 후 다시 시도해주세요."
+                    wait_time = retry_after if retry_after is not None else retry_delay * (2 ** retry)
                     logger.warning(f"서버 오류, {wait_time}초 후 재시도... [ID: {request_id}]")
                     time.sleep(wait_time)
                     continue
@@ -760,6 +994,10 @@ class NAIGenerator():
             except requests.exceptions.Timeout:
                 wait_time = retry_delay * (2 ** retry)
                 logger.error(f"API timeout [ID: {request_id}] attempt {retry+1}")
+                if self.on_response_status is not None:
+                    self.on_response_status(STATUS_NO_RESPONSE, None)
+                if not self.retry_transient_errors:
+                    return None, "요청 시간 초과: 잠시 후 다시 시도해주세요."
                 time.sleep(wait_time)
                 continue
 
@@ -770,251 +1008,37 @@ class NAIGenerator():
                         self.session_manager.network_available = False
                         self.session_manager.check_network_availability()
                     return None, "인터넷 연결 문제: 서버에 연결할 수 없습니다. 네트워크 상태를 확인해주세요."
+                if self.on_response_status is not None:
+                    self.on_response_status(STATUS_NO_RESPONSE, None)
+                if not self.retry_transient_errors:
+                    return None, f"연결 오류: {e}"
                 wait_time = retry_delay * (2 ** retry)
                 time.sleep(wait_time)
                 continue
 
             except Exception as e:
                 logger.error(f"API exception [ID: {request_id}]: {e}", exc_info=True)
-                if retry < max_retries - 1:
+                if self.retry_transient_errors and retry < max_retries - 1:
                     time.sleep(retry_delay * (2 ** retry))
                     continue
                 return None, f"API 요청 오류: {e}"
 
         return None, "최대 재시도 횟수 초과: 서버에 연결할 수 없습니다."
     
-    def _prepare_v4_parameters(self) -> None:
-        """V4 API에 필요한 파라미터 구조로 변환 (V3 모델은 V4 파라미터 제외)"""
-        logger.debug("=== _prepare_v4_parameters 메서드 호출됨 ===")
-        logger.info("[GEN] _prepare_v4_parameters 메서드 시작")
-
-        # V3 모델은 v4_prompt / characterPrompts 등 V4 전용 파라미터가 필요 없음
-        model = self.parameters.get("model", "")
-        if model == "nai-diffusion-3":
-            logger.info("[GEN] V3 모델 감지 — V4 전용 파라미터 변환 생략")
-            for key in [
-                "v4_prompt", "v4_negative_prompt", "v4_model_preset",
-                "characterPrompts", "use_character_coords",
-                "director_reference_descriptions", "director_reference_images",
-                "director_reference_information_extracted",
-                "director_reference_strength_values",
-                "director_reference_secondary_strength_values",
-                "reference_image_multiple", "reference_information_extracted_multiple",
-                "reference_strength_multiple", "reference_fidelity_multiple",
-            ]:
-                self.parameters.pop(key, None)
-            logger.info("[GEN] _prepare_v4_parameters 완료 (V3 모드)")
-            return
-
-        # 내부 파라미터 처리 - use_character_coords 값 저장 후 제거
-        use_coords = self.parameters.get("use_character_coords", False)
-        logger.info(f"[GEN] 원본 use_character_coords: {use_coords}")
-        if "use_character_coords" in self.parameters:
-            del self.parameters["use_character_coords"]
-
-        # Legacy 모드 확인
-        legacy_mode = bool(self.parameters.get("legacy", False))
-        logger.debug(f"[GEN] Legacy 모드: {legacy_mode}")
-        
-        # V4 프롬프트 형식 설정
-        self.parameters["v4_prompt"] = {
-            "caption": {
-                "base_caption": self.parameters["prompt"],
-                "char_captions": []
-            },
-            "use_coords": use_coords,
-            "use_order": True,
-            "legacy_format": legacy_mode
-        }
-        
-        # V4 네거티브 프롬프트 형식 설정
-        self.parameters["v4_negative_prompt"] = {
-            "caption": {
-                "base_caption": self.parameters["negative_prompt"],
-                "char_captions": []
-            },
-            "use_coords": False,
-            "use_order": False,
-            "legacy_uc": legacy_mode
-        }
-        
-        logger.debug(f"[GEN] v4_prompt 초기 구조 생성 완료 - use_coords: {use_coords}")
-        
-        # 캐릭터 프롬프트 처리
-        if self.parameters.get("characterPrompts") and len(self.parameters["characterPrompts"]) > 0:
-            char_prompts = self.parameters["characterPrompts"]
-            logger.info(f"[GEN] 캐릭터 프롬프트 처리 시작: {len(char_prompts)}개")
-            
-            for i, char in enumerate(char_prompts):
-                if isinstance(char, dict) and "prompt" in char:
-                    char_caption = {
-                        "char_caption": char["prompt"],
-                        "centers": [{"x": 0.5, "y": 0.5}]  # 기본 중앙 위치
-                    }
-                    
-                    logger.debug(f"[GEN] 캐릭터 {i+1} 프롬프트: '{char['prompt'][:50]}...'")
-                    
-                    # 위치 정보 처리
-                    if use_coords and "position" in char and char["position"]:
-                        position = char["position"]
-                        logger.debug(f"[GEN] 캐릭터 {i+1} 원본 위치 데이터: {position}, 타입: {type(position)}")
-                        
-                        if isinstance(position, (tuple, list)) and len(position) >= 2:
-                            try:
-                                position_x = float(position[0])
-                                position_y = float(position[1])
-                                char_caption["centers"] = [{"x": position_x, "y": position_y}]
-                                logger.info(f"[GEN] 캐릭터 {i+1} 커스텀 위치 적용: x={position_x}, y={position_y}")
-                            except Exception as e:
-                                logger.error(f"[GEN] 캐릭터 {i+1} 위치 변환 실패: {e}")
-                                logger.debug(f"[GEN] 원본 위치 데이터 상세: {position}")
-                    else:
-                        logger.debug(f"[GEN] 캐릭터 {i+1} 기본 중앙 위치 사용 (use_coords={use_coords})")
-                    
-                    # 캐릭터 프롬프트 추가
-                    self.parameters["v4_prompt"]["caption"]["char_captions"].append(char_caption)
-                    logger.debug(f"[GEN] 캐릭터 {i+1} v4_prompt에 추가됨: {char_caption}")
-                    
-                    # 네거티브 프롬프트
-                    neg_caption = {
-                        "char_caption": char.get("negative_prompt", ""),
-                        "centers": char_caption["centers"]
-                    }
-                    self.parameters["v4_negative_prompt"]["caption"]["char_captions"].append(neg_caption)
-            
-            logger.info(f"[GEN] 캐릭터 프롬프트 처리 완료 - 총 {len(self.parameters['v4_prompt']['caption']['char_captions'])}개 변환됨")
-            
-            # 최종 v4_prompt 구조 로깅
-            logger.debug(f"[GEN] 최종 v4_prompt 구조:")
-            logger.debug(f"  - use_coords: {self.parameters['v4_prompt']['use_coords']}")
-            logger.debug(f"  - 캐릭터 수: {len(self.parameters['v4_prompt']['caption']['char_captions'])}")
-            for i, char_cap in enumerate(self.parameters['v4_prompt']['caption']['char_captions']):
-                logger.debug(f"  - 캐릭터 {i+1}: centers={char_cap['centers']}")
-        else:
-            logger.debug("[GEN] 캐릭터 프롬프트 없음 - 기본 프롬프트만 사용")
-
-        # Character Reference 처리 (캐릭터 프롬프트 처리 이후에 추가)
-        if (self.parameters.get("reference_image_multiple") and 
-            len(self.parameters["reference_image_multiple"]) > 0):
-            
-            logger.info("[GEN] Character Reference 데이터 처리 중")
-            
-            # *** 기존 단일 reference 파라미터 제거 (충돌 방지) ***
-            if "reference_image" in self.parameters:
-                del self.parameters["reference_image"]
-            if "reference_strength" in self.parameters:
-                del self.parameters["reference_strength"]
-            if "reference_information_extracted" in self.parameters:
-                del self.parameters["reference_information_extracted"]
-            
-            # Character Reference는 director_reference_* 파라미터 사용
-            ref_images = self.parameters["reference_image_multiple"]
-            ref_info_extracted_input = self.parameters.get("reference_information_extracted_multiple", [1])
-            ref_strength = self.parameters.get("reference_strength_multiple", [1])
-            
-            # Style Aware 설정 확인 (base_caption 결정용)
-            style_aware = ref_info_extracted_input[0] == 1
-            
-            # API 요구사항: director_reference_information_extracted는 항상 [1]이어야 함
-            ref_info_extracted = [1]
-            
-            # Style Aware는 base_caption으로 제어
-            if style_aware:
-                descriptions = [{
-                    "caption": {
-                        "base_caption": "character&style",
-                        "char_captions": []
-                    },
-                    "legacy_uc": False
-                }]
-            else:
-                descriptions = [{
-                    "caption": {
-                        "base_caption": "character",
-                        "char_captions": []
-                    },
-                    "legacy_uc": False
-                }]
-            
-            # Fidelity 값 추출
-            ref_fidelity = self.parameters.get("reference_fidelity_multiple", [1.0])
-            
-            # director_reference_* 파라미터 설정
-            self.parameters["director_reference_descriptions"] = descriptions
-            self.parameters["director_reference_images"] = ref_images
-            self.parameters["director_reference_information_extracted"] = ref_info_extracted  # 항상 [1]
-            self.parameters["director_reference_strength_values"] = ref_strength
-            self.parameters["director_reference_secondary_strength_values"] = ref_fidelity  # Fidelity 추가
-            
-            # reference_*_multiple 파라미터는 제거 (director_reference_*와 중복 방지)
-            del self.parameters["reference_image_multiple"]
-            del self.parameters["reference_information_extracted_multiple"]
-            del self.parameters["reference_strength_multiple"]
-            if "reference_fidelity_multiple" in self.parameters:
-                del self.parameters["reference_fidelity_multiple"]
-            
-            # 디버깅 로깅
-            logger.info(f"[GEN] director_reference_descriptions: {descriptions}")
-            logger.info(f"[GEN] director_reference_images 개수: {len(ref_images)}")
-            logger.info(f"[GEN] director_reference_images[0] 길이: {len(ref_images[0]) if ref_images else 0}")
-            logger.info(f"[GEN] director_reference_information_extracted: {ref_info_extracted}")
-            logger.info(f"[GEN] director_reference_strength_values: {ref_strength}")
-            logger.info(f"[GEN] director_reference_secondary_strength_values (Fidelity): {ref_fidelity}")
-            logger.info(f"[GEN] Character Reference 적용 완료 - Style Aware: {style_aware}, Fidelity: {ref_fidelity[0]}")
-        else:
-            # Character Reference가 없을 때 모든 director_reference_* 파라미터 명시적으로 제거
-            self.parameters.pop("director_reference_descriptions", None)
-            self.parameters.pop("director_reference_images", None)
-            self.parameters.pop("director_reference_information_extracted", None)
-            self.parameters.pop("director_reference_strength_values", None)
-            self.parameters.pop("director_reference_secondary_strength_values", None)
-            
-            # reference_*_multiple 파라미터도 제거
-            self.parameters.pop("reference_image_multiple", None)
-            self.parameters.pop("reference_information_extracted_multiple", None)
-            self.parameters.pop("reference_strength_multiple", None)
-            self.parameters.pop("reference_fidelity_multiple", None)
-            
-            logger.info("[GEN] Character Reference 없음 - 모든 director_reference_* 파라미터 제거됨")
-
-        logger.info("[GEN] _prepare_v4_parameters 메서드 완료")
-                        
     def check_logged_in(self) -> bool:
         """더 나은 오류 처리를 포함한 로그인 확인"""
         if not self.access_token:
             return False
             
         try:
-            response = requests.get(
-                BASE_URL_DEPRE + "/user/information", 
+            response = self.transport.get(
+                self.api_url + "/user/information", 
                 headers={"Authorization": f"Bearer {self.access_token}"}, 
                 timeout=5
             )
             
-            if response.status_code == 200:
-                # 성공 - 토큰 수명 예상치 업데이트
-                if hasattr(self, '_last_successful_check'):
-                    elapsed = time.time() - self._last_successful_check
-                    # 토큰 수명 예상치 점진적 조정
-                    self._estimated_token_lifetime = (self._estimated_token_lifetime * 0.9) + (elapsed * 0.1)
-                
-                self._last_successful_check = time.time()
-                return True
-                
-            elif response.status_code == 401:
-                # 인증 오류 - 토큰 만료
-                logging.info("토큰이 더 이상 유효하지 않음")
-                return False
-                
-            elif response.status_code >= 500:
-                # 서버 오류 - 토큰은 여전히 유효하다고 가정
-                logging.warning(f"토큰 상태 확인 중 서버 오류: {response.status_code}")
-                return True
-                
-            else:
-                logging.warning(f"토큰 확인 중 예상치 못한 응답: {response.status_code}")
-                return False
-                
+            return self._logged_in_from_status(response.status_code)
+
         except requests.exceptions.Timeout:
             logging.warning("로그인 상태 확인 시간 초과")
             return True  # 시간 초과 시 여전히 유효하다고 가정
@@ -1027,3 +1051,28 @@ class NAIGenerator():
             logging.error(f"로그인 상태 확인 오류: {e}")
             return False
 
+    def _logged_in_from_status(self, status_code: int) -> bool:
+        """/user/information 응답 코드로 로그인 유지 여부 판단 (동기/비동기 공용)"""
+        if status_code == 200:
+            # 성공 - 토큰 수명 예상치 업데이트
+            if hasattr(self, '_last_successful_check'):
+                elapsed = time.time() - self._last_successful_check
+                # 토큰 수명 예상치 점진적 조정
+                self._estimated_token_lifetime = (self._estimated_token_lifetime * 0.9) + (elapsed * 0.1)
+
+            self._last_successful_check = time.time()
+            return True
+
+        elif status_code == 401:
+            # 인증 오류 - 토큰 만료
+            logging.info("토큰이 더 이상 유효하지 않음")
+            return False
+
+        elif status_code >= 500:
+            # 서버 오류 - 토큰은 여전히 유효하다고 가정
+            logging.warning(f"토큰 상태 확인 중 서버 오류: {status_code}")
+            return True
+
+        else:
+            logging.warning(f"토큰 확인 중 예상치 못한 응답: {status_code}")
+            return False
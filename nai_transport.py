@@ -0,0 +1,173 @@
+"""
+nai_transport.py - NovelAI API 공용 HTTP 전송 계층
+
+NAIGenerator와 NAISessionManager가 공유하는 연결 풀 기반 requests.Session.
+매 요청마다 TCP+TLS 핸드셰이크를 반복하지 않도록 keep-alive 연결을 재사용하고,
+연결 재사용/신규 생성 횟수를 집계합니다.
+"""
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+from logger import get_logger
+logger = get_logger()
+
+DEFAULT_POOL_CONNECTIONS = 4   # 캐시할 호스트별 풀 개수
+DEFAULT_POOL_MAXSIZE = 8       # 호스트당 최대 유지 연결 수
+DEFAULT_MAX_RETRIES = 2        # 연결 단계 재시도 횟수
+DEFAULT_BACKOFF_FACTOR = 0.5
+
+
+class _ConnectionCounter:
+    """연결 재사용/신규 생성 횟수 (스레드 안전)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.new_connections = 0
+        self.reused_connections = 0
+
+    def record(self, reused: bool) -> None:
+        with self._lock:
+            if reused:
+                self.reused_connections += 1
+            else:
+                self.new_connections += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self.new_connections = 0
+            self.reused_connections = 0
+
+
+def _make_counting_pool_class(base_cls, counter):
+    """_get_conn 시점에 소켓 연결 여부로 재사용을 판별하는 풀 클래스 생성"""
+
+    class CountingConnectionPool(base_cls):
+        def _get_conn(self, timeout=None):
+            conn = super()._get_conn(timeout)
+            # 소켓이 살아있는 풀 연결이면 재사용, 아니면 새 핸드셰이크가 발생
+            counter.record(getattr(conn, "sock", None) is not None)
+            return conn
+
+    return CountingConnectionPool
+
+
+class _CountingHTTPAdapter(HTTPAdapter):
+    def __init__(self, counter, **kwargs):
+        self._counter = counter
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _make_counting_pool_class(HTTPConnectionPool, self._counter),
+            "https": _make_counting_pool_class(HTTPSConnectionPool, self._counter),
+        }
+
+
+class NAITransport:
+    """연결 풀을 공유하는 NovelAI API 전송 객체.
+
+    Args:
+        pool_connections: 캐시할 호스트 풀 개수
+        pool_maxsize: 호스트당 유지할 최대 연결 수
+        max_retries: 연결 실패 시 어댑터 레벨 재시도 횟수 (POST 본문은 재전송하지 않음)
+        backoff_factor: 어댑터 재시도 간 지수 백오프 계수
+        keepalive: False면 매 요청 후 연결을 닫음 (비교 측정용)
+        pool_block: True면 풀이 가득 찼을 때 새 연결 대신 대기
+    """
+
+    def __init__(self, pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 backoff_factor: float = DEFAULT_BACKOFF_FACTOR,
+                 keepalive: bool = True,
+                 pool_block: bool = False):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.keepalive = keepalive
+        self.pool_block = pool_block
+
+        self._counter = _ConnectionCounter()
+        self._stats_lock = threading.Lock()
+        self.request_count = 0
+        self.error_count = 0
+
+        self.session = self._create_session()
+
+    def _create_session(self) -> requests.Session:
+        # 생성 요청(POST)은 Anlas가 차감되므로 연결 단계 오류만 재시도하고,
+        # 상태 코드 기반 재시도는 멱등한 GET 요청에만 적용
+        retry = Retry(
+            total=self.max_retries,
+            connect=self.max_retries,
+            read=0,
+            status=self.max_retries,
+            status_forcelist=(502, 503, 504),
+            backoff_factor=self.backoff_factor,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = _CountingHTTPAdapter(
+            self._counter,
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=retry,
+            pool_block=self.pool_block,
+        )
+
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        if not self.keepalive:
+            session.headers["Connection"] = "close"
+        return session
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        with self._stats_lock:
+            self.request_count += 1
+        try:
+            return self.session.request(method, url, **kwargs)
+        except requests.exceptions.RequestException:
+            with self._stats_lock:
+                self.error_count += 1
+            raise
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def get_stats(self) -> dict:
+        """요청 수 및 연결 재사용 통계"""
+        new_conn = self._counter.new_connections
+        reused_conn = self._counter.reused_connections
+        total = new_conn + reused_conn
+        return {
+            "requests": self.request_count,
+            "errors": self.error_count,
+            "new_connections": new_conn,
+            "reused_connections": reused_conn,
+            "reuse_ratio": (reused_conn / total) if total else 0.0,
+        }
+
+    def reset_stats(self) -> None:
+        self._counter.reset()
+        with self._stats_lock:
+            self.request_count = 0
+            self.error_count = 0
+
+    def close(self) -> None:
+        """풀의 모든 연결을 닫는다. 이후 요청은 새 연결을 만든다."""
+        try:
+            self.session.close()
+        except Exception as e:
+            logger.debug(f"전송 세션 종료 오류: {e}")
+        self.session = self._create_session()
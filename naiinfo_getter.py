@@ -1,5 +1,7 @@
 from PIL import Image
 import json
+import struct
+import zlib
 
 from stealth_pnginfo import read_info_from_image_stealth
 from logger import get_logger
@@ -9,8 +11,74 @@ logger = get_logger()
 TARGETKEY_NAIDICT_OPTION = ("steps", "height", "width",
                             "scale", "seed", "sampler", "n_samples", "sm", "sm_dyn")
 
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_TEXT_CHUNKS = (b"tEXt", b"zTXt", b"iTXt")
 
-def _get_infostr_from_img(img):
+
+def read_png_text_chunks(src):
+    """픽셀을 디코딩하지 않고 PNG 텍스트 청크(tEXt/zTXt/iTXt)만 읽어 {키: 문자열} 반환.
+
+    PIL의 img.info와 같은 방식으로 디코딩한다 (tEXt/zTXt는 latin-1, iTXt는 UTF-8).
+    PNG가 아니거나 청크 구조/CRC가 올바르지 않으면 None을 반환하여 기존 경로로 처리하게 한다.
+    """
+    try:
+        with open(src, "rb") as f:
+            if f.read(len(PNG_SIGNATURE)) != PNG_SIGNATURE:
+                return None
+
+            texts = {}
+            while True:
+                head = f.read(8)
+                if len(head) < 8:
+                    return None
+                length, chunk_type = struct.unpack(">I4s", head)
+                if chunk_type == b"IEND":
+                    return texts
+                if chunk_type not in PNG_TEXT_CHUNKS:
+                    # IDAT 등은 읽지 않고 건너뜀
+                    f.seek(length + 4, 1)
+                    continue
+
+                data = f.read(length)
+                crc = f.read(4)
+                if len(data) < length or len(crc) < 4:
+                    return None
+                if zlib.crc32(chunk_type + data) != struct.unpack(">I", crc)[0]:
+                    return None
+                key, text = _decode_text_chunk(chunk_type, data)
+                if key:
+                    texts[key] = text
+    except (OSError, ValueError, zlib.error) as e:
+        logger.debug(f"PNG chunk read failed, falling back to full decode ({src}): {e}")
+        return None
+
+
+def _decode_text_chunk(chunk_type, data):
+    if chunk_type == b"tEXt":
+        key, _, value = data.partition(b"\0")
+        return key.decode("latin-1", "strict"), value.decode("latin-1", "replace")
+
+    if chunk_type == b"zTXt":
+        key, _, rest = data.partition(b"\0")
+        # rest[0]: 압축 방식 (0 = zlib)
+        value = zlib.decompress(rest[1:]) if rest and rest[0] == 0 else b""
+        return key.decode("latin-1", "strict"), value.decode("latin-1", "replace")
+
+    # iTXt: key \0 압축여부 압축방식 lang \0 번역키 \0 text
+    key, _, rest = data.partition(b"\0")
+    if len(rest) < 2:
+        return None, None
+    compressed, method, rest = rest[0], rest[1], rest[2:]
+    _, _, rest = rest.partition(b"\0")
+    _, _, value = rest.partition(b"\0")
+    if compressed:
+        if method != 0:
+            return None, None
+        value = zlib.decompress(value)
+    return key.decode("latin-1", "strict"), value.decode("utf-8")
+
+
+def _get_infostr_from_img(img, read_stealth=True):
     exif = None
     pnginfo = None
 
@@ -22,10 +90,11 @@ def _get_infostr_from_img(img):
             logger.error(f"Error reading image exif: {e}")
 
     # stealth pnginfo
-    try:
-        pnginfo = read_info_from_image_stealth(img)
-    except Exception as e:
-        logger.error(f"Error reading stealth pnginfo: {e}")
+    if read_stealth:
+        try:
+            pnginfo = read_info_from_image_stealth(img)
+        except Exception as e:
+            logger.error(f"Error reading stealth pnginfo: {e}")
 
     return exif, pnginfo
 
@@ -68,7 +137,24 @@ def _get_naidict_from_exifdict(exif_dict):
     return None
 
 
-def get_naidict_from_file(src):
+def get_naidict_from_file(src, read_stealth=True):
+    """이미지 파일에서 NAI 정보 읽기.
+
+    PNG는 먼저 텍스트 청크만 읽어 Comment가 유효하면 픽셀 디코딩 없이 반환하고,
+    텍스트 메타데이터가 없을 때만 이미지를 디코딩하여 stealth pnginfo를 확인한다.
+    read_stealth=False면 stealth 확인을 완전히 건너뛴다.
+    """
+    text_chunks = read_png_text_chunks(src)
+    if text_chunks and "Comment" in text_chunks:
+        nai_dict = _get_naidict_from_exifdict(_get_exifdict_from_infostr(json.dumps(text_chunks)))
+        if nai_dict:
+            return nai_dict, 3
+
+    if text_chunks is not None and not read_stealth:
+        # 텍스트 청크가 전부이므로 이미지를 열 필요 없음
+        exif = json.dumps(text_chunks) if text_chunks else None
+        return _get_naidict_from_infostr(exif, None)
+
     try:
         img = Image.open(src)
         img.load()
@@ -76,7 +162,7 @@ def get_naidict_from_file(src):
         logger.error(f"Error loading image from file {src}: {e}")
         return None
 
-    return get_naidict_from_img(img)
+    return get_naidict_from_img(img, read_stealth)
 
 
 def get_naidict_from_txt(src):
@@ -96,8 +182,20 @@ def get_naidict_from_txt(src):
         return nd, 3
 
 
-def get_naidict_from_img(img):
-    exif, pnginfo = _get_infostr_from_img(img)
+def get_naidict_from_img(img, read_stealth=True):
+    # 텍스트 메타데이터가 유효하면 그 결과가 우선이므로 stealth 픽셀 스캔 생략
+    exif, _ = _get_infostr_from_img(img, read_stealth=False)
+    if exif:
+        nai_dict = _get_naidict_from_exifdict(_get_exifdict_from_infostr(exif))
+        if nai_dict:
+            return nai_dict, 3
+    if not read_stealth:
+        return _get_naidict_from_infostr(exif, None)
+    exif, pnginfo = _get_infostr_from_img(img, read_stealth)
+    return _get_naidict_from_infostr(exif, pnginfo)
+
+
+def _get_naidict_from_infostr(exif, pnginfo):
     if not exif and not pnginfo:
         return None, 0
 
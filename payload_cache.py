@@ -0,0 +1,129 @@
+"""
+payload_cache.py - 이미지 요청 페이로드(base64 PNG) 캐시
+
+img2img 원본, Vibe 참조, 캐릭터 참조, 인페인트 마스크, Enhance 업스케일 이미지는
+자동 생성 중 매번 같은 입력이 다시 열리고 리사이즈/PNG 인코딩/base64 인코딩됩니다.
+최종 base64 문자열을 입력 내용 기준 키로 캐시하여 입력이 바뀌지 않았으면 인코딩을 건너뜁니다.
+
+키:
+    파일 입력   - ("file", 절대 경로, mtime_ns, 크기, 변환 이름, 변환 파라미터)
+    메모리 이미지 - ("image", 픽셀 해시, 변환 이름, 변환 파라미터)
+
+전체 문자열 크기 합이 max_bytes를 넘으면 가장 오래 쓰지 않은 항목부터 제거합니다 (LRU).
+"""
+
+import base64
+import collections
+import io
+import os
+import threading
+from hashlib import blake2b
+
+from PIL import Image
+
+from logger import get_logger
+logger = get_logger()
+
+DEFAULT_PAYLOAD_CACHE_BYTES = 256 * 1024 * 1024
+
+
+def encode_png_base64(image: Image.Image) -> str:
+    """PIL 이미지를 PNG로 저장한 뒤 base64 문자열로"""
+    buf = io.BytesIO()
+    image.save(buf, format='PNG')
+    return base64.b64encode(buf.getvalue()).decode("utf-8")
+
+
+def image_digest(image: Image.Image) -> str:
+    """픽셀 내용 해시 (모드/크기 포함)"""
+    h = blake2b(digest_size=16)
+    h.update(f"{image.mode}:{image.size}".encode())
+    h.update(image.tobytes())
+    return h.hexdigest()
+
+
+class PayloadCache:
+    """크기 제한 LRU 캐시. 값은 base64 문자열이며 크기는 문자열 길이로 계산한다."""
+
+    def __init__(self, max_bytes: int = DEFAULT_PAYLOAD_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = collections.OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_or_create(self, key, build) -> str:
+        """key에 해당하는 페이로드, 없으면 build()로 만들어 저장"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return value
+            self.stats["misses"] += 1
+
+        # 인코딩은 잠금 밖에서 (같은 키가 동시에 만들어지면 나중 값으로 덮어씀)
+        value = build()
+        if not value:
+            return value
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = value
+            self._size += len(value)
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self.stats["evictions"] += 1
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    # ── 입력 종류별 ───────────────────────────────────────────────────
+
+    def encode_file(self, path: str, transform_name: str = "png", transform=None, params=()) -> str:
+        """이미지 파일을 (선택적으로 변환 후) base64 PNG로. 파일이 바뀌면 다시 인코딩"""
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"Image file not found: {path}")
+        stat = os.stat(path)
+        key = ("file", os.path.abspath(path), stat.st_mtime_ns, stat.st_size, transform_name, tuple(params))
+
+        def build():
+            with Image.open(path) as img:
+                img.load()
+                return encode_png_base64(transform(img) if transform is not None else img)
+
+        return self.get_or_create(key, build)
+
+    def encode_image(self, image: Image.Image, transform_name: str = "png", transform=None, params=()) -> str:
+        """메모리의 PIL 이미지를 (선택적으로 변환 후) base64 PNG로. 픽셀이 같으면 캐시 사용"""
+        key = ("image", image_digest(image), transform_name, tuple(params))
+
+        def build():
+            return encode_png_base64(transform(image) if transform is not None else image)
+
+        return self.get_or_create(key, build)
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> PayloadCache:
+    """프로세스 전체에서 공유하는 페이로드 캐시"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = PayloadCache()
+        return _default_cache
@@ -0,0 +1,239 @@
+"""
+prompt_template.py - 프롬프트 템플릿 컴파일러
+
+선택 구문(<a|b|c>), 루프카드(##name##, ##name*N##), 공유 와일드카드(__=name__),
+일반 와일드카드(__name__)를 한 번에 파싱하여 노드 트리로 만들고 원본 문자열 기준으로 캐시합니다.
+값 선택(랜덤/루프 인덱스/공유 캐시)은 렌더링하는 쪽(WildcardApplier)이 담당합니다.
+
+파싱 우선순위는 기존 문자열 치환 순서와 같습니다:
+    1. <a|b|c>   - 가장 안쪽 괄호부터 짝을 맞춤, 짝이 없는 <, > 는 문자 그대로
+    2. ##name##  - 문자열 전체에서 먼저 짝을 맞춤
+    3. __=name__ - 공유 와일드카드
+    4. __name__  - 일반 와일드카드
+"""
+
+import functools
+import random
+import re
+from dataclasses import dataclass
+from enum import Enum
+
+TEMPLATE_CACHE_SIZE = 4096
+
+_CHOICE_SYNTAX_RE = re.compile(r"[<>|]")
+
+
+class TokenKind(Enum):
+    LOOPCARD = "##"
+    SHARED = "__="
+    WILDCARD = "__"
+
+    @property
+    def open_delim(self) -> str:
+        return self.value
+
+    @property
+    def close_delim(self) -> str:
+        return "##" if self is TokenKind.LOOPCARD else "__"
+
+
+@dataclass(frozen=True)
+class Choice:
+    """<a|b|c> - 각 옵션은 노드 튜플"""
+    options: tuple
+
+
+@dataclass(frozen=True)
+class Token:
+    """와일드카드/루프카드 토큰.
+
+    inner가 문자열 하나뿐이면 컴파일 시점에 이름을 해석해 두고(name, repeat, pattern, fallback),
+    선택 구문이나 다른 토큰이 섞여 있으면 렌더링 시점에 inner를 먼저 그린 뒤 해석한다(is_static=False).
+    """
+    kind: TokenKind
+    inner: tuple
+    is_static: bool
+    name: str | None = None       # 조회할 와일드카드 키 (잘못된 반복 구문이면 None)
+    repeat: int = 1               # 루프카드 반복 횟수
+    pattern: str = ""             # 루프카드 사용 기록 키 (name 또는 name*N)
+    fallback: str = ""            # 적용할 수 없을 때 남길 원문 (기존과 같이 소문자로 정규화)
+
+
+@dataclass(frozen=True)
+class Template:
+    nodes: tuple
+    has_tokens: bool     # 와일드카드/루프카드 포함 여부 (없으면 와일드카드 로딩 불필요)
+    has_syntax: bool     # 선택 구문 또는 토큰 포함 여부 (없으면 원문 그대로)
+
+
+def interpret_token(kind: TokenKind, text: str) -> tuple:
+    """구분자 사이 문자열을 (name, repeat, pattern, fallback) 으로 해석"""
+    if kind is not TokenKind.LOOPCARD:
+        name = text.lower()
+        return name, 1, name, kind.open_delim + name + kind.close_delim
+
+    center = text.lower().strip()
+    fallback = "##" + center + "##"
+    name, repeat = center, 1
+    if '*' in center:
+        parts = center.split('*')
+        if len(parts) == 2 and parts[0] and parts[1]:
+            try:
+                repeat = int(parts[1])
+            except ValueError:
+                return None, 1, center, fallback
+            if repeat <= 0:
+                return None, 1, center, fallback
+            name = parts[0]
+    return name, repeat, center, fallback
+
+
+def _merge_text(items: list) -> list:
+    merged = []
+    for item in items:
+        if isinstance(item, str):
+            if not item:
+                continue
+            if merged and isinstance(merged[-1], str):
+                merged[-1] += item
+                continue
+        merged.append(item)
+    return merged
+
+
+def _parse_choices(source: str) -> list:
+    """<a|b> 구문을 스택으로 짝지어 [str | Choice] 목록으로 변환 (옵션 내부는 전체 파싱)"""
+    # 스택 프레임: 옵션 목록(각 옵션은 [str | Choice] 목록)
+    root = []
+    stack = []
+    pos = 0
+
+    def current() -> list:
+        return stack[-1][-1] if stack else root
+
+    for m in _CHOICE_SYNTAX_RE.finditer(source):
+        ch = m.group()
+        if ch == "|" and not stack:
+            continue
+        current().append(source[pos:m.start()])
+        pos = m.end()
+        if ch == "<":
+            stack.append([[]])
+        elif ch == "|":
+            stack[-1].append([])
+        elif stack:
+            options = stack.pop()
+            current().append(Choice(tuple(_parse_tokens(option) for option in options)))
+        else:
+            current().append(">")
+    current().append(source[pos:])
+
+    # 닫히지 않은 < 는 문자 그대로 되돌림
+    while stack:
+        options = stack.pop()
+        restored = ["<"]
+        for i, option in enumerate(options):
+            if i:
+                restored.append("|")
+            restored.extend(option)
+        current().extend(restored)
+
+    return _merge_text(root)
+
+
+def _pair_tokens(items: list, kind: TokenKind) -> list:
+    """문자열 조각에서 kind 구분자 쌍을 찾아 Token으로 묶는다. 다른 노드는 불투명하게 취급."""
+    open_delim, close_delim = kind.open_delim, kind.close_delim
+    out = []
+    inner = None
+    for item in items:
+        if not isinstance(item, str):
+            (out if inner is None else inner).append(item)
+            continue
+        pos = 0
+        while True:
+            if inner is None:
+                p = item.find(open_delim, pos)
+                if p == -1:
+                    out.append(item[pos:])
+                    break
+                out.append(item[pos:p])
+                inner = []
+                pos = p + len(open_delim)
+            else:
+                p = item.find(close_delim, pos)
+                if p == -1:
+                    inner.append(item[pos:])
+                    break
+                inner.append(item[pos:p])
+                out.append(_make_token(kind, inner))
+                inner = None
+                pos = p + len(close_delim)
+
+    # 닫는 구분자가 없으면 문자 그대로 둔다
+    if inner is not None:
+        out.append(open_delim)
+        out.extend(inner)
+    return _merge_text(out)
+
+
+def _make_token(kind: TokenKind, inner: list) -> Token:
+    inner = _merge_text(inner)
+    if kind is TokenKind.LOOPCARD:
+        # 루프카드 안의 __name__ 은 루프카드가 적용되지 않을 때도 치환되어야 함
+        inner = _pair_tokens(_pair_tokens(inner, TokenKind.SHARED), TokenKind.WILDCARD)
+
+    if all(isinstance(item, str) for item in inner):
+        name, repeat, pattern, fallback = interpret_token(kind, "".join(inner))
+        return Token(kind, tuple(inner), True, name, repeat, pattern, fallback)
+    return Token(kind, tuple(inner), False)
+
+
+def _parse_tokens(items: list) -> tuple:
+    for kind in (TokenKind.LOOPCARD, TokenKind.SHARED, TokenKind.WILDCARD):
+        items = _pair_tokens(items, kind)
+    return tuple(items)
+
+
+def _contains(nodes: tuple, node_type) -> bool:
+    for node in nodes:
+        if isinstance(node, node_type):
+            return True
+        if isinstance(node, Choice) and any(_contains(option, node_type) for option in node.options):
+            return True
+    return False
+
+
+@functools.lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def compile_template(source: str) -> Template:
+    """문자열을 파싱하여 Template 반환 (원본 문자열 기준 LRU 캐시)"""
+    if "<" not in source and "__" not in source and "##" not in source:
+        return Template((source,) if source else (), False, False)
+
+    nodes = _parse_tokens(_parse_choices(source))
+    has_tokens = _contains(nodes, Token)
+    has_syntax = has_tokens or _contains(nodes, Choice)
+    return Template(nodes, has_tokens, has_syntax)
+
+
+def pick_choice(choice: Choice) -> tuple:
+    return choice.options[random.randrange(0, len(choice.options))]
+
+
+def render_choices(nodes: tuple) -> str:
+    """선택 구문만 적용하고 토큰은 원문 그대로 남긴다"""
+    out = []
+    _render_choices_into(nodes, out)
+    return "".join(out)
+
+
+def _render_choices_into(nodes: tuple, out: list) -> None:
+    for node in nodes:
+        if isinstance(node, str):
+            out.append(node)
+        elif isinstance(node, Choice):
+            _render_choices_into(pick_choice(node), out)
+        else:
+            out.append(node.kind.open_delim)
+            _render_choices_into(node.inner, out)
+            out.append(node.kind.close_delim)
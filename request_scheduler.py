@@ -0,0 +1,285 @@
+"""
+request_scheduler.py - 이미지 생성 요청 스케줄러
+
+여러 스레드가 NAIGenerator.generate_image를 호출할 때 앞단에서
+동시 진행 요청 수(in-flight)와 요청 간격(토큰 버킷)을 조절합니다.
+
+서버 응답에 따라 AIMD 방식으로 스스로 조정합니다:
+    - 429: 동시 요청 한도를 절반으로 줄이고 (이미 1이면 요청 속도를 절반으로),
+           Retry-After 동안 새 요청을 멈춤
+    - 5xx, 시간 초과/연결 오류: 요청 속도를 줄임
+    - 성공이 한도만큼 이어지면: 한도 +1 (max_in_flight까지), 속도 증가.
+      429를 받았던 한도로 다시 올릴 때는 PROBE_STREAK_FACTOR배 더 오래 성공해야 함
+"""
+
+import collections
+import threading
+import time
+
+from nai_generator import action_for_parameters, STATUS_NO_RESPONSE
+
+from logger import get_logger
+logger = get_logger()
+
+DEFAULT_MIN_RATE = 0.05       # 최소 요청 속도 (요청/초)
+RATE_DECREASE_429 = 0.5
+RATE_DECREASE_5XX = 0.75
+RATE_INCREASE = 1.1
+EFFECTIVE_RATE_WINDOW = 60.0  # 실효 속도 계산 구간 (초)
+DEFAULT_MAX_ATTEMPTS = 5      # 429/5xx/연결 오류로 다시 줄을 서는 최대 횟수
+RETRY_BACKOFF = 3.0           # Retry-After가 없는 5xx/연결 오류 후 다시 줄을 서기 전 대기 (초, 시도마다 2배)
+DECREASE_COOLDOWN = 1.0       # 동시에 진행 중이던 요청들의 429로 여러 번 줄이지 않도록 하는 간격 (초)
+PROBE_STREAK_FACTOR = 10      # 429를 받았던 한도로 되돌아가기 전 필요한 연속 성공 배수
+
+
+class TokenBucket:
+    """초당 rate개씩 채워지는 토큰 버킷. rate가 None이면 제한 없음.
+
+    pause(seconds)로 지정 시각까지 토큰 발급을 멈출 수 있다 (Retry-After).
+    """
+
+    def __init__(self, rate: float | None = None, capacity: float = 1.0):
+        self._cond = threading.Condition()
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        if self.rate is not None:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def set_rate(self, rate: float | None) -> None:
+        with self._cond:
+            self._refill(time.monotonic())
+            self.rate = rate
+            self._cond.notify_all()
+
+    def pause(self, seconds: float) -> None:
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = min(self._tokens, 0.0)
+
+    def acquire(self, stop_event: threading.Event | None = None) -> bool:
+        """토큰 하나를 얻을 때까지 대기. stop_event가 설정되면 False 반환"""
+        with self._cond:
+            while True:
+                if stop_event is not None and stop_event.is_set():
+                    return False
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self.rate is None:
+                    return True
+                elif self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return True
+                else:
+                    wait = (1.0 - self._tokens) / self.rate
+                # stop_event 확인을 위해 최대 0.5초 단위로 깨어남
+                self._cond.wait(min(wait, 0.5))
+
+
+class RequestScheduler:
+    """generate_image 앞단의 동시 요청/속도 제한기.
+
+    각 호출 스레드는 자신의 NAIGenerator를 넘겨 generate()를 호출한다.
+    (NAIGenerator.parameters는 요청마다 바뀌므로 인스턴스를 스레드끼리 공유하지 않는다)
+
+    Args:
+        max_in_flight: 동시에 진행할 수 있는 최대 요청 수 (요금제가 허용하는 만큼)
+        rate: 초기 최대 요청 속도 (요청/초). None이면 429를 받기 전까지 제한 없음
+        max_rate: 속도 증가 상한 (None이면 상한 없음)
+    """
+
+    def __init__(self, max_in_flight: int = 1, rate: float | None = None,
+                 max_rate: float | None = None, min_rate: float = DEFAULT_MIN_RATE):
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.bucket = TokenBucket(rate, capacity=self.max_in_flight)
+
+        self._cond = threading.Condition()
+        self._limit = self.max_in_flight
+        self._ceiling = self.max_in_flight + 1  # 마지막으로 429를 받은 한도
+        self._in_flight = 0
+        self._waiting = 0
+        self._success_streak = 0
+        self._last_decrease = 0.0
+        self._completions = collections.deque()
+        self._counts = collections.Counter()
+        self._stop = threading.Event()
+        self._local = threading.local()  # 호출 스레드별 마지막 응답 상태
+
+    # ── 상태 ──────────────────────────────────────────────────────────
+
+    @property
+    def concurrency_limit(self) -> int:
+        return self._limit
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        """슬롯이나 토큰을 기다리는 요청 수"""
+        return self._waiting
+
+    @property
+    def effective_rate(self) -> float:
+        """최근 EFFECTIVE_RATE_WINDOW초 동안 성공한 요청 수 / 초"""
+        with self._cond:
+            self._trim_completions(time.monotonic())
+            if len(self._completions) < 2:
+                return 0.0
+            span = self._completions[-1] - self._completions[0]
+            return (len(self._completions) - 1) / span if span > 0 else 0.0
+
+    def get_stats(self) -> dict:
+        return {
+            "in_flight": self._in_flight,
+            "queue_depth": self._waiting,
+            "concurrency_limit": self._limit,
+            "rate": self.bucket.rate,
+            "effective_rate": self.effective_rate,
+            "responses": dict(self._counts),
+        }
+
+    def stop(self) -> None:
+        """대기 중인 요청을 모두 깨워 취소한다."""
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    # ── 요청 ──────────────────────────────────────────────────────────
+
+    def _trim_completions(self, now: float) -> None:
+        while self._completions and now - self._completions[0] > EFFECTIVE_RATE_WINDOW:
+            self._completions.popleft()
+
+    def _acquire_slot(self) -> bool:
+        with self._cond:
+            self._waiting += 1
+            try:
+                while self._in_flight >= self._limit:
+                    if self._stop.is_set():
+                        return False
+                    self._cond.wait(0.5)
+                if self._stop.is_set():
+                    return False
+                self._in_flight += 1
+                return True
+            finally:
+                self._waiting -= 1
+
+    def _release_slot(self) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def observe(self, status_code: int, retry_after: float | None = None) -> None:
+        """응답 상태에 따라 동시 요청 한도와 속도를 조정 (NAIGenerator.on_response_status)"""
+        self._local.last_status = status_code
+        self._local.last_retry_after = retry_after
+        now = time.monotonic()
+        with self._cond:
+            self._counts[status_code] += 1
+            if status_code in (200, 201):
+                self._completions.append(now)
+                self._trim_completions(now)
+                self._success_streak += 1
+                needed = self._limit
+                if self._limit + 1 >= self._ceiling:
+                    needed *= PROBE_STREAK_FACTOR
+                if self._success_streak >= needed:
+                    self._success_streak = 0
+                    if self._limit < self.max_in_flight:
+                        self._limit += 1
+                        logger.info(f"동시 요청 한도 증가: {self._limit}")
+                    self._adjust_rate(RATE_INCREASE)
+                    self._cond.notify_all()
+                return
+
+            if status_code not in (429, STATUS_NO_RESPONSE) and status_code < 500:
+                return
+            self._success_streak = 0
+            if now - self._last_decrease >= DECREASE_COOLDOWN:
+                self._last_decrease = now
+                if status_code == 429:
+                    # 동시 요청 수가 원인이면 한도만 줄이고, 한도가 1인데도 429면 속도를 줄임
+                    if self._limit > 1:
+                        self._ceiling = self._limit
+                        self._limit = max(1, self._limit // 2)
+                    else:
+                        self._adjust_rate(RATE_DECREASE_429)
+                    logger.warning(f"429 수신 - 동시 요청 한도 {self._limit}, 속도 {self.bucket.rate}")
+                else:
+                    self._adjust_rate(RATE_DECREASE_5XX)
+
+        if retry_after:
+            self.bucket.pause(retry_after)
+
+    def _adjust_rate(self, factor: float) -> None:
+        rate = self.bucket.rate
+        if rate is None:
+            if factor >= 1.0:
+                return
+            # 제한이 없던 상태에서 처음 줄일 때는 관측된 실효 속도를 기준으로 함
+            span = self._completions[-1] - self._completions[0] if len(self._completions) >= 2 else 0
+            observed = (len(self._completions) - 1) / span if span > 0 else 1.0
+            rate = observed
+        rate = max(self.min_rate, rate * factor)
+        if self.max_rate is not None:
+            rate = min(self.max_rate, rate)
+        self.bucket.set_rate(rate)
+
+    def generate(self, nai, action=None, max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        """슬롯과 토큰을 얻은 뒤 nai.generate_image를 호출한다.
+
+        429/5xx/시간 초과/연결 오류는 NAIGenerator 안에서 기다리거나 재시도하지 않고
+        슬롯을 반납한 뒤 줄어든 한도/속도로 다시 줄을 선다 (Retry-After 동안은 토큰이 발급되지 않음).
+        Retry-After가 없는 5xx/연결 오류는 슬롯 없이 RETRY_BACKOFF만큼 기다린 뒤 다시 줄을 선다.
+
+        Returns:
+            generate_image 반환값, 스케줄러가 중지되었으면 (None, 메시지)
+        """
+        nai.on_response_status = self.observe
+        nai.retry_rate_limited = False
+        nai.retry_transient_errors = False
+        action = action or action_for_parameters(nai.parameters)
+
+        result = None, "요청이 취소되었습니다."
+        attempts = max(1, max_attempts)
+        for attempt in range(attempts):
+            if not self._acquire_slot():
+                return None, "요청이 취소되었습니다."
+            try:
+                with self._cond:
+                    self._waiting += 1
+                try:
+                    if not self.bucket.acquire(self._stop):
+                        return None, "요청이 취소되었습니다."
+                finally:
+                    with self._cond:
+                        self._waiting -= 1
+
+                self._local.last_status = None
+                self._local.last_retry_after = None
+                result = nai.generate_image(action)
+            finally:
+                self._release_slot()
+
+            status = self._local.last_status
+            retryable = status is not None and (status in (429, STATUS_NO_RESPONSE) or status >= 500)
+            if not retryable or attempt == attempts - 1:
+                break
+            if status != 429 and not self._local.last_retry_after:
+                delay = RETRY_BACKOFF * (2 ** attempt)
+                logger.warning(f"요청 실패({status or '응답 없음'}) - {delay:.0f}초 후 다시 요청")
+                if self._stop.wait(delay):
+                    return None, "요청이 취소되었습니다."
+        return result
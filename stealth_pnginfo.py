@@ -1,13 +1,97 @@
 from PIL import Image
 import gzip
 
+import numpy as np
+
 from logger import get_logger
 
 logger = get_logger()
 
+SIG_BITS = len('stealth_pnginfo') * 8   # 시그니처 120비트
+LEN_BITS = 32                           # 페이로드 길이 필드
+ALPHA_SIGNATURES = {b'stealth_pnginfo': False, b'stealth_pngcomp': True}  # 시그니처: 압축 여부
+RGB_SIGNATURES = {b'stealth_rgbinfo': False, b'stealth_rgbcomp': True}
+
 
-# from https://github.com/neggles/sd-webui-stealth-pnginfo/
 def read_info_from_image_stealth(image):
+    """이미지 LSB에 숨겨진 stealth pnginfo를 읽는다 (없으면 None).
+
+    픽셀을 열 우선(x 바깥, y 안쪽) 순서로 읽으며, RGB/RGBA 이미지는 NumPy로
+    필요한 열만 잘라 LSB 평면을 한 번에 추출한다. 결과는 픽셀 단위 구현과 동일하다.
+    """
+    if image.mode not in ('RGBA', 'RGB'):
+        return _read_info_from_image_stealth_pixelwise(image)
+
+    width, height = image.size
+    n_pixels = width * height
+    has_alpha = image.mode == 'RGBA'
+
+    # 기존 구현과 같이 RGB 시그니처(40픽셀)를 먼저, 그 다음 알파 시그니처(120픽셀)를 확인
+    mode = compressed = None
+    if n_pixels >= SIG_BITS // 3:
+        rgb_sig = np.packbits(_lsb_bits(image, slice(0, 3), SIG_BITS // 3)).tobytes()
+        if rgb_sig in RGB_SIGNATURES:
+            mode, compressed = 'rgb', RGB_SIGNATURES[rgb_sig]
+    if mode is None and has_alpha and n_pixels >= SIG_BITS:
+        alpha_sig = np.packbits(_lsb_bits(image, slice(3, 4), SIG_BITS)).tobytes()
+        if alpha_sig in ALPHA_SIGNATURES:
+            mode, compressed = 'alpha', ALPHA_SIGNATURES[alpha_sig]
+    if mode is None:
+        return None
+
+    header_bits = SIG_BITS + LEN_BITS
+    if mode == 'alpha':
+        channels, bits_per_pixel = slice(3, 4), 1
+        # 길이 필드를 다 읽은 뒤 페이로드 픽셀이 최소 1개 필요
+        available = n_pixels - header_bits
+    else:
+        channels, bits_per_pixel = slice(0, 3), 3
+        # 길이 필드는 11픽셀(33비트)에 걸쳐 있고, 그 다음 픽셀부터 길이 비교가 시작됨
+        available = 3 * n_pixels - header_bits if n_pixels > (header_bits + 1 + 2) // 3 else 0
+    if available <= 0:
+        return None
+
+    len_pixels = -(-header_bits // bits_per_pixel)
+    bits = _lsb_bits(image, channels, len_pixels)
+    param_len = int.from_bytes(np.packbits(bits[SIG_BITS:header_bits]).tobytes(), 'big')
+    if param_len <= 0 or param_len > available:
+        return None
+
+    total_bits = header_bits + param_len
+    bits = _lsb_bits(image, channels, -(-total_bits // bits_per_pixel))[header_bits:total_bits]
+    byte_data = _bits_to_bytes(bits)
+
+    try:
+        if compressed:
+            return gzip.decompress(byte_data).decode('utf-8')
+        return byte_data.decode('utf-8', errors='ignore')
+    except Exception as e:
+        logger.error(f"Error decoding stealth PNG info: {e}")
+        return None
+
+
+def _lsb_bits(image, channels: slice, n_pixels: int) -> np.ndarray:
+    """열 우선 순서로 앞의 n_pixels 픽셀에서 지정 채널의 LSB를 이어붙인 비트 배열"""
+    height = image.size[1]
+    cols = min(image.size[0], -(-n_pixels // height))
+    arr = np.asarray(image.crop((0, 0, cols, height)))
+    # (h, w, c) -> (w, h, c): x 바깥, y 안쪽 순서로 펼침
+    arr = arr.transpose(1, 0, 2).reshape(-1, arr.shape[2])[:n_pixels, channels]
+    return (arr & 1).reshape(-1)
+
+
+def _bits_to_bytes(bits: np.ndarray) -> bytes:
+    """8비트씩 묶어 바이트로 변환. 마지막 8비트 미만 조각은 기존 구현처럼 int(조각, 2) 값."""
+    full = len(bits) - len(bits) % 8
+    data = np.packbits(bits[:full]).tobytes()
+    rest = bits[full:]
+    if len(rest):
+        data += bytes([int(np.packbits(rest)[0]) >> (8 - len(rest))])
+    return data
+
+
+# from https://github.com/neggles/sd-webui-stealth-pnginfo/
+def _read_info_from_image_stealth_pixelwise(image):
     # trying to read stealth pnginfo
     width, height = image.size
     pixels = image.load()
@@ -0,0 +1,202 @@
+"""
+tag_cache.py - 태그 사전 바이너리 캐시
+
+danbooru_tags_post_count.csv를 매번 줄 단위로 파싱/정렬/포맷하고 자동 완성 인덱스를
+다시 만들지 않도록, 결과를 버전이 있는 바이너리 파일 하나로 저장합니다.
+원본 CSV의 크기/mtime이 같으면 파일을 한 번 읽어 그대로 사용하고,
+mtime만 바뀐 경우 SHA-1로 내용을 비교한 뒤에만 다시 파싱합니다.
+
+파일 형식 (리틀 엔디언):
+    헤더 : magic(8) version(u32) reserved(u32) src_size(i64) src_mtime_ns(i64)
+           count(u64) gram_count(u64) posting_count(u64) display_bytes(u64) src_sha1(20)
+    본문 : post_count(i64) * count             - 게시물수 내림차순
+           sorted_rank(u32) * count            - 태그명 정렬 순서 (접두사 검색)
+           gram_offset(u32) * (gram_count + 1) - n-gram별 posting 구간
+           posting(u32) * posting_count        - n-gram 역색인 (포함 검색)
+           표시 문자열("태그명[게시물수]")을 "\\n"으로 이은 UTF-8 블록 (display_bytes)
+           n-gram을 "\\n"으로 이은 UTF-8 블록
+"""
+
+import hashlib
+import os
+import struct
+import sys
+from array import array
+
+from completer import parse_tag_line, format_tag_display, TagData, TagIndex
+from consts import DEFAULT_CACHE_PATH
+from image_saver import write_atomic
+
+from logger import get_logger
+logger = get_logger()
+
+CACHE_MAGIC = b"NAITAGS\x00"
+CACHE_VERSION = 1
+_HEADER = struct.Struct("<8sIIqqQQQQ20s")
+
+
+class TagDictionary:
+    """게시물수 내림차순으로 정렬된 태그 목록과 자동 완성 인덱스.
+
+    display는 자동 완성에 쓰이는 "태그명[게시물수]" 문자열 목록이며,
+    names/tags는 다른 소비자를 위해 필요할 때 만든다.
+    """
+
+    def __init__(self, display: list, post_counts: array, tag_index: TagIndex | None = None):
+        self.display = display
+        self.post_counts = post_counts
+        self.tag_index = tag_index if tag_index is not None else TagIndex(display)
+
+    def __len__(self) -> int:
+        return len(self.display)
+
+    @property
+    def names(self) -> list:
+        # 태그명에는 '['가 올 수 없음 (parse_tag_line에서 거부)
+        return [d.split('[', 1)[0] for d in self.display]
+
+    def tags(self) -> list:
+        return [TagData(name=name, post_count=count) for name, count in zip(self.names, self.post_counts)]
+
+
+def get_cache_path(csv_path: str, cache_dir: str = DEFAULT_CACHE_PATH) -> str:
+    """CSV 절대 경로별로 구분되는 캐시 파일 경로"""
+    key = hashlib.sha1(os.path.abspath(csv_path).encode("utf8")).hexdigest()[:12]
+    return os.path.join(cache_dir, f"tags_{key}.bin")
+
+
+def _file_sha1(path: str) -> bytes:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.digest()
+
+
+def parse_tag_csv(csv_path: str) -> TagDictionary:
+    """CSV를 파싱하여 게시물수 내림차순 TagDictionary 생성"""
+    tags = []
+    with open(csv_path, "r", encoding="utf8") as f:
+        for line in f:
+            parsed = parse_tag_line(line)
+            if parsed is not None:
+                tags.append(parsed)
+    tags.sort(key=lambda t: t.post_count, reverse=True)
+    return TagDictionary([format_tag_display(t) for t in tags],
+                         array('q', (t.post_count for t in tags)))
+
+
+def _take_array(data: bytes, offset: int, typecode: str, length: int) -> tuple:
+    arr = array(typecode)
+    end = offset + length * arr.itemsize
+    if len(data) < end:
+        raise ValueError("캐시 파일이 잘려 있음")
+    arr.frombytes(data[offset:end])
+    if sys.byteorder != "little":
+        arr.byteswap()
+    return arr, end
+
+
+def _validate_index_arrays(count: int, sorted_ranks, offsets, postings) -> None:
+    """길이는 맞지만 내용이 손상된 캐시를 거름 (범위를 벗어난 순위/구간). 문제가 있으면 ValueError"""
+    if count and max(sorted_ranks) >= count:
+        raise ValueError("태그 정렬 순위가 범위를 벗어남")
+    if offsets[0] != 0 or offsets[-1] != len(postings):
+        raise ValueError("n-gram 구간이 posting 범위와 맞지 않음")
+    if any(a > b for a, b in zip(offsets, offsets[1:])):
+        raise ValueError("n-gram 구간이 감소함")
+    if postings and max(postings) >= count:
+        raise ValueError("n-gram posting이 범위를 벗어남")
+
+
+def _read_cache(cache_path: str):
+    """(헤더 튜플, TagDictionary) 반환. 형식/버전이 맞지 않으면 None"""
+    with open(cache_path, "rb") as f:
+        data = f.read()
+    if len(data) < _HEADER.size:
+        return None
+
+    header = _HEADER.unpack_from(data, 0)
+    magic, version, _, _, _, count, gram_count, posting_count, display_bytes, _ = header
+    if magic != CACHE_MAGIC or version != CACHE_VERSION:
+        return None
+
+    pos = _HEADER.size
+    post_counts, pos = _take_array(data, pos, 'q', count)
+    sorted_ranks, pos = _take_array(data, pos, 'I', count)
+    offsets, pos = _take_array(data, pos, 'I', gram_count + 1)
+    postings, pos = _take_array(data, pos, 'I', posting_count)
+
+    display = data[pos:pos + display_bytes].decode("utf8").split("\n") if count else []
+    grams = data[pos + display_bytes:].decode("utf8").split("\n") if gram_count else []
+    if len(display) != count or len(grams) != gram_count:
+        return None
+    _validate_index_arrays(count, sorted_ranks, offsets, postings)
+
+    tag_index = TagIndex.from_arrays(display, sorted_ranks, grams, offsets, postings)
+    return header, TagDictionary(display, post_counts, tag_index)
+
+
+def _write_cache(cache_path: str, tag_dict: TagDictionary, src_stat, src_sha1: bytes) -> None:
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    sorted_ranks, grams, offsets, postings = tag_dict.tag_index.to_arrays()
+    post_counts = array('q', tag_dict.post_counts)
+    display_blob = "\n".join(tag_dict.display).encode("utf8")
+    gram_blob = "\n".join(grams).encode("utf8")
+
+    header = _HEADER.pack(CACHE_MAGIC, CACHE_VERSION, 0, src_stat.st_size, src_stat.st_mtime_ns,
+                          len(tag_dict), len(grams), len(postings), len(display_blob), src_sha1)
+
+    def write(f):
+        f.write(header)
+        for arr in (post_counts, sorted_ranks, offsets, postings):
+            if sys.byteorder != "little":
+                arr.byteswap()
+            f.write(arr.tobytes())
+        f.write(display_blob)
+        f.write(gram_blob)
+
+    write_atomic(cache_path, write)
+
+
+def load_tag_dictionary(csv_path: str, cache_dir: str = DEFAULT_CACHE_PATH) -> TagDictionary:
+    """캐시가 유효하면 캐시에서, 아니면 CSV를 파싱하고 캐시를 갱신한다.
+
+    캐시 읽기/쓰기 실패는 경고만 남기고 CSV 파싱 결과를 그대로 사용한다.
+    손상된 캐시는 어떤 오류든 무시하고 다시 파싱한 결과로 덮어쓴다.
+    """
+    src_stat = os.stat(csv_path)
+    cache_path = get_cache_path(csv_path, cache_dir)
+
+    cached = None
+    if os.path.exists(cache_path):
+        try:
+            cached = _read_cache(cache_path)
+        except Exception as e:
+            logger.warning(f"태그 캐시 읽기 실패, CSV를 다시 파싱함 ({cache_path}): {e!r}")
+
+    src_sha1 = None
+    if cached is not None:
+        header, tag_dict = cached
+        size, mtime_ns, cached_sha1 = header[3], header[4], header[-1]
+        if size == src_stat.st_size and mtime_ns == src_stat.st_mtime_ns:
+            logger.debug(f"태그 캐시 사용: {cache_path} ({len(tag_dict)}개)")
+            return tag_dict
+
+        # mtime만 바뀐 경우 (복사/압축 해제 등) 내용이 같으면 헤더만 갱신
+        src_sha1 = _file_sha1(csv_path)
+        if size == src_stat.st_size and src_sha1 == cached_sha1:
+            logger.debug(f"태그 CSV 내용 동일 - 캐시 재사용: {cache_path}")
+            try:
+                _write_cache(cache_path, tag_dict, src_stat, src_sha1)
+            except OSError as e:
+                logger.warning(f"태그 캐시 갱신 실패 ({cache_path}): {e}")
+            return tag_dict
+
+    tag_dict = parse_tag_csv(csv_path)
+    logger.info(f"태그 CSV 파싱: {csv_path} ({len(tag_dict)}개)")
+    try:
+        _write_cache(cache_path, tag_dict, src_stat, src_sha1 or _file_sha1(csv_path))
+    except OSError as e:
+        logger.warning(f"태그 캐시 저장 실패 ({cache_path}): {e}")
+    return tag_dict
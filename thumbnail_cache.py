@@ -0,0 +1,233 @@
+"""
+thumbnail_cache.py - 미리보기 썸네일 캐시
+
+img2img / Vibe / Enhance / 캐릭터 참조 미리보기는 원본 전체를 디코딩한 뒤 축소하고
+PNG로 다시 인코딩해 QPixmap으로 읽었습니다. 폴더 배치 모드에서는 proceed_image_batch마다 반복됩니다.
+
+ThumbnailCache는
+    - 메모리 LRU (QImage)
+    - 디스크 캐시 (DEFAULT_CACHE_PATH/thumbnails, 작은 PNG)
+두 단계로 썸네일을 보관하고, 없을 때만 백그라운드 스레드에서 디코딩합니다.
+JPEG는 draft 모드로 필요한 해상도에 가깝게 축소 디코딩합니다.
+
+키: (절대 경로, mtime_ns, 파일 크기, 최대 너비, 최대 높이)
+QPixmap은 GUI 스레드에서만 만들 수 있으므로 스레드 사이에서는 QImage로 주고받습니다.
+"""
+
+import collections
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import blake2b
+
+from PIL import Image
+from PyQt5.QtCore import QObject, pyqtSignal
+from PyQt5.QtGui import QImage, QPixmap
+
+from consts import DEFAULT_CACHE_PATH
+
+from logger import get_logger
+logger = get_logger()
+
+PREVIEW_THUMBNAIL_SIZE = (164, 198)   # img2img/Enhance/캐릭터 참조 라벨
+DEFAULT_MEMORY_ITEMS = 256
+DEFAULT_DISK_FILES = 2000
+THUMBNAIL_DIRNAME = "thumbnails"
+
+
+def make_thumbnail(image: Image.Image, size: tuple) -> Image.Image:
+    """종횡비를 유지하며 size 안에 맞춘 RGB/RGBA 썸네일 (원본은 바꾸지 않음)"""
+    thumb = image.copy()
+    thumb.thumbnail(size, Image.LANCZOS)
+    if thumb.mode not in ("RGB", "RGBA"):
+        thumb = thumb.convert("RGBA" if "A" in thumb.getbands() or "transparency" in thumb.info else "RGB")
+    return thumb
+
+
+def decode_thumbnail(path: str, size: tuple) -> Image.Image:
+    """파일에서 썸네일 디코딩. JPEG는 draft로 축소 디코딩 후 LANCZOS"""
+    with Image.open(path) as img:
+        if img.format == "JPEG":
+            img.draft("RGB", size)
+        img.load()
+        return make_thumbnail(img, size)
+
+
+def pil_to_qimage(image: Image.Image) -> QImage:
+    """PIL 이미지를 QImage로 (PNG 왕복 없이 픽셀 복사)"""
+    w, h = image.size
+    if image.mode == "RGB":
+        return QImage(image.tobytes(), w, h, w * 3, QImage.Format_RGB888).copy()
+    if image.mode != "RGBA":
+        image = image.convert("RGBA")
+    return QImage(image.tobytes(), w, h, w * 4, QImage.Format_RGBA8888).copy()
+
+
+def thumbnail_pixmap_from_image(image: Image.Image, size: tuple = PREVIEW_THUMBNAIL_SIZE) -> QPixmap:
+    """메모리의 PIL 이미지로 썸네일 QPixmap 생성 (GUI 스레드)"""
+    return QPixmap.fromImage(pil_to_qimage(make_thumbnail(image, size)))
+
+
+class ThumbnailCache(QObject):
+    """메모리 LRU + 디스크 썸네일 캐시. 반드시 GUI 스레드에서 생성한다.
+
+    request()의 콜백은 GUI 스레드에서 QPixmap과 함께 호출된다 (시그널 큐 연결).
+    """
+
+    _decoded = pyqtSignal(object, object, object)   # (key, QImage 또는 None, 콜백 목록)
+
+    def __init__(self, cache_dir: str | None = None, max_items: int = DEFAULT_MEMORY_ITEMS,
+                 max_disk_files: int = DEFAULT_DISK_FILES, workers: int = 2):
+        super().__init__()
+        self.cache_dir = cache_dir or os.path.join(DEFAULT_CACHE_PATH, THUMBNAIL_DIRNAME)
+        self.max_items = max_items
+        self.max_disk_files = max_disk_files
+        self._entries = collections.OrderedDict()
+        self._pending = {}      # key -> 콜백 목록 (같은 썸네일 요청은 디코딩 한 번)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnail")
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "decodes": 0, "errors": 0}
+        self._decoded.connect(self._on_decoded)
+        self._executor.submit(self._prune_disk)
+
+    # ── 키 / 저장소 ──────────────────────────────────────────────────
+
+    @staticmethod
+    def make_key(path: str, size: tuple) -> tuple:
+        stat = os.stat(path)
+        return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, int(size[0]), int(size[1]))
+
+    def _disk_path(self, key: tuple) -> str:
+        digest = blake2b(repr(key).encode("utf-8"), digest_size=16).hexdigest()
+        return os.path.join(self.cache_dir, digest + ".png")
+
+    def _memory_get(self, key):
+        with self._lock:
+            qimage = self._entries.get(key)
+            if qimage is not None:
+                self._entries.move_to_end(key)
+                self.stats["memory_hits"] += 1
+            return qimage
+
+    def _count(self, name: str) -> None:
+        """통계 증가 (GUI 스레드와 작업 스레드가 함께 갱신하므로 잠금 안에서)"""
+        with self._lock:
+            self.stats[name] += 1
+
+    def _memory_put(self, key, qimage: QImage) -> None:
+        with self._lock:
+            self._entries[key] = qimage
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+
+    def _load(self, key: tuple, path: str, size: tuple) -> QImage:
+        """디스크 캐시 또는 원본 디코딩으로 QImage 생성 (작업 스레드에서도 호출 가능)"""
+        disk_path = self._disk_path(key)
+        if os.path.isfile(disk_path):
+            qimage = QImage(disk_path)
+            if not qimage.isNull():
+                self._count("disk_hits")
+                return qimage
+
+        thumb = decode_thumbnail(path, size)
+        self._count("decodes")
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{disk_path}.{threading.get_ident()}.tmp"
+            thumb.save(tmp_path, format="PNG")
+            os.replace(tmp_path, disk_path)
+        except OSError as e:
+            logger.debug(f"썸네일 디스크 캐시 저장 실패: {e}")
+        return pil_to_qimage(thumb)
+
+    # ── 공개 API ──────────────────────────────────────────────────────
+
+    def get_pixmap(self, path: str, size: tuple = PREVIEW_THUMBNAIL_SIZE) -> QPixmap:
+        """동기 조회 (GUI 스레드). 캐시에 없으면 바로 디코딩한다."""
+        key = self.make_key(path, size)
+        qimage = self._memory_get(key)
+        if qimage is None:
+            qimage = self._load(key, path, size)
+            self._memory_put(key, qimage)
+        return QPixmap.fromImage(qimage)
+
+    def request(self, path: str, callback, size: tuple = PREVIEW_THUMBNAIL_SIZE) -> bool:
+        """비동기 조회. callback(QPixmap 또는 None)은 GUI 스레드에서 호출된다.
+
+        메모리 캐시에 있으면 즉시 콜백하고 True, 아니면 작업 스레드에 맡기고 False.
+        """
+        try:
+            key = self.make_key(path, size)
+        except OSError as e:
+            logger.error(f"썸네일 대상 파일 오류: {e}")
+            callback(None)
+            return True
+
+        qimage = self._memory_get(key)
+        if qimage is not None:
+            callback(QPixmap.fromImage(qimage))
+            return True
+
+        with self._lock:
+            waiting = self._pending.get(key)
+            if waiting is not None:
+                waiting.append(callback)
+                return False
+            self._pending[key] = [callback]
+        self._executor.submit(self._decode_job, key, path, size)
+        return False
+
+    def _decode_job(self, key, path, size) -> None:
+        try:
+            qimage = self._load(key, path, size)
+        except Exception as e:
+            self._count("errors")
+            logger.error(f"썸네일 생성 실패 ({path}): {e}")
+            qimage = None
+        if qimage is not None:
+            self._memory_put(key, qimage)
+        with self._lock:
+            callbacks = self._pending.pop(key, [])
+        self._decoded.emit(key, qimage, callbacks)
+
+    def _on_decoded(self, key, qimage, callbacks) -> None:
+        pixmap = QPixmap.fromImage(qimage) if qimage is not None else None
+        for callback in callbacks:
+            try:
+                callback(pixmap)
+            except Exception as e:
+                logger.error(f"썸네일 콜백 오류: {e}")
+
+    def clear_memory(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _prune_disk(self) -> None:
+        """디스크 캐시 파일이 max_disk_files를 넘으면 오래된 것부터 삭제"""
+        try:
+            entries = [e for e in os.scandir(self.cache_dir) if e.is_file()]
+        except OSError:
+            return
+        if len(entries) <= self.max_disk_files:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_disk_files]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_default_cache = None
+
+
+def get_default_cache() -> ThumbnailCache:
+    """프로세스 전체에서 공유하는 썸네일 캐시 (GUI 스레드에서 처음 호출)"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ThumbnailCache()
+    return _default_cache
@@ -1,17 +1,25 @@
 import os
+import time
 import random
+import threading
 from enum import Enum
 
 from logger import get_logger
+from prompt_template import Choice, Token, TokenKind, compile_template, interpret_token, pick_choice
 
 logger = get_logger()
 
 MAX_TRY_AMOUNT = 10
 
+# 적용 시 폴더 재탐색 최소 간격 (초) - 그 사이 호출은 캐시된 인덱스 사용
+DEFAULT_REFRESH_INTERVAL = 2.0
+# start_watcher() 폴링 간격 (초)
+DEFAULT_WATCH_INTERVAL = 2.0
+
 
 
 class WildcardApplier():
-    def __init__(self, src_wildcards_folder):
+    def __init__(self, src_wildcards_folder, refresh_interval: float = DEFAULT_REFRESH_INTERVAL):
         self.src_wildcards_folder = src_wildcards_folder
         self._wildcards_dict = {}
         # 루프카드 인덱스 관리 딕셔너리 추가
@@ -23,23 +31,95 @@ class WildcardApplier():
         # 공유 랜덤 와일드카드 캐시 - 같은 생성 사이클 내에서 동일한 값 반환
         # Shared random wildcard cache - returns same value within a generation cycle
         self._shared_random_cache = {}
-        
+
+        # 증분 인덱스 - {파일 경로: ((mtime_ns, size), key, lines)}
+        # 변경된 파일만 다시 읽고, refresh_interval 안에서는 폴더를 다시 훑지 않음
+        self.refresh_interval = refresh_interval
+        self._file_index = {}
+        self._last_scan_time = None
+        self._index_lock = threading.RLock()
+        self._watcher_thread = None
+        self._watcher_stop = threading.Event()
+        self._stats = {"hits": 0, "scans": 0, "reloads": 0, "removed": 0}
+
     def set_src(self, src: str) -> None:
         # Windows에서는 백슬래시 사용하도록 정규화
         if os.name == 'nt':
             src = os.path.normpath(src)
-        self.src_wildcards_folder = src
+        if src != self.src_wildcards_folder:
+            self.src_wildcards_folder = src
+            self.invalidate()
 
     def load_wildcards(self) -> None:
-        self._wildcards_dict.clear()
-        
+        """와일드카드 폴더를 다시 훑어 인덱스를 갱신 (변경된 파일만 다시 읽음)"""
+        with self._index_lock:
+            self._scan_wildcards()
+
+    def invalidate(self, path: str | None = None) -> None:
+        """캐시 무효화. path가 주어지면 해당 파일만, 아니면 전체를 다음 적용 시 다시 읽는다."""
+        with self._index_lock:
+            if path is None:
+                self._file_index.clear()
+            else:
+                self._file_index.pop(path, None)
+            self._last_scan_time = None
+
+    def get_stats(self) -> dict:
+        """캐시 적중/재로딩 통계"""
+        with self._index_lock:
+            stats = dict(self._stats)
+            stats["files"] = len(self._file_index)
+            stats["wildcards"] = len(self._wildcards_dict)
+        return stats
+
+    def start_watcher(self, interval: float = DEFAULT_WATCH_INTERVAL) -> None:
+        """백그라운드 폴링으로 폴더 변경을 반영. 실행 중에는 적용 시 폴더를 훑지 않는다."""
+        if self._watcher_thread and self._watcher_thread.is_alive():
+            return
+        self._watcher_stop.clear()
+        self._watcher_thread = threading.Thread(
+            target=self._watch_loop, args=(interval,), name="wildcard-watcher", daemon=True)
+        self._watcher_thread.start()
+
+    def stop_watcher(self) -> None:
+        self._watcher_stop.set()
+        if self._watcher_thread:
+            self._watcher_thread.join(timeout=5)
+        self._watcher_thread = None
+
+    def _watch_loop(self, interval: float) -> None:
+        while not self._watcher_stop.is_set():
+            try:
+                self.load_wildcards()
+            except Exception as e:
+                logger.error(f"Wildcard watcher error: {e}")
+            self._watcher_stop.wait(interval)
+
+    def _ensure_loaded(self) -> None:
+        """적용 직전 호출 - 인덱스가 오래되었을 때만 폴더를 다시 훑는다"""
+        with self._index_lock:
+            watching = self._watcher_thread is not None and self._watcher_thread.is_alive()
+            is_fresh = self._last_scan_time is not None and (
+                watching or time.monotonic() - self._last_scan_time < self.refresh_interval)
+            if is_fresh:
+                self._stats["hits"] += 1
+                return
+            self._scan_wildcards()
+
+    def _scan_wildcards(self) -> None:
+        self._stats["scans"] += 1
+        self._last_scan_time = time.monotonic()
+
         # 와일드카드 폴더가 존재하는지 확인
         if not os.path.exists(self.src_wildcards_folder):
             logger.warning(f"Wildcards folder not found: {self.src_wildcards_folder}")
+            self._file_index.clear()
+            self._wildcards_dict = {}
             return
-        
-        wildcard_count = 0
-        
+
+        seen_srcs = []
+        reloaded = 0
+
         try:
             for dirpath, dname_list, fname_list in os.walk(self.src_wildcards_folder):
                 path = ""  # path for wildcards
@@ -58,24 +138,55 @@ class WildcardApplier():
                     if filename.endswith(".txt"):
                         src = os.path.join(dirpath, filename)
                         try:
-                            with open(src, "r", encoding="utf8") as f:
-                                lines = f.readlines()
-                                if lines:
-                                    onlyname = os.path.splitext(
-                                        os.path.basename(filename))[0]
-                                    key = path + onlyname
-                                    # 빈 줄과 주석 제거
-                                    valid_lines = [line.strip() for line in lines if line.strip() and not line.strip().startswith('#')]
-                                    if valid_lines:
-                                        self._wildcards_dict[key.lower()] = valid_lines
-                                        wildcard_count += 1
-                        except Exception as e:
+                            st = os.stat(src)
+                        except OSError as e:
                             logger.error(f"Error loading wildcard file {src}: {e}")
-
-            logger.info(f"Loaded {wildcard_count} wildcards from {self.src_wildcards_folder}")
+                            continue
+
+                        signature = (st.st_mtime_ns, st.st_size)
+                        entry = self._file_index.get(src)
+                        if entry is None or entry[0] != signature:
+                            onlyname = os.path.splitext(
+                                os.path.basename(filename))[0]
+                            key = path + onlyname
+                            self._file_index[src] = (signature, key.lower(), self._read_wildcard_file(src))
+                            reloaded += 1
+                        seen_srcs.append(src)
 
         except Exception as e:
             logger.error(f"Error loading wildcards: {e}")
+            return
+
+        removed = self._file_index.keys() - set(seen_srcs)
+        for src in removed:
+            del self._file_index[src]
+
+        self._stats["reloads"] += reloaded
+        self._stats["removed"] += len(removed)
+        if not reloaded and not removed:
+            return
+
+        # 폴더 순회 순서대로 재구성 (같은 키는 뒤쪽 파일이 우선 - 기존 동작과 동일)
+        wildcards_dict = {}
+        for src in seen_srcs:
+            _, key, lines = self._file_index[src]
+            if lines:
+                wildcards_dict[key] = lines
+        self._wildcards_dict = wildcards_dict
+
+        logger.info(f"Loaded {len(wildcards_dict)} wildcards from {self.src_wildcards_folder} "
+                    f"(reloaded {reloaded}, removed {len(removed)})")
+
+    @staticmethod
+    def _read_wildcard_file(src: str) -> list:
+        try:
+            with open(src, "r", encoding="utf8") as f:
+                lines = f.readlines()
+            # 빈 줄과 주석 제거
+            return [line.strip() for line in lines if line.strip() and not line.strip().startswith('#')]
+        except Exception as e:
+            logger.error(f"Error loading wildcard file {src}: {e}")
+            return []
 
     def create_index_snapshot(self) -> None:
         """현재 루프카드 인덱스의 스냅샷 생성 및 공유 랜덤 캐시 초기화
@@ -86,45 +197,23 @@ class WildcardApplier():
         # Clear shared random cache for each new generation cycle
         self._shared_random_cache = {}
 
+    def get_loopcard_state(self) -> dict:
+        """루프카드 진행 상태 (JSON 직렬화 가능) - 자동 생성 작업 큐에 기록"""
+        return {
+            "indices": dict(self._loopcard_indices),
+            "repeat_counters": {k: dict(v) for k, v in self._repeat_counters.items()},
+        }
+
+    def set_loopcard_state(self, state: dict) -> None:
+        """get_loopcard_state()로 기록한 진행 상태 복원"""
+        self._loopcard_indices = dict(state.get("indices", {}))
+        self._repeat_counters = {k: dict(v) for k, v in state.get("repeat_counters", {}).items()}
+
     def apply_wildcards_with_snapshot(self, target_str: str) -> str:
         """스냅샷된 인덱스를 사용하여 와일드카드 적용 (인덱스 증가 안함)
         Apply wildcards using snapshot indices (no index advancement)"""
-        self.load_wildcards()
-        result = target_str
-
-        # 루프카드 적용 (스냅샷 사용)
-        index = 0
-        except_list = []
-        while True:
-            result, applied_list = self._apply_loopcard_once_with_snapshot(result, except_list)
-            except_list.extend(applied_list)
-            if len(applied_list) == 0 or index > MAX_TRY_AMOUNT:
-                break
-            index += 1
-
-        # 공유 랜덤 와일드카드 적용 (__=wildcard__ 형식)
-        # Apply shared random wildcards first (__=wildcard__ syntax)
-        index = 0
-        except_list = []
-        while True:
-            result, applied_list = self._apply_shared_wildcard_once(result, except_list)
-            except_list.extend(applied_list)
-            if len(applied_list) == 0 or index > MAX_TRY_AMOUNT:
-                break
-            index += 1
-
-        # 일반 와일드카드 적용
-        index = 0
-        except_list = []
-        while True:
-            result, applied_list = self._apply_wildcard_once(result, except_list)
-            except_list.extend(applied_list)
-            if len(applied_list) == 0 or index > MAX_TRY_AMOUNT:
-                break
-            index += 1
-
-        return result
-   
+        return self._apply_template(target_str, use_snapshot=True)
+
     def advance_loopcard_indices(self) -> None:
         """사용된 루프카드 인덱스만 다음으로 진행 (반복 카운터 고려)"""
         for key_data in list(self._used_keys):  # 실제 사용된 키만
@@ -169,315 +258,100 @@ class WildcardApplier():
         # 사용된 키 리셋
         self._used_keys.clear()
 
-    def _apply_shared_wildcard_once(self, target_str: str, except_list: list | None = None) -> tuple[str, list]:
-        """공유 랜덤 와일드카드 처리 (__=wildcard__ 형식)
-        같은 생성 사이클 내에서 동일한 와일드카드는 동일한 값을 반환합니다.
-
-        Shared random wildcard processing (__=wildcard__ syntax).
-        Same wildcard returns the same value within a generation cycle.
-
-        Example:
-            Character prompt 1: girl, __=1_chara__, before costume
-            Character prompt 2: girl, __=1_chara__, after costume
-
-            Result (both get the same random selection):
-            Character prompt 1: girl, kinomoto sakura, before costume
-            Character prompt 2: girl, kinomoto sakura, after costume
-        """
-        if except_list is None:
-            except_list = []
-        result = target_str
-        applied_wildcard_list = []
-        prev_point = 0
-
-        # __= 형식으로 공유 와일드카드 검색
-        # Search for shared wildcards in __=name__ format
-        while "__=" in result:
-            p_left = result.find("__=", prev_point)
-            if p_left == -1:
-                break
-
-            p_right = result.find("__", p_left + 3)  # +3 to skip __=
-            if p_right == -1:
-                logger.warning("A single __= exists in shared wildcard syntax")
-                break
-
-            str_left = result[0:p_left]
-            str_center = result[p_left + 3:p_right].lower()  # +3 to skip __=
-            str_right = result[p_right + 2:len(result)]
-
-            if str_center in self._wildcards_dict and not (str_center in except_list):
-                wc_list = self._wildcards_dict[str_center]
-                if wc_list:  # 비어있지 않은지 확인
-                    # 캐시에서 확인 - 이미 선택된 값이 있으면 재사용
-                    # Check cache - reuse if already selected
-                    if str_center in self._shared_random_cache:
-                        selected_value = self._shared_random_cache[str_center]
-                        logger.debug(f"Reusing cached shared wildcard '{str_center}': {selected_value[:50]}...")
-                    else:
-                        # 새로운 랜덤 선택 후 캐시에 저장
-                        # New random selection, save to cache
-                        selected_value = wc_list[random.randrange(0, len(wc_list))].strip()
-                        self._shared_random_cache[str_center] = selected_value
-                        logger.debug(f"New shared wildcard '{str_center}': {selected_value[:50]}...")
-
-                    str_center = selected_value
-                    applied_wildcard_list.append(str_center)
-                else:
-                    logger.warning(f"Shared wildcard '{str_center}' has no entries")
-                    str_center = "__=" + str_center + "__"
-            else:
-                logger.warning(f"Unknown shared wildcard '{str_center}'")
-                str_center = "__=" + str_center + "__"
-
-            result_left = str_left + str_center
-            prev_point = len(result_left)
-            result = result_left + str_right
-
-        return result, applied_wildcard_list
-
-    def _apply_wildcard_once(self, target_str: str, except_list: list | None = None) -> tuple[str, list]:
-        if except_list is None:
-            except_list = []
-        result = target_str
-
-        applied_wildcard_list = []
-        prev_point = 0
-        
-        # __ 형식으로 와일드카드 검색
-        while "__" in result:
-            p_left = result.find("__", prev_point)
-            if p_left == -1:
-                break
-
-            p_right = result.find("__", p_left + 2)  # +2로 두 번째 __ 찾기
-            if p_right == -1:
-                logger.warning("A single __ exists in wildcard syntax")
-                break
-
-            str_left = result[0:p_left]
-            str_center = result[p_left + 2:p_right].lower()
-            str_right = result[p_right + 2:len(result)]
-
-            if str_center in self._wildcards_dict and not (str_center in except_list):
-                wc_list = self._wildcards_dict[str_center]
-                if wc_list:  # 비어있지 않은지 확인
-                    str_center = wc_list[random.randrange(0, len(wc_list))].strip()
-                    applied_wildcard_list.append(str_center)
-                else:
-                    logger.warning(f"Wildcard '{str_center}' has no entries")
-                    str_center = "__" + str_center + "__"
-            else:
-                logger.warning(f"Unknown wildcard '{str_center}'")
-                str_center = "__" + str_center + "__"
-
-            result_left = str_left + str_center
-            prev_point = len(result_left)
-            result = result_left + str_right
-
-        return result, applied_wildcard_list
-    
-    def _apply_loopcard_once(self, target_str: str, except_list: list | None = None) -> tuple[str, list]:
-        """루프카드 (순차 적용) 처리 - 순차 반복 기능 추가"""
-        if except_list is None:
-            except_list = []
-        result = target_str
-        applied_loopcard_list = []
-        prev_point = 0
-        
-        # ## 루프카드 ## 형식 검색
-        while "##" in result:
-            p_left = result.find("##", prev_point)
-            if p_left == -1:
-                break
-
-            p_right = result.find("##", p_left + 2)
-            if p_right == -1:
-                break
-
-            str_left = result[0:p_left]
-            str_center = result[p_left + 2:p_right].lower().strip()
-            str_right = result[p_right + 2:len(result)]
-
-            # 순차 반복 와일드카드 패턴 확인: wildcard_name*repeat_count
-            repeat_count = 1  # 기본값
-            wildcard_name = str_center
-            
-            # *숫자 패턴 확인
-            if '*' in str_center:
-                parts = str_center.split('*')
-                if len(parts) == 2 and parts[0] and parts[1]:
-                    try:
-                        repeat_count = int(parts[1])
-                        wildcard_name = parts[0]
-                        if repeat_count <= 0:
-                            raise ValueError("반복 횟수는 양수여야 합니다")
-                    except ValueError:
-                        # 잘못된 형식이면 원본 구문 그대로 유지
-                        str_center = "##" + str_center + "##"
-                        result_left = str_left + str_center
-                        prev_point = len(result_left)
-                        result = result_left + str_right
-                        continue
-
-            if wildcard_name in self._wildcards_dict and not (wildcard_name in except_list):
-                wc_list = self._wildcards_dict[wildcard_name]
-                if wc_list:
-                    # 반복 카운터 초기화
-                    counter_key = f"{wildcard_name}*{repeat_count}"
-                    if counter_key not in self._repeat_counters:
-                        self._repeat_counters[counter_key] = {'current': 0, 'target': repeat_count}
-                    
-                    # 인덱스 관리
-                    if wildcard_name not in self._loopcard_indices:
-                        self._loopcard_indices[wildcard_name] = 0
-                    
-                    idx = self._loopcard_indices[wildcard_name]
-                    selected_line = wc_list[idx].strip()
-                    
-                    # 단일 캐릭터만 사용 (반복 없이)
-                    str_center = selected_line
-                    
-                    # 반복 카운터 증가
-                    self._repeat_counters[counter_key]['current'] += 1
-                    
-                    # 목표 반복 횟수에 도달하면 다음 캐릭터로 이동
-                    if self._repeat_counters[counter_key]['current'] >= repeat_count:
-                        self._loopcard_indices[wildcard_name] = (idx + 1) % len(wc_list)
-                        self._repeat_counters[counter_key]['current'] = 0  # 카운터 리셋
-                    
-                    applied_loopcard_list.append(str_center)
-                else:
-                    str_center = "##" + str_center + "##"
+    def apply_wildcards(self, target_str: str) -> str:
+        """와일드카드, 루프카드, <a|b> 선택 구문을 모두 적용"""
+        return self._apply_template(target_str, use_snapshot=False)
+
+    def _apply_template(self, target_str: str, use_snapshot: bool) -> str:
+        """컴파일된 템플릿을 한 번에 렌더링. 선택된 값 안의 구문은 재귀적으로 적용한다."""
+        template = compile_template(target_str)
+        if not template.has_syntax:
+            return target_str
+        if template.has_tokens:
+            self._ensure_loaded()
+
+        out = []
+        self._render_into(template.nodes, out, use_snapshot, 0)
+        return "".join(out)
+
+    def _render_into(self, nodes: tuple, out: list, use_snapshot: bool, depth: int) -> None:
+        for node in nodes:
+            if isinstance(node, str):
+                out.append(node)
+            elif isinstance(node, Choice):
+                self._render_into(pick_choice(node), out, use_snapshot, depth)
             else:
-                str_center = "##" + str_center + "##"
-
-            result_left = str_left + str_center
-            prev_point = len(result_left)
-            result = result_left + str_right
-
-        return result, applied_loopcard_list
-        
-    def _apply_loopcard_once_with_snapshot(self, target_str: str, except_list: list | None = None) -> tuple[str, list]:
-        """스냅샷된 인덱스를 사용한 루프카드 처리 - 순차 반복 기능 추가"""
-        if except_list is None:
-            except_list = []
-        result = target_str
-        applied_loopcard_list = []
-        prev_point = 0
-
-        while "##" in result:
-            p_left = result.find("##", prev_point)
-            if p_left == -1:
-                break
-            p_right = result.find("##", p_left + 2)
-            if p_right == -1:
-                break
-
-            str_left = result[0:p_left]
-            str_center = result[p_left + 2:p_right].lower().strip()
-            str_right = result[p_right + 2:len(result)]
-
-            # 순차 반복 와일드카드 패턴 확인: wildcard_name*repeat_count
-            repeat_count = 1  # 기본값
-            wildcard_name = str_center
-            original_pattern = str_center  # 전체 패턴 저장 (wildcard_name*repeat_count)
-
-            # *숫자 패턴 확인
-            if '*' in str_center:
-                parts = str_center.split('*')
-                if len(parts) == 2 and parts[0] and parts[1]:
-                    try:
-                        repeat_count = int(parts[1])
-                        wildcard_name = parts[0]
-                        if repeat_count <= 0:
-                            raise ValueError("반복 횟수는 양수여야 합니다")
-                    except ValueError:
-                        # 잘못된 형식이면 원본 구문 그대로 유지
-                        str_center = "##" + str_center + "##"
-                        result_left = str_left + str_center
-                        prev_point = len(result_left)
-                        result = result_left + str_right
-                        continue
-
-            if wildcard_name in self._wildcards_dict and not (wildcard_name in except_list):
-                wc_list = self._wildcards_dict[wildcard_name]
-                if wc_list:
-                    # 키 사용 기록 - 반복 카운트 포함한 전체 패턴 사용
-                    self._used_keys.add(original_pattern)
-
-                    # 스냅샷에서 인덱스 가져오기
-                    idx = self._current_snapshot.get(wildcard_name, 0)
-                    selected_line = wc_list[idx].strip()
-
-                    # 단일 캐릭터만 사용 (스냅샷에서는 반복 없이)
-                    str_center = selected_line
-                    applied_loopcard_list.append(str_center)
+                self._render_token(node, out, use_snapshot, depth)
+
+    def _render_token(self, token: Token, out: list, use_snapshot: bool, depth: int) -> None:
+        if token.is_static:
+            name, repeat, pattern, fallback = token.name, token.repeat, token.pattern, token.fallback
+        else:
+            # 이름에 선택 구문이나 다른 토큰이 포함된 경우 먼저 그린 뒤 해석
+            inner_out = []
+            self._render_into(token.inner, inner_out, use_snapshot, depth)
+            name, repeat, pattern, fallback = interpret_token(token.kind, "".join(inner_out))
+
+        wc_list = self._wildcards_dict.get(name) if name is not None else None
+        if not wc_list:
+            if token.kind is TokenKind.SHARED:
+                logger.warning(f"Unknown shared wildcard '{name}'")
+            elif token.kind is TokenKind.WILDCARD:
+                logger.warning(f"Unknown wildcard '{name}'")
+            out.append(fallback)
+            return
 
-                    logger.debug(f"Applied wildcard '{original_pattern}' at index {idx}: {str_center[:50]}...")
-                else:
-                    str_center = "##" + str_center + "##"
+        if token.kind is TokenKind.LOOPCARD:
+            value = self._select_loopcard(name, repeat, pattern, wc_list, use_snapshot)
+        elif token.kind is TokenKind.SHARED:
+            # 캐시에서 확인 - 이미 선택된 값이 있으면 재사용
+            # Check cache - reuse if already selected
+            value = self._shared_random_cache.get(name)
+            if value is None:
+                value = wc_list[random.randrange(0, len(wc_list))].strip()
+                self._shared_random_cache[name] = value
+                logger.debug(f"New shared wildcard '{name}': {value[:50]}...")
             else:
-                str_center = "##" + str_center + "##"
+                logger.debug(f"Reusing cached shared wildcard '{name}': {value[:50]}...")
+        else:
+            value = wc_list[random.randrange(0, len(wc_list))].strip()
 
-            result_left = str_left + str_center
-            prev_point = len(result_left)
-            result = result_left + str_right
+        if depth >= MAX_TRY_AMOUNT:
+            logger.warning("Too much recursion in wildcards")
+            out.append(value)
+            return
 
-        return result, applied_loopcard_list
-    
-    def apply_wildcards(self, target_str: str) -> str:
-        """와일드카드와 루프카드 모두 적용"""
-        self.load_wildcards()
-
-        result = target_str
-
-        # 1. 먼저 루프카드(순차) 적용
-        index = 0
-        except_list = []
-        while True:
-            result, applied_loopcard_list = self._apply_loopcard_once(result, except_list)
-            except_list.extend(applied_loopcard_list)
-
-            if len(applied_loopcard_list) == 0:
-                break
-
-            index += 1
-            if index > MAX_TRY_AMOUNT:
-                logger.warning("Too much recursion in loopcards")
-                break
-
-        # 2. 공유 랜덤 와일드카드 적용 (__=wildcard__ 형식)
-        # Apply shared random wildcards (__=wildcard__ syntax)
-        index = 0
-        except_list = []
-        while True:
-            result, applied_shared_list = self._apply_shared_wildcard_once(result, except_list)
-            except_list.extend(applied_shared_list)
-
-            if len(applied_shared_list) == 0:
-                break
-
-            index += 1
-            if index > MAX_TRY_AMOUNT:
-                logger.warning("Too much recursion in shared wildcards")
-                break
-
-        # 3. 일반 와일드카드(랜덤) 적용
-        index = 0
-        except_list = []
-        while True:
-            result, applied_wildcard_list = self._apply_wildcard_once(result, except_list)
-            except_list.extend(applied_wildcard_list)
-
-            if len(applied_wildcard_list) == 0:
-                break
-
-            index += 1
-            if index > MAX_TRY_AMOUNT:
-                logger.warning("Too much recursion in wildcards")
-                break
-
-        return result
-    
-    
+        template = compile_template(value)
+        if template.has_syntax:
+            self._render_into(template.nodes, out, use_snapshot, depth + 1)
+        else:
+            out.append(value)
+
+    def _select_loopcard(self, name: str, repeat: int, pattern: str, wc_list: list, use_snapshot: bool) -> str:
+        """루프카드 값 선택 - 스냅샷 모드는 인덱스를 증가시키지 않고 사용 기록만 남김"""
+        if use_snapshot:
+            # 키 사용 기록 - 반복 카운트 포함한 전체 패턴 사용
+            self._used_keys.add(pattern)
+            idx = self._current_snapshot.get(name, 0) % len(wc_list)
+            value = wc_list[idx].strip()
+            logger.debug(f"Applied wildcard '{pattern}' at index {idx}: {value[:50]}...")
+            return value
+
+        # 반복 카운터 초기화
+        counter_key = f"{name}*{repeat}"
+        if counter_key not in self._repeat_counters:
+            self._repeat_counters[counter_key] = {'current': 0, 'target': repeat}
+
+        # 인덱스 관리
+        if name not in self._loopcard_indices:
+            self._loopcard_indices[name] = 0
+
+        idx = self._loopcard_indices[name] % len(wc_list)
+        value = wc_list[idx].strip()
+
+        # 목표 반복 횟수에 도달하면 다음 캐릭터로 이동
+        self._repeat_counters[counter_key]['current'] += 1
+        if self._repeat_counters[counter_key]['current'] >= repeat:
+            self._loopcard_indices[name] = (idx + 1) % len(wc_list)
+            self._repeat_counters[counter_key]['current'] = 0  # 카운터 리셋
+        return value